@@ -3,8 +3,18 @@ import os
 
 from dotenv import load_dotenv, find_dotenv
 
+from cache_control import CACHE_CONTROLS, CACHE_STATES
+from concurrent_runner import run_concurrent_queries
+from count_executor import CountExecutorConnection
+from csr_connection import CSRConnection
 from neo4j_connection import Neo4jConnection
-from postgres_connection import PostgreSQLConnection
+from parallel_count import ParallelCountConnection, ParallelCSRConnection
+from postgres_connection import PostgreSQLConnection, CONNECTION_MODES, COLD_CONNECTION, POOLED_CONNECTION
+from query_files import read_queries
+from result_cache import RESULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB, ResultCache, run_cached
+from repetitions import RepetitionScheduler
+from results_store import RESULTS_STORE_DIR, append_results
+from timing import save_runs
 
 load_dotenv(find_dotenv(), override=True)
 
@@ -21,6 +31,15 @@ POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 NEO4J_QUERY_DIR = os.getenv('NEO4J_QUERY_DIR')
 POSTGRES_QUERY_DIR = os.getenv('POSTGRES_QUERY_DIR')
 
+# Data set directory for the in-process CSR engine (projected-fk or merged-fk)
+CSR_DATA_DIR = os.getenv('CSR_DATA_DIR')
+
+# Scale factor of the loaded data set, as used by the load scripts
+SF = os.getenv('SF')
+
+# In-process systems that can hash-partition their queries across worker processes
+PARALLEL_SYSTEMS = ("csr", "numpy")
+
 parser = argparse.ArgumentParser(
     description="Benchmark Neo4j and PostgreSQL with the given queries",
     prog="BachelorsThesisBenchmark",
@@ -28,63 +47,239 @@ parser = argparse.ArgumentParser(
 )
 
 parser.add_argument("-t", "--timeout", type=int, default=120, help="Timeout in seconds for each individual query run")
-parser.add_argument("-r", "--runs", type=int, default=5, help="Number of runs for each query")
+parser.add_argument("-r", "--runs", type=int, default=5,
+                    help="Number of runs for each query (the minimum with --target-ci or --time-budget)")
+parser.add_argument("-w", "--warmup", type=int, default=0, help="Unrecorded warm-up runs before the measured runs")
+parser.add_argument("-ci", "--target-ci", type=float, default=None,
+                    help="Repeat until the 95%% confidence interval of the median is within this relative half width, "
+                         "e.g. 0.05 for +-5%%")
+parser.add_argument("-tb", "--time-budget", type=float, default=None,
+                    help="Stop repeating a query before its runs would exceed this many seconds")
+parser.add_argument("-mr", "--max-runs", type=int, default=100,
+                    help="Upper bound for the number of runs with --target-ci or --time-budget")
+parser.add_argument("-cs", "--cache-state", choices=CACHE_STATES, default=None,
+                    help="Neo4j and PostgreSQL only: restart the container (and drop the OS page cache if permitted) "
+                         "before every measured run (cold) or prewarm the whole database before every query (warm); "
+                         "recorded as the variant suffix -cold or -warm")
+parser.add_argument("-cl", "--clients", type=int, default=1,
+                    help="Number of concurrent clients; values above 1 report throughput and latency percentiles")
 parser.add_argument("-n", "--neo4j", action="store_true", help="Run Neo4j queries")
 parser.add_argument("-p", "--postgres", action="store_true", help="Run PostgreSQL queries")
+parser.add_argument("-c", "--csr", action="store_true",
+                    help="Run the FOF and shortest path Cypher queries on the in-process CSR engine")
+parser.add_argument("-np", "--numpy", action="store_true",
+                    help="Count the LSQB queries of POSTGRES_QUERY_DIR with the in-process NumPy count executor")
+parser.add_argument("-wk", "--workers", type=int, default=1,
+                    help="Worker processes of the CSR engine and the NumPy count executor; above 1 every query is "
+                         "hash-partitioned across them and recorded as the variant suffix -<workers>p")
+parser.add_argument("-pm", "--postgres-mode", choices=CONNECTION_MODES, default=COLD_CONNECTION,
+                    help="PostgreSQL connection mode: a new connection per run (cold) or warm pooled connections")
+parser.add_argument("-ps", "--pool-size", type=int, default=None,
+                    help="Size of the PostgreSQL connection pool in pooled mode (defaults to the number of clients)")
+parser.add_argument("-st", "--server-timings", action="store_true",
+                    help="Run one extra EXPLAIN ANALYZE pass per PostgreSQL query to record planning and execution "
+                         "time")
+parser.add_argument("-cp", "--capture-plans", action="store_true",
+                    help="Record the PostgreSQL EXPLAIN plan and the Neo4j PROFILE plan of every query and its "
+                         "fingerprint")
+parser.add_argument("-s", "--streaming", action="store_true",
+                    help="Stream results and keep only a row count and checksum instead of materializing all rows")
+parser.add_argument("-is", "--itersize", type=int, default=2000,
+                    help="Rows per round trip of the PostgreSQL server-side cursor in streaming mode")
 parser.add_argument("-nd", "--neo4j-dir", type=str, default="neo4j_results",
                     help="Result directory containing Neo4j queries")
 parser.add_argument("-pd", "--postgres-dir", type=str, default="postgres_results",
                     help="Result directory containing PostgreSQL queries")
+parser.add_argument("-cd", "--csr-dir", type=str, default="csr_results",
+                    help="Result directory containing CSR engine queries")
+parser.add_argument("-npd", "--numpy-dir", type=str, default="numpy_results",
+                    help="Result directory containing NumPy count executor queries")
+parser.add_argument("-v", "--variant", type=str, default=None,
+                    help="Variant recorded in the results store (defaults to the name of the query directory)")
+parser.add_argument("-sf", "--scale-factor", type=str, default=SF,
+                    help="Scale factor or graph configuration recorded in the results store (defaults to $SF)")
+parser.add_argument("-sd", "--store-dir", type=str, default=RESULTS_STORE_DIR,
+                    help="Directory of the partitioned Parquet results store")
+parser.add_argument("-dd", "--data-dir", type=str, default=CSR_DATA_DIR,
+                    help="Data set directory for the CSR engine and the NumPy count executor; the checksums of its CSV "
+                         "files also identify the data set in the result cache")
+parser.add_argument("-rc", "--reuse-cache", action="store_true",
+                    help="Skip queries whose text, system, variant, data set and configuration are unchanged since a "
+                         "cached run (not used with --clients above 1)")
+parser.add_argument("-rcd", "--cache-dir", type=str, default=RESULT_CACHE_DIR, help="Directory of the result cache")
+parser.add_argument("-rcs", "--cache-size", type=int, default=DEFAULT_CACHE_SIZE_MB,
+                    help="Maximum size of the result cache in MB; least recently used entries are evicted first")
+
+
+def query_variant(query_dir, args):
+    return args.variant or os.path.basename(os.path.normpath(query_dir))
+
+
+def create_scheduler(args, cache_control=None):
+    return RepetitionScheduler(args.runs, warmup=args.warmup, target_ci=args.target_ci,
+                               time_budget_s=args.time_budget, max_runs=args.max_runs,
+                               before_run=cache_control.before_run if cache_control else None)
+
+
+def create_cache_control(connection, system, args):
+    if args.cache_state is None or system not in CACHE_CONTROLS:
+        return None
+    return CACHE_CONTROLS[system](connection, args.cache_state)
+
+
+def run_with_cache(connection, queries, system, query_dir, result_dir, save_summary, args):
+    """Run the queries sequentially, reusing unchanged results from the result cache with --reuse-cache.
+
+    Only the queries that actually ran are appended to the results store; the summary in the result directory always
+    covers all queries.
+    """
+    variant = query_variant(query_dir, args)
+    cache_control = create_cache_control(connection, system, args)
+    if cache_control:
+        variant = f"{variant}-{args.cache_state}"
+    if args.workers > 1 and system in PARALLEL_SYSTEMS:
+        variant = f"{variant}-{args.workers}p"
+    cache = ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    fingerprint = cache.dataset_fingerprint(args.scale_factor, args.data_dir)
+    config = {"runs": args.runs, "timeout": args.timeout, "streaming": args.streaming, "itersize": args.itersize,
+              "postgres_mode": args.postgres_mode, "server_timings": args.server_timings, "warmup": args.warmup,
+              "target_ci": args.target_ci, "time_budget": args.time_budget, "max_runs": args.max_runs,
+              "capture_plans": args.capture_plans, "cache_state": args.cache_state}
+    # without a scale factor or data set directory the cache could not tell data sets apart
+    keys = [cache.key(query, system, variant, fingerprint, config) if fingerprint else None for _, query in queries]
+
+    all_stats, fresh_stats = run_cached(
+        lambda pending: connection.run_queries(pending, result_dir=result_dir, runs=args.runs,
+                                               timeout_seconds=args.timeout,
+                                               scheduler=create_scheduler(args, cache_control)),
+        queries, keys, cache, reuse=args.reuse_cache
+    )
+    if len(fresh_stats) < len(all_stats):
+        save_summary(all_stats, result_dir)
+        save_runs(all_stats, result_dir, system)
+    if fresh_stats:
+        append_results(fresh_stats, system, variant, args.scale_factor, store_dir=args.store_dir)
+    return [{"data": stats["result"]} for stats in all_stats]
+
 
+def run_concurrently(connections, queries, system, query_dir, result_dir, args):
+    """Drive the queries from concurrent clients and append every query with the runs of all clients to the store.
 
-def read_queries(directory, extension):
-    queries = []
-    for filename in sorted(os.listdir(directory)):
-        if filename.endswith(extension):
-            file_path = os.path.join(directory, filename)
-            with open(file_path, 'r') as file:
-                query = file.read().strip()
-                queries.append((os.path.splitext(filename)[0], query))
+    The variant gets the suffix `-<clients>c`, so concurrent runs never replace the sequential ones of the same queries.
+    """
+    variant = query_variant(query_dir, args)
+    if args.workers > 1 and system in PARALLEL_SYSTEMS:
+        variant = f"{variant}-{args.workers}p"
+    variant = f"{variant}-{len(connections)}c"
+    all_query_stats, _ = run_concurrent_queries(connections, queries, result_dir, system, runs=args.runs,
+                                                timeout_seconds=args.timeout)
+    append_results(all_query_stats, system, variant, args.scale_factor, store_dir=args.store_dir)
 
-    return queries
+
+def create_postgres_connection(args):
+    pool_size = args.pool_size or args.clients
+    return PostgreSQLConnection(POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD,
+                                mode=args.postgres_mode, pool_size=pool_size, server_timings=args.server_timings,
+                                streaming=args.streaming, itersize=args.itersize, capture_plans=args.capture_plans)
+
+
+def run_postgres_concurrently(postgres_queries, args):
+    # the pool is thread-safe, so all clients share it; it is filled before the first run, so the measured time never
+    # includes connection setup (main rejects the cold mode, which connects inside every run)
+    connection = create_postgres_connection(args)
+    try:
+        connection.open_pool()
+        run_concurrently([connection] * args.clients, postgres_queries, "postgres", POSTGRES_QUERY_DIR,
+                         args.postgres_dir, args)
+    finally:
+        connection.close()
 
 
 def main():
     args = parser.parse_args()
+    if args.cache_state and args.clients > 1:
+        parser.error("--cache-state needs sequential runs (--clients 1)")
+    if args.clients > 1 and args.postgres and args.postgres_mode != POOLED_CONNECTION:
+        parser.error("--clients above 1 needs --postgres-mode pooled for PostgreSQL, cold connections would be timed")
+    if args.reuse_cache and not args.scale_factor and not args.data_dir:
+        parser.error("--reuse-cache needs --scale-factor or --data-dir to identify the data set")
     print(args)
     neo4j_queries = read_queries(NEO4J_QUERY_DIR, '.cypher')
     postgres_queries = read_queries(POSTGRES_QUERY_DIR, '.sql')
 
     if len(neo4j_queries) > 0 and args.neo4j:
-        neo4j_conn = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        neo4j_conn = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, streaming=args.streaming,
+                                     capture_plans=args.capture_plans)
         try:
             print("Running Neo4j Queries")
-            neo4j_results, neo4j_query_stats = neo4j_conn.run_queries(
-                neo4j_queries, result_dir=args.neo4j_dir,
-                runs=args.runs, timeout_seconds=args.timeout
-            )
-            print("Neo4j Results", neo4j_results)
+            if args.clients > 1:
+                # the driver is thread-safe, so all clients share it
+                run_concurrently([neo4j_conn] * args.clients, neo4j_queries, "neo4j", NEO4J_QUERY_DIR, args.neo4j_dir,
+                                 args)
+            else:
+                neo4j_results = run_with_cache(neo4j_conn, neo4j_queries, "neo4j", NEO4J_QUERY_DIR, args.neo4j_dir,
+                                               neo4j_conn.save_all_query_stats, args)
+                print("Neo4j Results", neo4j_results)
         finally:
             neo4j_conn.close()
     else:
         print("No Neo4j Queries to run")
 
     if len(postgres_queries) > 0 and args.postgres:
-        postgres_conn = PostgreSQLConnection(POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD)
-        try:
+        if args.clients > 1:
             print("Running Postgres Queries")
-            postgres_results, postgres_query_stats = postgres_conn.run_queries(
-                postgres_queries,
-                result_dir=args.postgres_dir,
-                runs=args.runs,
-                timeout_seconds=args.timeout
-            )
-            print("Postgres Results", postgres_results)
-        finally:
-            postgres_conn.close()
+            run_postgres_concurrently(postgres_queries, args)
+        else:
+            postgres_conn = create_postgres_connection(args)
+            try:
+                print("Running Postgres Queries")
+                postgres_results = run_with_cache(postgres_conn, postgres_queries, "postgres", POSTGRES_QUERY_DIR,
+                                                  args.postgres_dir, postgres_conn.save_postgres_results, args)
+                print("Postgres Results", postgres_results)
+            finally:
+                postgres_conn.close()
     else:
         print("No Postgres Queries to run")
 
+    if len(neo4j_queries) > 0 and args.csr:
+        if args.workers > 1:
+            csr_conn = ParallelCSRConnection(args.data_dir, args.workers)
+        else:
+            csr_conn = CSRConnection(args.data_dir)
+        try:
+            print("Running CSR Queries")
+            if args.clients > 1:
+                # the graph is read-only, so all clients share it
+                run_concurrently([csr_conn] * args.clients, neo4j_queries, "csr", NEO4J_QUERY_DIR, args.csr_dir, args)
+            else:
+                csr_results = run_with_cache(csr_conn, neo4j_queries, "csr", NEO4J_QUERY_DIR, args.csr_dir,
+                                             csr_conn.save_csr_results, args)
+                print("CSR Results", csr_results)
+        finally:
+            csr_conn.close()
+    else:
+        print("No CSR Queries to run")
+
+    if len(postgres_queries) > 0 and args.numpy:
+        if args.workers > 1:
+            numpy_conn = ParallelCountConnection(args.data_dir, args.workers)
+        else:
+            numpy_conn = CountExecutorConnection(args.data_dir)
+        lsqb_queries = [(filename, query) for filename, query in postgres_queries if numpy_conn.supports(query)]
+        try:
+            print("Running NumPy Queries")
+            if args.clients > 1:
+                run_concurrently([numpy_conn] * args.clients, lsqb_queries, "numpy", POSTGRES_QUERY_DIR, args.numpy_dir,
+                                 args)
+            else:
+                numpy_results = run_with_cache(numpy_conn, lsqb_queries, "numpy", POSTGRES_QUERY_DIR, args.numpy_dir,
+                                               numpy_conn.save_results, args)
+                print("NumPy Results", numpy_results)
+        finally:
+            numpy_conn.close()
+    else:
+        print("No NumPy Queries to run")
+
 
 if __name__ == "__main__":
     main()
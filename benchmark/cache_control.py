@@ -0,0 +1,109 @@
+import os
+import subprocess
+from abc import ABC, abstractmethod
+
+from psycopg import connect
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DROP_CACHES = "/proc/sys/vm/drop_caches"
+
+COLD = "cold"
+WARM = "warm"
+CACHE_STATES = [COLD, WARM]
+
+# loads every table, index and materialized view of the public schema into shared_buffers
+PG_PREWARM = """SELECT count(pg_prewarm(c.oid))
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = 'public' AND c.relkind IN ('r', 'i', 'm')"""
+# Neo4j Community has no page cache warm-up, so every node and relationship record and its properties is read once
+NEO4J_WARMUP = [
+    "MATCH (n) RETURN count(size(keys(n)))",
+    "MATCH ()-[r]->() RETURN count(size(keys(r)))",
+]
+
+
+def drop_os_page_cache():
+    """Write back dirty pages and drop the page cache of the host; needs root or a password-less sudo."""
+    os.sync()
+    try:
+        with open(DROP_CACHES, "w") as file:
+            file.write("3\n")
+        return True
+    except OSError:
+        pass
+    try:
+        result = subprocess.run(["sudo", "-n", "tee", DROP_CACHES], input=b"3\n", stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL)
+        return result.returncode == 0
+    except OSError:
+        return False
+
+
+class CacheControl(ABC):
+    """Puts a system into a defined cache state before every measured run; plug `before_run` into the scheduler.
+
+    `cold` restarts the container before every measured run, which empties the buffer pool (shared_buffers or the
+    Neo4j page cache), and drops the OS page cache in between where that is permitted. `warm` loads the whole database
+    into the buffer pool once before the first measured run of every query.
+    """
+
+    script_dir = None
+
+    def __init__(self, connection, state):
+        if state not in CACHE_STATES:
+            raise ValueError(f"Unknown cache state '{state}', expected one of {CACHE_STATES}")
+        self.connection = connection
+        self.state = state
+        self.os_cache_dropped = None
+
+    def before_run(self, first_run):
+        if self.state == COLD:
+            self.cold_start()
+        elif first_run:
+            self.prewarm()
+
+    def cold_start(self):
+        subprocess.run([os.path.join(ROOT_DIR, self.script_dir, "stop.sh")], check=True, stdout=subprocess.DEVNULL)
+        dropped = drop_os_page_cache()
+        if self.os_cache_dropped is None and not dropped:
+            print("Cannot drop the OS page cache (not permitted), cold runs only start with an empty buffer pool")
+        self.os_cache_dropped = dropped
+        subprocess.run([os.path.join(ROOT_DIR, self.script_dir, "start.sh")], check=True, stdout=subprocess.DEVNULL)
+        self.reconnect()
+
+    @abstractmethod
+    def reconnect(self):
+        """Connect again after the restart of `cold_start`."""
+
+    @abstractmethod
+    def prewarm(self):
+        """Load the whole database into the buffer pool."""
+
+
+class PostgresCacheControl(CacheControl):
+    script_dir = "pos"
+
+    def reconnect(self):
+        # the next session opens a new connection (or a new pool) before its run is timed
+        self.connection.close()
+
+    def prewarm(self):
+        c = self.connection
+        with connect(host=c.host, port=c.port, user=c.user, password=c.password, autocommit=True) as conn:
+            conn.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm")
+            conn.execute(PG_PREWARM)
+
+
+class Neo4jCacheControl(CacheControl):
+    script_dir = "neo"
+
+    def reconnect(self):
+        self.connection.reconnect()
+
+    def prewarm(self):
+        for query in NEO4J_WARMUP:
+            self.connection.execute(query, timeout_seconds=None)
+
+
+CACHE_CONTROLS = {"postgres": PostgresCacheControl, "neo4j": Neo4jCacheControl}
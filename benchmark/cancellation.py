@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import threading
+
+from timing import monotonic_s
+
+
+class QueryTimeout(TimeoutError):
+    """A run was cancelled by the watchdog because it exceeded its timeout."""
+
+
+class Guard:
+    """Registration of one run with the watchdog; use it as a context manager around the run.
+
+    If the deadline passes while the run is active, the watchdog calls `cancel` once from its own thread. The error the
+    cancelled run raises in the client thread is turned into a `QueryTimeout`. Leaving the context waits for a cancel
+    that is in flight, so a late cancel can never hit the next run on the same connection.
+    """
+
+    def __init__(self, watchdog, timeout_seconds, cancel):
+        self.watchdog = watchdog
+        self.timeout_seconds = timeout_seconds
+        self.deadline = None
+        self.cancel = cancel
+        self.active = False
+        self.fired = False
+        self._cancelling = threading.Lock()
+
+    def __enter__(self):
+        if self.timeout_seconds is not None:
+            self.deadline = monotonic_s() + self.timeout_seconds
+            self.watchdog.register(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.deadline is not None:
+            self.watchdog.unregister(self)
+            with self._cancelling:
+                pass
+        if self.fired and exc_type is not None and not isinstance(exc_value, QueryTimeout):
+            raise QueryTimeout(f"Cancelled after the timeout of {self.timeout_seconds} s") from exc_value
+        return False
+
+    def fire(self):
+        """Call `cancel`; the watchdog acquired `_cancelling` before and it is released once the cancel is done."""
+        try:
+            if self.cancel is not None:
+                self.cancel()
+        except Exception as e:
+            print(f"Cancelling a run after {self.timeout_seconds} s failed: {e}")
+        finally:
+            self._cancelling.release()
+
+
+class Watchdog:
+    """A single daemon thread that cancels every registered run whose deadline has passed.
+
+        with WATCHDOG.watch(timeout_seconds, cancel=lambda: connection.cancel()):
+            with Timer() as timer:
+                run()
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._deadlines = []
+        self._counter = itertools.count()
+        self._thread = None
+
+    def watch(self, timeout_seconds, cancel=None):
+        return Guard(self, timeout_seconds, cancel)
+
+    def register(self, guard):
+        with self._condition:
+            guard.active = True
+            heapq.heappush(self._deadlines, (guard.deadline, next(self._counter), guard))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-watchdog", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def unregister(self, guard):
+        with self._condition:
+            guard.active = False
+
+    def _run(self):
+        while True:
+            with self._condition:
+                expired = []
+                while self._deadlines and (not self._deadlines[0][2].active or self._deadlines[0][0] <= monotonic_s()):
+                    _, _, guard = heapq.heappop(self._deadlines)
+                    if guard.active:
+                        guard.fired = True
+                        # taken before the lock is released, so unregister waits for the cancel to finish
+                        guard._cancelling.acquire()
+                        expired.append(guard)
+                if not expired:
+                    next_deadline = self._deadlines[0][0] if self._deadlines else None
+                    self._condition.wait(None if next_deadline is None else max(next_deadline - monotonic_s(), 0))
+                    continue
+            for guard in expired:
+                guard.fire()
+
+
+WATCHDOG = Watchdog()
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from result_cache import file_checksum
+
+COLUMN_DTYPE = np.dtype("<i8")
+VALUES_SUFFIX = ".i64"
+NULL_SUFFIX = ".null"
+MANIFEST_FILE = "manifest.json"
+
+
+def column_store_dir(data_dir):
+    """Column store shared by both formats of a data set, e.g. `social-network-sf1-columns` next to the CSV dirs."""
+    return re.sub(r"-(merged|projected)-fk$", "", os.path.normpath(data_dir)) + "-columns"
+
+
+class TableWriter:
+    """Appends chunks of int64 columns to `<store_dir>/<table>/<column>.i64`, like `write_edges` does for edges.
+
+    A column that contains NULLs also gets a `<column>.null` file with one byte per row. The table is written to a
+    temporary directory and only renamed into place by `close`, so an interrupted conversion never leaves a truncated
+    table behind. The manifest records the columns, the row count and the checksums of the CSV files in `sources`.
+    """
+
+    def __init__(self, store_dir, table, columns, sources=()):
+        self.path = os.path.join(store_dir, table)
+        self.tmp_path = f"{self.path}.tmp"
+        self.table = table
+        self.columns = columns
+        self.sources = sources
+        self.rows = 0
+        self.null_files = {}
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self.value_files = {column: open(self._file(column, VALUES_SUFFIX), "wb") for column in columns}
+
+    def _file(self, column, suffix):
+        return os.path.join(self.tmp_path, f"{column}{suffix}")
+
+    def write(self, chunk):
+        """Append one chunk, a list of (values, null_mask) pairs in column order as yielded by `read_csv_chunks`."""
+        num_rows = len(chunk[0][0])
+        for column, (values, null) in zip(self.columns, chunk):
+            np.asarray(values, dtype=COLUMN_DTYPE).tofile(self.value_files[column])
+            if null is not None and column not in self.null_files and null.any():
+                # the first NULL of the column: all earlier rows were not null
+                self.null_files[column] = open(self._file(column, NULL_SUFFIX), "wb")
+                np.zeros(self.rows, dtype=bool).tofile(self.null_files[column])
+            if column in self.null_files:
+                mask = np.zeros(num_rows, dtype=bool) if null is None else np.asarray(null, dtype=bool)
+                mask.tofile(self.null_files[column])
+        self.rows += num_rows
+
+    def close(self):
+        for file in [*self.value_files.values(), *self.null_files.values()]:
+            file.close()
+        manifest = {"table": self.table, "columns": self.columns, "rows": self.rows, "dtype": COLUMN_DTYPE.str,
+                    "sources": [source_entry(path) for path in self.sources]}
+        with open(os.path.join(self.tmp_path, MANIFEST_FILE), "w") as file:
+            json.dump(manifest, file, indent=2)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for file in [*self.value_files.values(), *self.null_files.values()]:
+                file.close()
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+        return False
+
+
+def source_entry(path):
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_checksum(path)}
+
+
+def write_table(store_dir, table, columns, chunks, sources=()):
+    """Write all chunks of a table and return its number of rows."""
+    with TableWriter(store_dir, table, columns, sources) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+    return writer.rows
+
+
+def read_manifest(store_dir, table):
+    path = os.path.join(store_dir, table, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def has_table(store_dir, table):
+    return os.path.exists(os.path.join(store_dir, table, MANIFEST_FILE))
+
+
+def is_current(store_dir, table):
+    """True if the table exists and none of the CSV files it was built from changed since.
+
+    Sources with an unchanged size and modification time are trusted without reading them; the others are only
+    considered changed if their checksum differs. Sources that no longer exist do not invalidate the table, so the CSV
+    files can be deleted once the store is built.
+    """
+    manifest = read_manifest(store_dir, table)
+    if manifest is None:
+        return False
+    for source in manifest["sources"]:
+        if not os.path.exists(source["path"]):
+            continue
+        stat = os.stat(source["path"])
+        if stat.st_size == source["size"] and stat.st_mtime_ns == source["mtime_ns"]:
+            continue
+        if stat.st_size != source["size"] or file_checksum(source["path"]) != source["sha256"]:
+            return False
+    return True
+
+
+def table_columns(store_dir, table):
+    return read_manifest(store_dir, table)["columns"]
+
+
+def _map(path, dtype):
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def read_column(store_dir, table, column):
+    """(values, null_mask) of one column as read-only memory maps; the mask is None if the column has no NULLs."""
+    base = os.path.join(store_dir, table, column)
+    values = _map(base + VALUES_SUFFIX, COLUMN_DTYPE)
+    null = _map(base + NULL_SUFFIX, bool) if os.path.exists(base + NULL_SUFFIX) else None
+    return values, null
+
+
+def read_table(store_dir, table):
+    """All columns of a table as a dict of column -> (values, null_mask), in their original order."""
+    return {column: read_column(store_dir, table, column) for column in table_columns(store_dir, table)}
+
+
+def read_chunks(store_dir, table, chunk_rows):
+    """Yield the columns of a table in chunks of `chunk_rows` rows, in the same shape as `pg_loader.read_csv_chunks`."""
+    columns = list(read_table(store_dir, table).values())
+    num_rows = len(columns[0][0]) if columns else 0
+    for start in range(0, num_rows, chunk_rows):
+        yield [(values[start:start + chunk_rows], None if null is None else null[start:start + chunk_rows])
+               for values, null in columns]
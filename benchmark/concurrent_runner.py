@@ -0,0 +1,124 @@
+import csv
+import os
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+from timing import Timer, monotonic_s, save_runs
+
+
+def _client_loop(connection, client_id, query_string, runs, timeout_seconds, barrier):
+    timers = []
+    errors = []
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        return client_id, timers, ["Another client failed before the start of the query"]
+    for _ in range(runs):
+        try:
+            with Timer() as timer:
+                connection.execute(query_string, timeout_seconds)
+            timers.append(timer)
+        except Exception as e:
+            # one failing client must not take down the others
+            errors.append(str(e))
+            break
+    return client_id, timers, errors
+
+
+def run_concurrent_queries(connections, queries, result_dir, prefix, runs=5, timeout_seconds=120):
+    """Drive every query from len(connections) concurrent clients and report throughput and latency percentiles.
+
+    Each client thread gets its own connection object (the same object may be passed several times if it is
+    thread-safe, e.g. the Neo4j driver or the CSR engine) and runs the query `runs` times. All clients start a query at
+    the same time so the measurements capture contention; a client that fails before the start is recorded as an
+    error of that query. Every run of every client is saved to `<prefix>_concurrent_runs.parquet` (wall time only:
+    the CPU time of the client process covers all client threads), and the query stats carry the runs of all clients
+    in `execution_times` for the results store.
+    """
+    clients = len(connections)
+    all_query_stats = []
+    all_client_stats = []
+    for idx, (filename, query_string) in enumerate(tqdm(queries, desc=f"Running {clients} concurrent clients")):
+        start_times = []
+        barrier = threading.Barrier(clients, action=lambda: start_times.append(monotonic_s()))
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            futures = [
+                executor.submit(_client_loop, connection, client_id, query_string, runs, timeout_seconds, barrier)
+                for client_id, connection in enumerate(connections)
+            ]
+            client_results = []
+            for client_id, future in enumerate(futures):
+                try:
+                    client_results.append(future.result())
+                except Exception as e:
+                    client_results.append((client_id, [], [str(e)]))
+            wall_time = monotonic_s() - start_times[0] if start_times else None
+
+        latencies = [timer.wall_s for _, timers, _ in client_results for timer in timers]
+        errors = [error for _, _, client_errors in client_results for error in client_errors]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (None, None, None)
+
+        all_query_stats.append({
+            "query_index": idx + 1,
+            "filename": filename,
+            "clients": clients,
+            "completed_runs": len(latencies),
+            "wall_time_s": wall_time,
+            "throughput_qps": len(latencies) / wall_time if wall_time else None,
+            "mean_latency_s": statistics.mean(latencies) if latencies else None,
+            "p50_latency_s": p50,
+            "p95_latency_s": p95,
+            "p99_latency_s": p99,
+            "mean_execution_time_s": statistics.mean(latencies) if latencies else None,
+            "std_dev_time_s": statistics.stdev(latencies) if len(latencies) > 1 else 0,
+            "median_execution_time_s": statistics.median(latencies) if latencies else None,
+            "execution_times": latencies,
+            "errors": errors
+        })
+        for client_id, timers, client_errors in client_results:
+            client_latencies = [timer.wall_s for timer in timers]
+            all_client_stats.append({
+                "query_index": idx + 1,
+                "filename": filename,
+                "client_id": client_id,
+                "completed_runs": len(client_latencies),
+                "mean_latency_s": statistics.mean(client_latencies) if client_latencies else None,
+                "max_latency_s": max(client_latencies) if client_latencies else None,
+                "errors": client_errors,
+                "wall_times_ns": [timer.wall_ns for timer in timers],
+            })
+
+    save_concurrent_results(all_query_stats, all_client_stats, result_dir, prefix)
+    save_runs(all_client_stats, result_dir, f"{prefix}_concurrent")
+    return all_query_stats, all_client_stats
+
+
+def save_concurrent_results(all_query_stats, all_client_stats, result_dir, prefix):
+    if not os.path.exists(result_dir):
+        os.makedirs(result_dir)
+
+    filename = f"{result_dir}/{prefix}_concurrent_summary.csv"
+    with open(filename, "w", newline="") as file:
+        fieldnames = ['query_index', 'filename', 'clients', 'completed_runs', 'wall_time_s', 'throughput_qps',
+                      'mean_latency_s', 'p50_latency_s', 'p95_latency_s', 'p99_latency_s', 'errors']
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in all_query_stats:
+            row = {key: result[key] for key in result if key in fieldnames}
+            row['errors'] = str(result['errors'])
+            writer.writerow(row)
+
+    filename = f"{result_dir}/{prefix}_concurrent_clients.csv"
+    with open(filename, "w", newline="") as file:
+        fieldnames = ['query_index', 'filename', 'client_id', 'completed_runs', 'mean_latency_s', 'max_latency_s',
+                      'errors']
+        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer.writeheader()
+        for result in all_client_stats:
+            row = {key: result[key] for key in result if key in fieldnames}
+            row['errors'] = str(result['errors'])
+            writer.writerow(row)
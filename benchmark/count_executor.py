@@ -0,0 +1,459 @@
+import argparse
+import math
+import os
+import re
+
+import numpy as np
+
+from results_store import RESULTS_STORE_DIR, append_results, load_results
+from timing import Timer, monotonic_s
+from trie_join import (CYCLIC_QUERIES, EXPECTED_OUTPUT, KNOWS, LSQBCatalog, TrieJoinConnection, count_join,
+                       expected_counts, scale_factor_of)
+
+LSQB_SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sql", "lsqb")
+SYSTEM = "numpy"
+
+# query -> atoms as (relation, *variables), plus
+#   optional: LEFT JOINed atoms as (relation, *variables); the variable they share with the atoms is preserved
+#   distinct: pairs of variables that must differ (a != b)
+#   absent: (relation, *variables) that must not exist (LEFT JOIN ... WHERE ... IS NULL)
+#   order: variable order for the trie join of a cyclic query
+LSQB_QUERIES = {
+    "q1": {"atoms": [("Country", "country"),
+                     ("City_isPartOf_Country", "city", "country"),
+                     ("Person_isLocatedIn_City", "person", "city"),
+                     ("Forum_hasMember_Person", "forum", "person"),
+                     ("Forum", "forum"),
+                     ("Forum_containerOf_Post", "forum", "post"),
+                     ("Comment_replyOf_Post", "comment", "post"),
+                     ("Comment_hasTag_Tag", "comment", "tag"),
+                     ("Tag_hasType_TagClass", "tag", "tagclass"),
+                     ("TagClass", "tagclass")]},
+    "q2": {"atoms": CYCLIC_QUERIES["q2"][1], "order": CYCLIC_QUERIES["q2"][0]},
+    "q3": {"atoms": CYCLIC_QUERIES["q3"][1], "order": CYCLIC_QUERIES["q3"][0]},
+    "q4": {"atoms": [("Message_hasTag_Tag", "message", "tag"),
+                     ("Message_hasCreator_Person", "message", "creator"),
+                     ("Comment_replyOf_Message", "comment", "message"),
+                     ("Person_likes_Message", "liker", "message")]},
+    "q5": {"atoms": [("Message_hasTag_Tag", "message", "tag1"),
+                     ("Comment_replyOf_Message", "comment", "message"),
+                     ("Comment_hasTag_Tag", "comment", "tag2")],
+           "distinct": [("tag1", "tag2")]},
+    "q6": {"atoms": [(KNOWS, "person1", "person2"),
+                     (KNOWS, "person2", "person3"),
+                     ("Person_hasInterest_Tag", "person3", "tag")],
+           "distinct": [("person1", "person3")]},
+    "q7": {"atoms": [("Message_hasTag_Tag", "message", "tag"),
+                     ("Message_hasCreator_Person", "message", "creator")],
+           "optional": [("Comment_replyOf_Message", "comment", "message"),
+                        ("Person_likes_Message", "liker", "message")]},
+    "q8": {"atoms": [("Message_hasTag_Tag", "message", "tag1"),
+                     ("Comment_replyOf_Message", "comment", "message"),
+                     ("Comment_hasTag_Tag", "comment", "tag2")],
+           "distinct": [("tag1", "tag2")],
+           "absent": [("Comment_hasTag_Tag", "comment", "tag1")]},
+    "q9": {"atoms": [(KNOWS, "person1", "person2"),
+                     (KNOWS, "person2", "person3"),
+                     ("Person_hasInterest_Tag", "person3", "tag")],
+           "distinct": [("person1", "person3")],
+           "absent": [(KNOWS, "person1", "person3")]},
+}
+
+# derived relations: the distinct rows of a relation, and the rows of a binary relation whose columns are equal
+DISTINCT_ROWS = "distinct"
+DIAGONAL = "diagonal"
+
+
+def substitute(atoms, old, new):
+    return [(atom[0], *(new if variable == old else variable for variable in atom[1:])) for atom in atoms]
+
+
+def normalize(atom):
+    """Turn an atom that repeats its variable, R(x, x), into the unary atom of the diagonal of R."""
+    relation, *variables = atom
+    if len(variables) == 2 and variables[0] == variables[1]:
+        return (DIAGONAL, relation), variables[0]
+    return atom
+
+
+def expand_filters(atoms, optional=(), distinct=(), absent=()):
+    """Rewrite a query with filters into signed filter-free conjunctive queries whose counts add up to its count.
+
+    count(Q and a != b) = count(Q) - count(Q with b replaced by a), and count(Q and not R(a, b)) = count(Q) -
+    count(Q and R(a, b)) with the distinct rows of R, so the filters never need the rows of Q. A term may be cyclic
+    even if Q is not, e.g. q5 with tag1 = tag2 is a triangle. Returns a list of (sign, atoms, optional atoms).
+    """
+    if distinct:
+        (a, b), rest = distinct[0], list(distinct[1:])
+        if a == b:
+            return []
+        kept = expand_filters(atoms, optional, rest, absent)
+        merged = expand_filters(substitute(atoms, b, a), substitute(optional, b, a),
+                                [(a if x == b else x, a if y == b else y) for x, y in rest], substitute(absent, b, a))
+        return kept + [(-sign, term, term_optional) for sign, term, term_optional in merged]
+    if absent:
+        (relation, *variables), rest = absent[0], list(absent[1:])
+        kept = expand_filters(atoms, optional, distinct, rest)
+        present = expand_filters(atoms + [((DISTINCT_ROWS, relation), *variables)], optional, distinct, rest)
+        return kept + [(-sign, term, term_optional) for sign, term, term_optional in present]
+    return [(1, [normalize(atom) for atom in atoms], [normalize(atom) for atom in optional])]
+
+
+def is_acyclic(atoms):
+    """True if the binary atoms form a tree over the variables (the LSQB queries are connected)."""
+    roots = {}
+
+    def find(variable):
+        while roots.setdefault(variable, variable) != variable:
+            variable = roots[variable]
+        return variable
+
+    for _, *variables in atoms:
+        if len(variables) == 2:
+            first, second = find(variables[0]), find(variables[1])
+            if first == second:
+                return False
+            roots[first] = second
+    return True
+
+
+class ExecutorCatalog(LSQBCatalog):
+    """The LSQB catalog extended by the derived relations the filter rewrites need, and cheap column statistics."""
+
+    def __init__(self, data_dir):
+        super().__init__(data_dir)
+        self.distinct_counts = {}
+
+    def _read_relation(self, name):
+        if isinstance(name, tuple):
+            kind, base = name
+            columns = self.relation(base)
+            if kind == DIAGONAL:
+                return (columns[0][columns[0] == columns[1]],)
+            return tuple(np.unique(np.stack(columns), axis=1))
+        return super()._read_relation(name)
+
+    def rows(self, name):
+        return len(self.relation(name)[0])
+
+    def distinct(self, name, column):
+        if (name, column) not in self.distinct_counts:
+            self.distinct_counts[(name, column)] = len(np.unique(self.relation(name)[column]))
+        return self.distinct_counts[(name, column)]
+
+
+class Counts:
+    """A multiplicity per value of a variable: `values` for the sorted `keys` and `default` for all other values."""
+
+    def __init__(self, keys, values, default=0):
+        self.keys = keys
+        self.values = values
+        self.default = default
+
+    def lookup(self, keys):
+        if len(self.keys) == 0:
+            return np.full(len(keys), self.default, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, self.values[positions], self.default)
+
+    def __mul__(self, other):
+        if self.default == 0 and other.default == 0:
+            keys = np.intersect1d(self.keys, other.keys, assume_unique=True)
+        elif self.default == 0 or other.default == 0:
+            keys = self.keys if self.default == 0 else other.keys
+        else:
+            keys = np.union1d(self.keys, other.keys)
+        return Counts(keys, self.lookup(keys) * other.lookup(keys), self.default * other.default)
+
+
+UNCONSTRAINED = Counts(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), 1)
+
+
+def aggregate(keys, weights, optional=False):
+    """Sum the weights per key; an optional (LEFT JOINed) side counts at least once for every key."""
+    order = np.argsort(keys, kind="stable")
+    keys, weights = keys[order], weights[order]
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else np.empty(0, np.int64)
+    sums = np.add.reduceat(weights, starts) if len(keys) else np.empty(0, dtype=np.int64)
+    if optional:
+        return Counts(keys[starts], np.maximum(sums, 1), 1)
+    nonzero = sums != 0
+    return Counts(keys[starts][nonzero], sums[nonzero])
+
+
+class TreePlan:
+    """A count-only plan of an acyclic query: the join tree rooted at `root`, evaluated bottom-up.
+
+    Every variable gets the Counts of the matches of its subtree per value: the product of its unary atoms and of the
+    messages of its child atoms, where the message of a child atom sums the Counts of the child variable over the
+    rows of the atom per value of the parent variable. This is a semi-join and aggregate pushdown (Yannakakis style):
+    no intermediate join result is ever materialized, every atom is read once.
+    """
+
+    def __init__(self, atoms, optional, root):
+        self.root = root
+        self.optional = [tuple(atom) for atom in optional]
+        self.unary = {}
+        self.edges = {}
+        for atom in list(atoms) + self.optional:
+            relation, *variables = atom
+            if len(variables) == 1:
+                self.unary.setdefault(variables[0], []).append(relation)
+            else:
+                self.edges.setdefault(variables[0], []).append((atom, 0))
+                self.edges.setdefault(variables[1], []).append((atom, 1))
+        # children of every variable in the rooted tree and a post-order of the variables
+        self.children = {}
+        self.order = []
+        stack = [(root, None)]
+        while stack:
+            variable, parent_atom = stack.pop()
+            self.order.append(variable)
+            self.children[variable] = []
+            for atom, side in self.edges.get(variable, []):
+                if atom is not parent_atom:
+                    self.children[variable].append((atom, side, atom[2 - side]))
+                    stack.append((atom[2 - side], atom))
+        self.order.reverse()
+
+    def valid(self):
+        """An optional atom must hang below the variable it preserves."""
+        required = {variable for variable in self.unary} | {variable for variable, edges in self.edges.items()
+                                                             if any(atom not in self.optional for atom, _ in edges)}
+        for variable in self.order:
+            for atom, _, child in self.children[variable]:
+                if atom in self.optional and (variable not in required or child in required):
+                    return False
+        return self.root in required
+
+    def cost(self, catalog):
+        """Estimated work: every atom is sorted by its parent column and probes the Counts of its child variable."""
+        sizes = {}
+        cost = 0.0
+        for variable in self.order:
+            bounds = [catalog.distinct(relation, 0) for relation in self.unary.get(variable, [])]
+            for atom, side, child in self.children[variable]:
+                rows = catalog.rows(atom[0])
+                # a child without any constraint needs no probe
+                probe = math.log2(max(sizes[child], 2)) if sizes[child] else 0
+                cost += rows * (math.log2(max(rows, 2)) + probe)
+                if atom not in self.optional:
+                    bounds.append(catalog.distinct(atom[0], side))
+            sizes[variable] = min(bounds) if bounds else None
+            cost += sizes[variable] or 0
+        return cost
+
+    def count(self, catalog, deadline=None):
+        counts = {}
+        for variable in self.order:
+            if deadline is not None and monotonic_s() > deadline:
+                raise TimeoutError("Query exceeded the configured timeout")
+            result = UNCONSTRAINED
+            for relation in self.unary.get(variable, []):
+                result = result * aggregate(catalog.relation(relation)[0],
+                                            np.ones(catalog.rows(relation), dtype=np.int64))
+            for atom, side, child in self.children[variable]:
+                columns = catalog.relation(atom[0])
+                weights = counts.pop(child).lookup(columns[1 - side])
+                result = result * aggregate(columns[side], weights, optional=atom in self.optional)
+            counts[variable] = result
+        return int(counts[self.root].values.sum())
+
+    def describe(self):
+        return f"tree rooted at {self.root}"
+
+
+class TrieJoinPlan:
+    """A cyclic term: counted with the worst-case optimal trie join of trie_join.py in a fixed variable order.
+
+    The tries are built when the plan is created, like indexes.
+    """
+
+    def __init__(self, atoms, variables, catalog):
+        self.variables = variables
+        self.atoms = []
+        for relation, *names in atoms:
+            reverse = len(names) == 2 and variables.index(names[1]) < variables.index(names[0])
+            self.atoms.append((catalog.trie(relation, reverse), names[::-1] if reverse else names))
+
+    def count(self, catalog, deadline=None):
+        return count_join(self.atoms, self.variables, deadline)
+
+    def describe(self):
+        return f"trie join over {', '.join(self.variables)}"
+
+
+def variable_order(atoms, catalog):
+    """Greedy variable order for the trie join: start at the variable in most atoms, then always continue with the
+    variable connected to the most bound variables, preferring small estimated domains."""
+    domains = {}
+    for relation, *variables in atoms:
+        for column, variable in enumerate(variables):
+            domains[variable] = min(domains.get(variable, math.inf), catalog.distinct(relation, column))
+    neighbours = {variable: [] for variable in domains}
+    for _, *variables in atoms:
+        if len(variables) == 2:
+            neighbours[variables[0]].append(variables[1])
+            neighbours[variables[1]].append(variables[0])
+    order = [min(domains, key=lambda variable: (-len(neighbours[variable]), domains[variable]))]
+    while len(order) < len(domains):
+        order.append(min((variable for variable in domains if variable not in order),
+                         key=lambda variable: (-sum(neighbour in order for neighbour in neighbours[variable]),
+                                               domains[variable])))
+    return order
+
+
+def query_terms(query):
+    spec = LSQB_QUERIES[query]
+    return expand_filters(list(spec["atoms"]), spec.get("optional", []), spec.get("distinct", []),
+                          spec.get("absent", []))
+
+
+def plan_term(atoms, optional, catalog, order=None):
+    """Pick the cheapest rooted join tree of an acyclic term, or a trie join for a cyclic one."""
+    if not is_acyclic(list(atoms) + list(optional)):
+        if optional:
+            raise ValueError("LEFT JOINs are only supported in acyclic queries")
+        return TrieJoinPlan(atoms, order or variable_order(atoms, catalog), catalog), None
+    variables = dict.fromkeys(variable for _, *atom_variables in atoms for variable in atom_variables)
+    candidates = [TreePlan(atoms, optional, root) for root in variables]
+    costs = [(plan.cost(catalog), index) for index, plan in enumerate(candidates) if plan.valid()]
+    cost, index = min(costs)
+    return candidates[index], cost
+
+
+class CountExecutor:
+    """Count-only executor for all LSQB queries on NumPy columns of the column store.
+
+    A query is rewritten into filter-free terms (see `expand_filters`); acyclic terms run as a TreePlan chosen by the
+    cost model among all roots, cyclic terms as a trie join. Relations, their distinct rows and their tries are cached
+    across runs like indexes; the sorting and aggregation of the tree plans is part of every run.
+    """
+
+    def __init__(self, data_dir):
+        self.catalog = ExecutorCatalog(data_dir)
+        self.plans = {}
+
+    def plan(self, query):
+        if query not in self.plans:
+            self.plans[query] = [(sign, *plan_term(atoms, optional, self.catalog, LSQB_QUERIES[query].get("order")))
+                                 for sign, atoms, optional in query_terms(query)]
+        return self.plans[query]
+
+    def count(self, query, deadline=None):
+        return sum(sign * plan.count(self.catalog, deadline) for sign, plan, _ in self.plan(query))
+
+    def explain(self, query):
+        return [f"{'+' if sign > 0 else '-'} {plan.describe()}" + (f" (estimated cost {cost:.3g})" if cost else "")
+                for sign, plan, cost in self.plan(query)]
+
+
+def normalize_sql(query):
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+
+def lsqb_sql(sql_dir=LSQB_SQL_DIR):
+    """Normalized text of the SQL files of sql/lsqb/ -> query name, to recognize them by their text."""
+    names = {}
+    for query in LSQB_QUERIES:
+        path = os.path.join(sql_dir, f"{query}.sql")
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                names[normalize_sql(file.read())] = query
+    return names
+
+
+class CountExecutorConnection(TrieJoinConnection):
+    """The count-only executor as a benchmark system for the LSQB SQL queries.
+
+    Queries are recognized by their file name or by their SQL text, so both `run_queries` and the concurrent runner
+    work on the files of POSTGRES_QUERY_DIR. All plans are built when the connection is created.
+    """
+
+    system = SYSTEM
+
+    def __init__(self, data_dir, queries=tuple(LSQB_QUERIES)):
+        self.data_dir = data_dir
+        self.executor = CountExecutor(data_dir)
+        self.names = lsqb_sql()
+        with Timer() as timer:
+            for query in queries:
+                self.executor.plan(query)
+        self.load_time = timer.wall_s
+        print(f"Planned {', '.join(queries)} in {self.load_time:.2f} seconds")
+        for query in queries:
+            print(f"{query}: " + "; ".join(self.executor.explain(query)))
+
+    def close(self):
+        self.executor = None
+
+    def resolve(self, query):
+        return query if query in LSQB_QUERIES else self.names.get(normalize_sql(query))
+
+    def supports(self, query):
+        return self.resolve(query) is not None
+
+    def execute(self, query, timeout_seconds=None):
+        name = self.resolve(query)
+        if name is None:
+            raise ValueError("Unsupported query: only the LSQB queries of sql/lsqb/ can run on the count executor")
+        deadline = monotonic_s() + timeout_seconds if timeout_seconds is not None else None
+        return [(self.executor.count(name, deadline),)]
+
+
+def compare(store_dir, scale_factor, variant="lsqb"):
+    """Median time of every system per query relative to the count executor, from the results store."""
+    results = load_results(store_dir, variant=variant, scale_factor=scale_factor)
+    if results.empty:
+        return results
+    times = results.pivot_table(index="filename", columns="system", values="median_execution_time_s")
+    if SYSTEM in times:
+        for system in [system for system in times.columns if system != SYSTEM]:
+            times[f"{system}/{SYSTEM}"] = times[system] / times[SYSTEM]
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the LSQB queries in process with cost-based count-only plans "
+                                                 "and compare them with the database runs")
+    parser.add_argument("data_dir", type=str, nargs="?", default=None,
+                        help="Data set directory in either format, e.g. data/social-network-sf1-merged-fk")
+    parser.add_argument("-q", "--queries", nargs="*", default=list(LSQB_QUERIES), choices=list(LSQB_QUERIES),
+                        help="Queries to run")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="Number of runs per query")
+    parser.add_argument("-t", "--timeout", type=int, default=600, help="Timeout per run in seconds")
+    parser.add_argument("-sf", "--scale-factor", type=str, default=None,
+                        help="Scale factor of the expected counts and the results store (default: from data_dir)")
+    parser.add_argument("-e", "--expected", type=str, default=EXPECTED_OUTPUT, help="Expected output file")
+    parser.add_argument("-o", "--result-dir", type=str, default=f"{SYSTEM}_results", help="Result directory")
+    parser.add_argument("-sd", "--store-dir", type=str, default=RESULTS_STORE_DIR,
+                        help="Directory of the partitioned Parquet results store")
+    parser.add_argument("-c", "--compare", action="store_true",
+                        help="Only print the stored median times of all systems relative to the count executor")
+    args = parser.parse_args()
+
+    scale_factor = args.scale_factor or (scale_factor_of(args.data_dir) if args.data_dir else None)
+    if args.compare:
+        print(compare(args.store_dir, scale_factor).to_string())
+        return
+    if args.data_dir is None:
+        parser.error("data_dir is required unless --compare is given")
+
+    expected = expected_counts(scale_factor, args.expected) if scale_factor else {}
+    connection = CountExecutorConnection(args.data_dir, args.queries)
+    try:
+        _, query_stats = connection.run_queries([(query, None) for query in args.queries], result_dir=args.result_dir,
+                                                runs=args.runs, timeout_seconds=args.timeout, expected=expected)
+    finally:
+        connection.close()
+
+    for stats in query_stats:
+        status = "no expected count" if stats["expected_count"] is None else (
+            "ok" if stats["count"] == stats["expected_count"] else "MISMATCH")
+        print(f"{stats['filename']}: {stats['count']} ({status}), median {stats['median_execution_time_s']} s, "
+              f"errors {stats['errors']}")
+    append_results(query_stats, SYSTEM, "lsqb", scale_factor, store_dir=args.store_dir)
+
+
+if __name__ == "__main__":
+    main()
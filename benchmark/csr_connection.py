@@ -0,0 +1,140 @@
+import csv
+import os
+import re
+import statistics
+
+from tqdm import tqdm
+
+from csr_graph import CSRGraph
+from iconnection import IConnection
+from repetitions import RepetitionScheduler, TIMEOUT
+from timing import Timer, monotonic_s, save_runs
+
+FOF_PATTERN = re.compile(r"\(start:\s*Person\s*\{id:\s*(\d+)\}\)-\[:KNOWS\*(\d+)\]-")
+# the BFS frontier queries of cypher/fof_frontier/, see fof_queries.fof_cypher
+FRONTIER_FOF_PATTERN = re.compile(
+    r"^MATCH \(start:\s*Person\s*\{id:\s*(\d+)\}\)\s*WITH \[start\] AS hop0.*RETURN ((?:size\(hop\d+\)(?: \+ )?)+) AS "
+    r"countOfPersons", re.DOTALL
+)
+SHORTEST_PATH_PATTERN = re.compile(
+    r"shortestPath\(\(start:\s*Person\s*\{id:\s*(\d+)\}\)-\[:KNOWS\*\.\.(\d+)\]-\(end:\s*Person\s*\{id:\s*(\d+)\}\)\)"
+)
+
+
+def frontier_fof(match):
+    """(start id, hops, within) of a FRONTIER_FOF_PATTERN match: `within` queries add up the size of every level."""
+    levels = [int(level) for level in re.findall(r"hop(\d+)", match.group(2))]
+    return int(match.group(1)), max(levels), len(levels) > 1
+
+
+class CSRConnection(IConnection):
+    """In-process baseline that answers the FOF and shortest path Cypher queries on a CSR adjacency structure.
+
+    There is no server involved, so the measured time is the graph work itself. The `-[:KNOWS*k]-` FOF queries of
+    cypher/fof/ enumerate every trail of k edges like Neo4j does, and the generated queries of cypher/fof_frontier/
+    count the BFS frontier at distance k (or within k hops); both give the same counts as the Cypher queries.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        with Timer() as timer:
+            self.graph = CSRGraph.from_store(data_dir)
+        self.load_time = timer.wall_s
+        print(f"Loaded CSR graph with {self.graph.num_vertices:_} vertices and {self.graph.num_edges:_} edges "
+              f"in {self.load_time:.2f} seconds")
+
+    def close(self):
+        self.graph = None
+
+    def execute(self, query_string, timeout_seconds=None):
+        deadline = monotonic_s() + timeout_seconds if timeout_seconds is not None else None
+        match = SHORTEST_PATH_PATTERN.search(query_string)
+        if match:
+            start_id, max_hops, end_id = (int(group) for group in match.groups())
+            path = self.graph.shortest_path(start_id, end_id, max_hops, deadline)
+            return [{"p": path}] if path is not None else []
+
+        match = FOF_PATTERN.search(query_string)
+        if match:
+            start_id, hops = (int(group) for group in match.groups())
+            return [{"countOfPersons": self.graph.k_trail_count(start_id, hops, deadline)}]
+
+        match = FRONTIER_FOF_PATTERN.search(query_string)
+        if match:
+            start_id, hops, within = frontier_fof(match)
+            return [{"countOfPersons": self.graph.k_hop_count(start_id, hops, deadline, within)}]
+
+        raise ValueError("Unsupported query: only FOF and shortest path queries can run on the CSR engine")
+
+    def run_queries(self, queries, result_dir="csr_results", runs=5, timeout_seconds=120, scheduler=None):
+        scheduler = scheduler or RepetitionScheduler(runs)
+        results = []
+        all_query_stats = []
+        for idx, (filename, query_string) in enumerate(queries):
+            execution_times = []
+            wall_times_ns = []
+            cpu_times_ns = []
+            query_errors = []
+            data = []
+            censored_runs = 0
+            schedule = scheduler.schedule(execution_times)
+            for warmup in tqdm(schedule, total=schedule.total, desc=f"Executing {filename}"):
+                try:
+                    with Timer() as timer:
+                        data = self.execute(query_string, timeout_seconds)
+                    if not warmup:
+                        execution_times.append(timer.wall_s)
+                        wall_times_ns.append(timer.wall_ns)
+                        cpu_times_ns.append(timer.cpu_ns)
+                except TimeoutError as e:
+                    # the engine checks its deadline between BFS levels, so it needs no watchdog
+                    query_errors.append(str(e))
+                    censored_runs += 1
+                    schedule.stop(TIMEOUT)
+                    break
+                except Exception as e:
+                    query_errors.append(f"{type(e).__name__}: {e}")
+                    schedule.stop()
+                    break
+
+            mean_time = statistics.mean(execution_times) if execution_times else None
+            stdev_time = statistics.stdev(execution_times) if len(execution_times) > 1 else 0
+            num_records = len(data) if data else 0
+
+            query_stats = {
+                "query_index": idx + 1,
+                "filename": filename,
+                "result": data,
+                "mean_execution_time_s": mean_time,
+                "std_dev_time_s": stdev_time,
+                "num_records": num_records,
+                "mean_cpu_time_s": statistics.mean(cpu_times_ns) / 1e9 if cpu_times_ns else None,
+                **schedule.summary(),
+                "censored_runs": censored_runs,
+                "execution_times": execution_times,
+                "wall_times_ns": wall_times_ns,
+                "cpu_times_ns": cpu_times_ns,
+                "errors": query_errors
+            }
+
+            all_query_stats.append(query_stats)
+            results.append({"data": data if data else []})
+        self.save_csr_results(all_query_stats, result_dir)
+        save_runs(all_query_stats, result_dir, "csr")
+        return results, all_query_stats
+
+    @staticmethod
+    def save_csr_results(all_results, result_dir):
+        if not os.path.exists(result_dir):
+            os.makedirs(result_dir)
+        filename = f"{result_dir}/csr_query_summary.csv"
+        with open(filename, "w", newline="") as file:
+            fieldnames = ['query_index', "filename", "result", 'mean_execution_time_s', 'std_dev_time_s', 'num_records',
+                          'mean_cpu_time_s', 'median_execution_time_s', 'median_ci_low_s', 'median_ci_high_s',
+                          'warmup_runs', 'stop_reason', 'censored_runs', 'errors']
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+            for result in all_results:
+                row = {key: result[key] for key in result if key in fieldnames}
+                row['errors'] = str(result['errors'])
+                writer.writerow(row)
@@ -0,0 +1,216 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_convert import open_table
+from timing import monotonic_s
+
+# partial trails expanded at once; larger trail sets are expanded in batches
+BATCH_ROWS = 1 << 21
+
+
+class CSRGraph:
+    """Undirected KNOWS graph stored as a compressed-sparse-row adjacency structure.
+
+    Person ids are remapped to dense vertex numbers 0..n-1; `ids[v]` maps back to the original id.
+    """
+
+    def __init__(self, ids, indptr, indices, edge_ids=None):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self._edge_ids = edge_ids
+
+    @property
+    def num_vertices(self):
+        return len(self.ids)
+
+    @property
+    def num_edges(self):
+        return len(self.indices) // 2
+
+    @classmethod
+    def from_edges(cls, src, dst):
+        ids, inverse = np.unique(np.concatenate([src, dst]), return_inverse=True)
+        inverse = inverse.astype(np.int64)
+        src, dst = inverse[:len(src)], inverse[len(src):]
+
+        # every KNOWS edge is traversable in both directions
+        sources = np.concatenate([src, dst])
+        targets = np.concatenate([dst, src])
+        order = np.lexsort((targets, sources))
+        sources, targets = sources[order], targets[order]
+
+        # drop duplicates in case the file already contains both directions
+        keep = np.ones(len(sources), dtype=bool)
+        keep[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets = sources[keep], targets[keep]
+
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(ids)), out=indptr[1:])
+        return cls(ids, indptr, targets)
+
+    @classmethod
+    def from_csv(cls, data_dir):
+        """Load `Person_knows_Person.csv` from a projected-fk or merged-fk data set directory."""
+        path = os.path.join(data_dir, "Person_knows_Person.csv")
+        edges = pd.read_csv(path, delimiter='|', usecols=[0, 1], dtype=np.int64, engine='c')
+        return cls.from_edges(edges.iloc[:, 0].to_numpy(), edges.iloc[:, 1].to_numpy())
+
+    @classmethod
+    def from_store(cls, data_dir, store_dir=None):
+        """Load `Person_knows_Person` through the column store, which only parses the CSV file on first use."""
+        (src, _), (dst, _) = list(open_table(data_dir, "Person_knows_Person", store_dir).values())[:2]
+        return cls.from_edges(src, dst)
+
+    @property
+    def edge_ids(self):
+        """Id of the undirected edge of every entry of `indices`: the smaller position of its two directions."""
+        if self._edge_ids is None:
+            sources = np.repeat(np.arange(self.num_vertices, dtype=np.int64), np.diff(self.indptr))
+            # (source, target) pairs are sorted, so the reverse direction of an entry is found by binary search
+            keys = sources * self.num_vertices + self.indices
+            reverse = np.searchsorted(keys, self.indices * self.num_vertices + sources)
+            self._edge_ids = np.minimum(np.arange(len(keys), dtype=np.int64), reverse)
+        return self._edge_ids
+
+    def vertex(self, person_id):
+        pos = np.searchsorted(self.ids, person_id)
+        if pos == len(self.ids) or self.ids[pos] != person_id:
+            return None
+        return int(pos)
+
+    def neighbors(self, frontier):
+        """Return (neighbor, owner) arrays for all edges leaving the vertices in `frontier`."""
+        positions, owners = self.edge_positions(frontier)
+        return self.indices[positions], frontier[owners]
+
+    def edge_positions(self, frontier):
+        """Return the positions in `indices` of all edges leaving the vertices in `frontier` and their owner rows."""
+        starts = self.indptr[frontier]
+        counts = self.indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        owners = np.repeat(np.arange(len(frontier), dtype=np.int64), counts)
+        offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+        return np.repeat(starts, counts) + offsets, owners
+
+    def k_hop_frontier(self, person_id, hops, deadline=None):
+        """Vertices whose shortest distance from `person_id` is exactly `hops`, and the mask of all vertices within."""
+        visited = np.zeros(self.num_vertices, dtype=bool)
+        source = self.vertex(person_id)
+        if source is None:
+            return np.empty(0, dtype=np.int64), visited
+
+        visited[source] = True
+        frontier = np.array([source], dtype=np.int64)
+        for _ in range(hops):
+            _check_deadline(deadline)
+            reached, _ = self.neighbors(frontier)
+            frontier = np.unique(reached[~visited[reached]])
+            visited[frontier] = True
+            if len(frontier) == 0:
+                break
+        return frontier, visited
+
+    def k_hop_count(self, person_id, hops, deadline=None, within=False):
+        """Persons at shortest distance exactly `hops` (or 1..hops with `within`), as in cypher/fof_frontier/."""
+        frontier, visited = self.k_hop_frontier(person_id, hops, deadline)
+        return max(int(visited.sum()) - 1, 0) if within else len(frontier)
+
+    def extend_trails(self, vertices, used):
+        """Extend every trail, given by its last vertex and the ids of its edges, by each edge it has not used yet."""
+        positions, owners = self.edge_positions(vertices)
+        edges = self.edge_ids[positions]
+        used = used[owners]
+        fresh = ~(used == edges[:, None]).any(axis=1)
+        return self.indices[positions[fresh]], np.column_stack([used[fresh], edges[fresh]])
+
+    def mark_trail_ends(self, vertices, used, hops, reached, deadline=None, batch_rows=BATCH_ROWS):
+        """Set `reached` for the last vertex of every extension of the given trails by exactly `hops` edges.
+
+        The number of trails grows exponentially with `hops`, so they are extended breadth-first in batches of at
+        most `batch_rows` partial trails.
+        """
+        if hops == 0:
+            reached[vertices] = True
+            return
+        _check_deadline(deadline)
+        counts = self.indptr[vertices + 1] - self.indptr[vertices]
+        if len(vertices) > 1 and counts.sum() > batch_rows:
+            bounds = np.flatnonzero(np.diff((np.cumsum(counts) - counts) // batch_rows)) + 1
+            if len(bounds):
+                for batch_vertices, batch_used in zip(np.split(vertices, bounds), np.split(used, bounds)):
+                    self.mark_trail_ends(batch_vertices, batch_used, hops, reached, deadline, batch_rows)
+                return
+        vertices, used = self.extend_trails(vertices, used)
+        self.mark_trail_ends(vertices, used, hops - 1, reached, deadline, batch_rows)
+
+    def k_trail_count(self, person_id, hops, deadline=None):
+        """Persons other than `person_id` at the end of a trail of exactly `hops` edges from it.
+
+        A trail may revisit persons but not KNOWS edges, which are the semantics of `-[:KNOWS*k]-` with
+        `COUNT(DISTINCT fof.id)` in cypher/fof/. Every trail is enumerated, like the database engines do.
+        """
+        source = self.vertex(person_id)
+        if source is None:
+            return 0
+        reached = np.zeros(self.num_vertices, dtype=bool)
+        self.mark_trail_ends(np.array([source], dtype=np.int64), np.empty((1, 0), dtype=np.int64), hops, reached,
+                             deadline)
+        reached[source] = False
+        return int(reached.sum())
+
+    def shortest_path(self, start_id, end_id, max_hops, deadline=None):
+        """Bidirectional level-synchronous BFS; returns the list of person ids on the path or None."""
+        source, target = self.vertex(start_id), self.vertex(end_id)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return [int(start_id)]
+
+        parents = [np.full(self.num_vertices, -1, dtype=np.int64), np.full(self.num_vertices, -1, dtype=np.int64)]
+        depths = [np.full(self.num_vertices, -1, dtype=np.int64), np.full(self.num_vertices, -1, dtype=np.int64)]
+        parents[0][source], depths[0][source] = source, 0
+        parents[1][target], depths[1][target] = target, 0
+        levels = [0, 0]
+        frontiers = [np.array([source], dtype=np.int64), np.array([target], dtype=np.int64)]
+
+        for _ in range(max_hops):
+            _check_deadline(deadline)
+            # always expand the smaller side
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            reached, owners = self.neighbors(frontiers[side])
+            new = parents[side][reached] == -1
+            reached, first = np.unique(reached[new], return_index=True)
+            levels[side] += 1
+            parents[side][reached] = owners[new][first]
+            depths[side][reached] = levels[side]
+            frontiers[side] = reached
+
+            meet = reached[depths[1 - side][reached] != -1]
+            if len(meet) > 0:
+                # the closest vertex on the other side gives the shortest combined path
+                return self._join_paths(parents, int(meet[np.argmin(depths[1 - side][meet])]))
+            if len(reached) == 0:
+                return None
+        return None
+
+    def _join_paths(self, parents, meet):
+        forward = [meet]
+        while parents[0][forward[-1]] != forward[-1]:
+            forward.append(int(parents[0][forward[-1]]))
+        backward = []
+        vertex = meet
+        while parents[1][vertex] != vertex:
+            vertex = int(parents[1][vertex])
+            backward.append(vertex)
+        return [int(self.ids[v]) for v in reversed(forward)] + [int(self.ids[v]) for v in backward]
+
+
+def _check_deadline(deadline):
+    if deadline is not None and monotonic_s() > deadline:
+        raise TimeoutError("Query exceeded the configured timeout")
@@ -0,0 +1,238 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from column_store import column_store_dir, is_current, read_column, read_table, write_table, table_columns
+from pg_loader import CHUNK_ROWS, read_csv_chunks
+from timing import Timer
+
+MERGED_FK = "merged-fk"
+PROJECTED_FK = "projected-fk"
+FORMATS = [MERGED_FK, PROJECTED_FK]
+
+# node table -> (merged-fk column, projected-fk relationship file) of every foreign key, in merged-fk column order
+NODE_TABLES = {
+    "Company": [("islocatedin_country", "Company_isLocatedIn_Country")],
+    "University": [("islocatedin_city", "University_isLocatedIn_City")],
+    "Continent": [],
+    "Country": [("ispartof_continent", "Country_isPartOf_Continent")],
+    "City": [("ispartof_country", "City_isPartOf_Country")],
+    "Forum": [("hasmoderator_person", "Forum_hasModerator_Person")],
+    "Comment": [("hascreator_person", "Comment_hasCreator_Person"),
+                ("islocatedin_country", "Comment_isLocatedIn_Country"),
+                ("replyof_post", "Comment_replyOf_Post"),
+                ("replyof_comment", "Comment_replyOf_Comment")],
+    # the only foreign key that points the other way: the relationship starts at the Forum
+    "Post": [("hascreator_person", "Post_hasCreator_Person"),
+             ("forum_containerof", "Forum_containerOf_Post"),
+             ("islocatedin_country", "Post_isLocatedIn_Country")],
+    "Person": [("islocatedin_city", "Person_isLocatedIn_City")],
+    "Tag": [("hastype_tagclass", "Tag_hasType_TagClass")],
+    "TagClass": [("issubclassof_tagclass", "TagClass_isSubclassOf_TagClass")],
+}
+# many-to-many tables, the same rows in both formats
+EDGE_TABLES = ["Comment_hasTag_Tag", "Post_hasTag_Tag", "Forum_hasMember_Person", "Forum_hasTag_Tag",
+               "Person_hasInterest_Tag", "Person_likes_Comment", "Person_likes_Post", "Person_studyAt_University",
+               "Person_workAt_Company", "Person_knows_Person"]
+TABLES = list(NODE_TABLES) + EDGE_TABLES
+
+
+def merged_columns(table):
+    if table in NODE_TABLES:
+        return ["id"] + [column for column, _ in NODE_TABLES[table]]
+    if table == "Person_knows_Person":
+        return ["person1id", "person2id"]
+    _, relationship, target = table.split("_")
+    return ["id", f"{relationship}_{target}".lower()]
+
+
+def relationship_header(relationship):
+    source, _, target = relationship.split("_")
+    return f":START_ID({source})|:END_ID({target})"
+
+
+def is_reversed(table, relationship):
+    """True if the foreign key column of `table` holds the start instead of the end of the relationship."""
+    return relationship.split("_")[0] != table
+
+
+def detect_format(data_dir):
+    return PROJECTED_FK if os.path.exists(os.path.join(data_dir, "Comment_hasCreator_Person.csv")) else MERGED_FK
+
+
+def converted_dir(data_dir, target):
+    base = os.path.normpath(data_dir)
+    for data_format in FORMATS:
+        if base.endswith(f"-{data_format}"):
+            return base[:-len(data_format)] + target
+    return f"{base}-{target}"
+
+
+def csv_path(data_dir, name):
+    return os.path.join(data_dir, f"{name}.csv")
+
+
+def csv_chunks(data_dir, name, chunk_rows):
+    return read_csv_chunks(csv_path(data_dir, name), chunk_rows)
+
+
+def import_csv(data_dir, store_dir, table, chunk_rows=CHUNK_ROWS):
+    """Parse one CSV file that holds all columns of a table: every merged-fk file and the projected-fk edge tables."""
+    rows = write_table(store_dir, table, merged_columns(table), csv_chunks(data_dir, table, chunk_rows),
+                       sources=[csv_path(data_dir, table)])
+    print(f"Imported {rows:_} rows of {table}")
+
+
+def foreign_key_column(ids, starts, ends):
+    """Align a to-one relationship with the node ids: the end of the relationship of every node, or NULL."""
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    if len(starts) > 1 and (starts[1:] == starts[:-1]).any():
+        raise ValueError("A to-one relationship has more than one end for some start node")
+    positions = np.minimum(np.searchsorted(starts, ids), max(len(starts) - 1, 0))
+    found = (starts[positions] == ids) if len(starts) else np.zeros(len(ids), dtype=bool)
+    values = np.where(found, ends[positions] if len(ends) else 0, 0)
+    return values, ~found
+
+
+def read_csv_columns(data_dir, name, chunk_rows):
+    chunks = list(csv_chunks(data_dir, name, chunk_rows))
+    if not chunks:
+        return [np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)]
+    return [np.concatenate([chunk[index][0] for chunk in chunks]) for index in range(len(chunks[0]))]
+
+
+def import_projected_node(data_dir, store_dir, table, chunk_rows=CHUNK_ROWS):
+    """Join the to-one relationship files of a projected-fk node table back into its merged-fk columns.
+
+    Only the ids and one relationship at a time are held in memory.
+    """
+    foreign_keys = NODE_TABLES[table]
+    ids = read_csv_columns(data_dir, table, chunk_rows)[0]
+    columns = [(ids, None)]
+    for _, relationship in foreign_keys:
+        starts, ends = read_csv_columns(data_dir, relationship, chunk_rows)[:2]
+        if is_reversed(table, relationship):
+            starts, ends = ends, starts
+        columns.append(foreign_key_column(ids, starts, ends))
+    chunks = ([(values[start:start + chunk_rows], null if null is None else null[start:start + chunk_rows])
+               for values, null in columns] for start in range(0, len(ids), chunk_rows))
+    sources = [csv_path(data_dir, name) for name in [table] + [relationship for _, relationship in foreign_keys]]
+    rows = write_table(store_dir, table, merged_columns(table), chunks, sources)
+    print(f"Imported {rows:_} rows of {table} with {len(foreign_keys)} relationships")
+
+
+def import_table(data_dir, store_dir, table, source=None, chunk_rows=CHUNK_ROWS):
+    source = source or detect_format(data_dir)
+    if source == PROJECTED_FK and table in NODE_TABLES:
+        import_projected_node(data_dir, store_dir, table, chunk_rows)
+    else:
+        import_csv(data_dir, store_dir, table, chunk_rows)
+
+
+def write_csv(path, header, columns, chunk_rows=CHUNK_ROWS):
+    """Write (values, null_mask) columns as a '|' separated CSV file chunk by chunk; NULLs become empty fields."""
+    num_rows = len(columns[0][0]) if columns else 0
+    with open(path, "w", newline="") as file:
+        file.write(header + "\n")
+        for start in range(0, num_rows, chunk_rows):
+            frame = pd.DataFrame({
+                index: pd.arrays.IntegerArray(
+                    np.array(values[start:start + chunk_rows], dtype=np.int64),
+                    np.zeros(min(chunk_rows, num_rows - start), dtype=bool) if null is None
+                    else np.array(null[start:start + chunk_rows], dtype=bool))
+                for index, (values, null) in enumerate(columns)
+            })
+            frame.to_csv(file, sep="|", header=False, index=False)
+
+
+def export_merged(store_dir, out_dir, chunk_rows=CHUNK_ROWS):
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    for table in TABLES:
+        columns = table_columns(store_dir, table)
+        write_csv(os.path.join(out_dir, f"{table}.csv"), "|".join(columns),
+                  list(read_table(store_dir, table).values()), chunk_rows)
+
+
+def export_projected(store_dir, out_dir, chunk_rows=CHUNK_ROWS):
+    """Write the projected-fk files: node files with only the id and one relationship file per foreign key."""
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    for table, foreign_keys in NODE_TABLES.items():
+        ids, _ = read_column(store_dir, table, "id")
+        write_csv(os.path.join(out_dir, f"{table}.csv"), f"id:ID({table})", [(ids, None)], chunk_rows)
+        for column, relationship in foreign_keys:
+            values, null = read_column(store_dir, table, column)
+            starts, ends = (ids, values) if null is None else (ids[~null], values[~null])
+            if is_reversed(table, relationship):
+                starts, ends = ends, starts
+            write_csv(os.path.join(out_dir, f"{relationship}.csv"), relationship_header(relationship),
+                      [(starts, None), (ends, None)], chunk_rows)
+    for table in EDGE_TABLES:
+        write_csv(os.path.join(out_dir, f"{table}.csv"), relationship_header(table),
+                  list(read_table(store_dir, table).values()), chunk_rows)
+
+
+def build_store(data_dir, store_dir=None, chunk_rows=CHUNK_ROWS, rebuild=False):
+    """Import the missing and stale tables of the column store from whichever CSV format `data_dir` holds."""
+    store_dir = store_dir or column_store_dir(data_dir)
+    stale = [table for table in TABLES if rebuild or not is_current(store_dir, table)]
+    if not stale:
+        print(f"Reusing the column store {store_dir}")
+        return store_dir
+    source = detect_format(data_dir)
+    with Timer() as timer:
+        for table in stale:
+            import_table(data_dir, store_dir, table, source, chunk_rows)
+    print(f"Built {len(stale)} tables of the column store {store_dir} from {source} CSV files in {timer.wall_s:.2f} s")
+    return store_dir
+
+
+def open_table(data_dir, table, store_dir=None, chunk_rows=CHUNK_ROWS):
+    """Columns of one table of a data set as read-only memory maps, see `column_store.read_table`.
+
+    The CSV files are only parsed the first time and after they changed; afterwards opening a table just maps its
+    column files. Works for any directory with LSQB-style CSV files, e.g. the generated graphs.
+    """
+    store_dir = store_dir or column_store_dir(data_dir)
+    if not is_current(store_dir, table):
+        import_table(data_dir, store_dir, table, chunk_rows=chunk_rows)
+    return read_table(store_dir, table)
+
+
+def convert(data_dir, out_dir=None, target=None, store_dir=None, chunk_rows=CHUNK_ROWS, rebuild=False):
+    """Derive the other CSV format of a data set through its column store and return the output directory."""
+    target = target or (MERGED_FK if detect_format(data_dir) == PROJECTED_FK else PROJECTED_FK)
+    out_dir = out_dir or converted_dir(data_dir, target)
+    store_dir = build_store(data_dir, store_dir, chunk_rows, rebuild)
+    with Timer() as timer:
+        if target == MERGED_FK:
+            export_merged(store_dir, out_dir, chunk_rows)
+        else:
+            export_projected(store_dir, out_dir, chunk_rows)
+    print(f"Wrote the {target} files to {out_dir} in {timer.wall_s:.2f} s")
+    return out_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Derive the projected-fk files of an LSQB data set from the "
+                                                 "merged-fk files or vice versa, through a memory-mapped column store")
+    parser.add_argument("data_dir", type=str, help="Data set directory in either format, e.g. "
+                                                   "data/social-network-sf1-merged-fk")
+    parser.add_argument("-o", "--out-dir", type=str, default=None,
+                        help="Output directory (default: the data set directory with the other format suffix)")
+    parser.add_argument("-f", "--format", type=str, default=None, choices=FORMATS,
+                        help="Format to write (default: the format data_dir is not in)")
+    parser.add_argument("-cs", "--column-store", type=str, default=None,
+                        help="Column store directory (default: the data set directory with the suffix -columns)")
+    parser.add_argument("-so", "--store-only", action="store_true", help="Only build the column store")
+    parser.add_argument("-r", "--rebuild", action="store_true", help="Rebuild the column store from the CSV files")
+    parser.add_argument("-c", "--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows parsed and written at once")
+    args = parser.parse_args()
+    if args.store_only:
+        build_store(args.data_dir, args.column_store, args.chunk_rows, args.rebuild)
+    else:
+        convert(args.data_dir, args.out_dir, args.format, args.column_store, args.chunk_rows, args.rebuild)
@@ -1,12 +1,23 @@
+import argparse
+import os
+
 import matplotlib.pyplot as plt
 
 plt.style.use("default")
 import numpy as np
 import pandas as pd
 
+from results_store import RESULTS_STORE_DIR, ensure_store, load_results
+
 NEO4J_DIR = "neo4j_results"
 POSTGRES_DIR = "postgres_results"
-db_colors = {'Neo4j': 'tab:blue', 'Neo4j-index': 'tab:cyan', 'Postgres': 'tab:orange'}
+db_colors = {'Neo4j': 'tab:blue', 'Neo4j-index': 'tab:cyan', 'Postgres': 'tab:orange', 'CSR': 'tab:green'}
+system_labels = {'neo4j': 'Neo4j', 'postgres': 'Postgres', 'csr': 'CSR'}
+
+FOF_CONFIGURATIONS = ["100K-50reg", "50K-100reg", "1M-5reg", "1M-10reg", "1M-20reg"]
+LSQB_SCALE_FACTORS = ["0.1", "0.3", "1"]
+TIDY_COLUMNS = ["system", "variant", "scale_factor", "query_index", "filename", "mean_execution_time_s",
+                "std_dev_time_s", "num_edges"]
 
 
 def verify_results(num_queries):
@@ -34,18 +45,46 @@ def verify_results(num_queries):
         print('There are differences in the query results between the two databases.')
 
 
-def evaluate_lsqb(show_whiskers=True):
-    neo4j_df = pd.read_csv(f'{NEO4J_DIR}/neo4j_lsqb-1_5-times_summary.csv')
-    postgres_df = pd.read_csv(f'{POSTGRES_DIR}/postgres_lsqb-1_5-times_summary.csv')
+def load_tidy(store_dir=RESULTS_STORE_DIR):
+    """Load the latest result of every system/variant/scale factor/query in one pass.
+
+    The `series` column is the label used in the figures; index variants such as `fof-index` and the cache states of
+    `benchmark.py --cache-state` (`lsqb-cold`, `lsqb-warm`) get their own series.
+    """
+    df = load_results(store_dir, columns=TIDY_COLUMNS)
+    labels = df["system"].map(system_labels).fillna(df["system"])
+    df["series"] = labels + df["variant"].str.extract(r"(-index|-cold|-warm)$", expand=False).fillna("")
+    return df
+
+
+def pivot_metric(df, variants, value="mean_execution_time_s"):
+    """Return `value` with a (scale_factor, query_index) index and one column per series."""
+    subset = df[df["variant"].isin(variants)]
+    return subset.set_index(["scale_factor", "query_index", "series"])[value].unstack("series")
+
 
-    if len(neo4j_df) != len(postgres_df):
+def speed_differences(neo4j_means, postgres_means):
+    return ((postgres_means - neo4j_means) / neo4j_means) * 100
+
+
+def print_speed_differences(speed_diff_percent):
+    for i, diff in enumerate(speed_diff_percent):
+        print(f"Query {i + 1}: PostgreSQL is {'faster' if diff < 0 else 'slower'} than Neo4j by {abs(diff):.2f}%")
+
+
+def evaluate_lsqb(df, show_whiskers=True, scale_factor="1"):
+    query_counts = df[(df["variant"] == "lsqb") & (df["scale_factor"] == scale_factor)].groupby("series").size()
+    if query_counts.get("Neo4j") != query_counts.get("Postgres"):
         print("Number of queries differ between Neo4j and PostgreSQL.")
-        return
+        return None
+
+    means = pivot_metric(df, ["lsqb"]).loc[scale_factor]
+    std_devs = pivot_metric(df, ["lsqb"], "std_dev_time_s").loc[scale_factor]
 
-    neo4j_means = neo4j_df['mean_execution_time_s']
-    postgres_means = postgres_df['mean_execution_time_s']
-    neo4j_std_devs = neo4j_df['std_dev_time_s']
-    postgres_std_devs = postgres_df['std_dev_time_s']
+    neo4j_means = means["Neo4j"].to_numpy()
+    postgres_means = means["Postgres"].to_numpy()
+    neo4j_std_devs = std_devs["Neo4j"].to_numpy()
+    postgres_std_devs = std_devs["Postgres"].to_numpy()
 
     num_queries = len(neo4j_means)
     index = np.arange(num_queries) * 3
@@ -60,11 +99,7 @@ def evaluate_lsqb(show_whiskers=True):
         bars1 = ax.bar(index, neo4j_means, bar_width, label='Neo4j', alpha=0.7)
         bars2 = ax.bar(index + bar_width, postgres_means, bar_width, label='PostgreSQL', alpha=0.7)
 
-    for bar in bars1:
-        yval = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width() / 2, yval, round(yval, 2), ha='center', va='bottom', fontsize=8)
-
-    for bar in bars2:
+    for bar in [*bars1, *bars2]:
         yval = bar.get_height()
         ax.text(bar.get_x() + bar.get_width() / 2, yval, round(yval, 2), ha='center', va='bottom', fontsize=8)
 
@@ -78,44 +113,30 @@ def evaluate_lsqb(show_whiskers=True):
     ax.yaxis.grid(True, linestyle='--', which='major', color='grey', alpha=0.7)
 
     plt.tight_layout()
-    plt.show()
 
-    speed_diff_percent = ((postgres_means - neo4j_means) / neo4j_means) * 100
-    for i in range(len(speed_diff_percent)):
-        print(
-            f"Query {i + 1}: PostgreSQL is {'faster' if speed_diff_percent[i] < 0 else 'slower'} than Neo4j by {abs(speed_diff_percent[i]):.2f}%")
+    print_speed_differences(speed_differences(neo4j_means, postgres_means))
+    return fig
 
 
-def evaluate_fof_across_configurations(configurations):
+def evaluate_fof_across_configurations(df, configurations):
     num_queries = 8
     fig, axs = plt.subplots(3, 3, figsize=(15, 15), constrained_layout=True)
     axs = axs.flatten()
     bar_width = 0.7
 
+    means = pivot_metric(df, ["fof"]).reindex(columns=["Neo4j", "Postgres"])
+    indices = np.arange(len(configurations)) * 2 + bar_width / 2
+
     for query_index in range(1, num_queries + 1):
         ax = axs[query_index - 1]
-        neo4j_line_data = []
-        postgres_line_data = []
-
-        for i, config in enumerate(configurations):
-            neo4j_df = pd.read_csv(f'{NEO4J_DIR}/neo4j_{config}_summary.csv')
-            postgres_df = pd.read_csv(f'{POSTGRES_DIR}/postgres_{config}_summary.csv')
+        query_means = means.xs(query_index, level="query_index").reindex(configurations)
 
-            neo4j_means = neo4j_df.loc[neo4j_df['query_index'] == query_index, 'mean_execution_time_s']
-            postgres_means = postgres_df.loc[postgres_df['query_index'] == query_index, 'mean_execution_time_s']
+        neo4j_bar = ax.bar(indices, query_means["Neo4j"], bar_width, color=db_colors['Neo4j'], alpha=0.7)
+        postgres_bar = ax.bar(indices + bar_width, query_means["Postgres"], bar_width, color=db_colors['Postgres'],
+                              alpha=0.7)
 
-            neo4j_line_data.append(neo4j_means.values[0] if not neo4j_means.empty else None)
-            postgres_line_data.append(postgres_means.values[0] if not postgres_means.empty else None)
-
-            index = np.arange(1) * len(configurations) + i * 2 + (bar_width / 2)
-            neo4j_bar = ax.bar(index, neo4j_means, bar_width, label='Neo4j' if i == 0 else "", color=db_colors['Neo4j'],
-                               alpha=0.7)
-            postgres_bar = ax.bar(index + bar_width, postgres_means, bar_width, label='Postgres' if i == 0 else "",
-                                  color=db_colors['Postgres'], alpha=0.7)
-
-        indices = np.array(range(len(configurations))) * 2 + bar_width / 2
-        ax.plot(indices, neo4j_line_data, '-', marker='^', color=db_colors['Neo4j'])
-        ax.plot(indices + bar_width, postgres_line_data, '-', marker='s', color=db_colors['Postgres'])
+        ax.plot(indices, query_means["Neo4j"], '-', marker='^', color=db_colors['Neo4j'])
+        ax.plot(indices + bar_width, query_means["Postgres"], '-', marker='s', color=db_colors['Postgres'])
 
         ax.set_title(f'FOF {query_index} hops')
         ax.set_xlabel('Configurations')
@@ -128,58 +149,31 @@ def evaluate_fof_across_configurations(configurations):
             ax.legend([neo4j_bar, postgres_bar], ['Neo4j', 'Postgres'], title="Database", loc='upper left')
 
     axs[-1].axis('off')
-
-    plt.show()
+    return fig
 
 
-def evaluate_fof_lsqb_across_scaling_factors(configurations):
+def evaluate_fof_lsqb_across_scaling_factors(df, configurations):
     num_queries = 8
     fig, axs = plt.subplots(3, 3, figsize=(15, 15), constrained_layout=True)
     axs = axs.flatten()
     bar_width = 0.2
 
     group_spacing = 0.5
+    series = ['Neo4j', 'Neo4j-index', 'Postgres']
+    markers = ['^', '^', 's']
+
+    means = pivot_metric(df, ["fof", "fof-index"]).reindex(columns=series)
+    base_indices = np.arange(len(configurations)) * (3 * bar_width + group_spacing)
 
     for query_index in range(1, num_queries + 1):
         ax = axs[query_index - 1]
-        neo4j_line_data = []
-        neo4j_index_line_data = []
-        postgres_line_data = []
-
-        base_indices = np.arange(len(configurations)) * (3 * bar_width + group_spacing)
-
-        for i, config in enumerate(configurations):
-            try:
-                neo4j_df = pd.read_csv(f'{NEO4J_DIR}/neo4j_lsqb-{config}_5-times_fof.csv')
-                neo4j_mean = neo4j_df.loc[neo4j_df['query_index'] == query_index, 'mean_execution_time_s'].values[0]
-            except Exception as _:
-                neo4j_mean = 0
+        # missing measurements (e.g. timeouts) are drawn as 0 like in the original CSV based plots
+        query_means = means.xs(query_index, level="query_index").reindex(configurations).fillna(0)
 
-            try:
-                neo4j_index_df = pd.read_csv(f'{NEO4J_DIR}/neo4j_lsqb-{config}_5-times_fof-index.csv')
-                neo4j_index_mean = \
-                    neo4j_index_df.loc[neo4j_index_df['query_index'] == query_index, 'mean_execution_time_s'].values[0]
-            except Exception as _:
-                neo4j_index_mean = 0
-
-            try:
-                postgres_df = pd.read_csv(f'{POSTGRES_DIR}/postgres_lsqb-{config}_5-times_fof.csv')
-                postgres_mean = \
-                    postgres_df.loc[postgres_df['query_index'] == query_index, 'mean_execution_time_s'].values[0]
-            except Exception as _:
-                postgres_mean = 0
-
-            neo4j_line_data.append(neo4j_mean)
-            neo4j_index_line_data.append(neo4j_index_mean)
-            postgres_line_data.append(postgres_mean)
-
-            ax.bar(base_indices[i], neo4j_mean, bar_width, color=db_colors['Neo4j'], alpha=0.7)
-            ax.bar(base_indices[i] + bar_width, neo4j_index_mean, bar_width, color=db_colors['Neo4j-index'], alpha=0.7)
-            ax.bar(base_indices[i] + 2 * bar_width, postgres_mean, bar_width, color=db_colors['Postgres'], alpha=0.7)
-
-        ax.plot(base_indices, neo4j_line_data, '-', marker='^', color=db_colors['Neo4j'])
-        ax.plot(base_indices + bar_width, neo4j_index_line_data, '-', marker='^', color=db_colors['Neo4j-index'])
-        ax.plot(base_indices + 2 * bar_width, postgres_line_data, '-', marker='s', color=db_colors['Postgres'])
+        for offset, (name, marker) in enumerate(zip(series, markers)):
+            ax.bar(base_indices + offset * bar_width, query_means[name], bar_width, color=db_colors[name], alpha=0.7)
+        for offset, (name, marker) in enumerate(zip(series, markers)):
+            ax.plot(base_indices + offset * bar_width, query_means[name], '-', marker=marker, color=db_colors[name])
 
         ax.set_title(f'FOF {query_index} hops')
         ax.set_xlabel('Configurations')
@@ -192,151 +186,134 @@ def evaluate_fof_lsqb_across_scaling_factors(configurations):
             ax.legend(['Neo4j', 'Neo4j index', 'Postgres'], title="Database", loc='upper left')
 
     axs[-1].axis('off')
-
-    plt.show()
+    return fig
 
 
-def evaluate_queries_across_scaling_factors(scaling_factors):
+def evaluate_queries_across_scaling_factors(df, scaling_factors):
     num_queries = 9
     fig, axs = plt.subplots(3, 3, figsize=(15, 15), constrained_layout=True)
     axs = axs.flatten()
 
     bar_width = 0.7
-    db_colors = {'Neo4j': 'tab:blue', 'Postgres': 'tab:orange'}
+    means = pivot_metric(df, ["lsqb"]).reindex(columns=["Neo4j", "Postgres"])
+    indices = np.arange(len(scaling_factors)) * 2 * (bar_width + 0.1)
 
     for query_index in range(1, num_queries + 1):
         ax = axs[query_index - 1]
-        neo4j_line_data = []
-        postgres_line_data = []
-        indices = []
-
-        for i, scaling_factor in enumerate(scaling_factors):
-            neo4j_df = pd.read_csv(f'{NEO4J_DIR}/neo4j_lsqb-{scaling_factor}_5-times_summary.csv')
-            postgres_df = pd.read_csv(f'{POSTGRES_DIR}/postgres_lsqb-{scaling_factor}_5-times_summary.csv')
-
-            neo4j_means = neo4j_df.loc[neo4j_df['query_index'] == query_index, 'mean_execution_time_s']
-            postgres_means = postgres_df.loc[postgres_df['query_index'] == query_index, 'mean_execution_time_s']
-
-            neo4j_line_data.append(neo4j_means.values[0] if not neo4j_means.empty else None)
-            postgres_line_data.append(postgres_means.values[0] if not postgres_means.empty else None)
+        query_means = means.xs(query_index, level="query_index").reindex([str(sf) for sf in scaling_factors])
 
-            index = i * 2 * (bar_width + 0.1)
-            indices.append(index)
+        bars1 = ax.bar(indices, query_means["Neo4j"], bar_width, color=db_colors['Neo4j'], alpha=0.7)
+        bars2 = ax.bar(indices + bar_width, query_means["Postgres"], bar_width, color=db_colors['Postgres'], alpha=0.7)
 
-            bar1 = ax.bar(index, neo4j_means, bar_width, color=db_colors['Neo4j'], alpha=0.7)
-            bar2 = ax.bar(index + bar_width, postgres_means, bar_width, color=db_colors['Postgres'], alpha=0.7)
-
-            for bar, value in zip([bar1, bar2], [neo4j_means.values[0], postgres_means.values[0]]):
-                ax.annotate(f'{value:.2f}s',
-                            xy=(bar[0].get_x() + bar[0].get_width() / 2, value),
-                            xytext=(0, 3),
-                            textcoords="offset points",
-                            ha='center', va='bottom')
+        for bar, value in zip([*bars1, *bars2], [*query_means["Neo4j"], *query_means["Postgres"]]):
+            if pd.isna(value):
+                continue
+            ax.annotate(f'{value:.2f}s',
+                        xy=(bar.get_x() + bar.get_width() / 2, value),
+                        xytext=(0, 3),
+                        textcoords="offset points",
+                        ha='center', va='bottom')
 
-        ax.plot(indices, neo4j_line_data, '-', marker='^', color=db_colors['Neo4j'],
+        ax.plot(indices, query_means["Neo4j"], '-', marker='^', color=db_colors['Neo4j'],
                 label='Neo4j Trend' if query_index == 1 else "")
-        ax.plot([x + bar_width for x in indices], postgres_line_data, '-', marker='s', color=db_colors['Postgres'],
+        ax.plot(indices + bar_width, query_means["Postgres"], '-', marker='s', color=db_colors['Postgres'],
                 label='Postgres Trend' if query_index == 1 else "")
 
         ax.set_title(f'Q{query_index}')
         ax.set_xlabel('Scaling Factors')
         ax.set_ylabel('Execution Time (s)')
         ax.set_yscale('log')
-        ax.set_xticks([x + bar_width / 2 for x in indices])
+        ax.set_xticks(indices + bar_width / 2)
         ax.set_xticklabels([f'{sf}' for sf in scaling_factors])
 
         if query_index == 1:
-            ax.legend([ax.bar(0, 0, color=db_colors['Neo4j'], alpha=0.7),
-                       ax.bar(0, 0, color=db_colors['Postgres'], alpha=0.7)],
-                      ['Neo4j', 'Postgres'], title="Database")
+            ax.legend([bars1, bars2], ['Neo4j', 'Postgres'], title="Database")
 
-    plt.show()
+    return fig
 
 
-def evaluate_shortest_path():
-    neo4j_data = pd.read_csv(f'{NEO4J_DIR}/neo4j_shortest_path.csv')
-    postgres_data = pd.read_csv(f'{POSTGRES_DIR}/postgres_shortest_path.csv')
-    neo4j_data['query_index'] = neo4j_data['query_index'].astype(str)
-    postgres_data['query_index'] = postgres_data['query_index'].astype(str)
-    merged_data = pd.merge(neo4j_data, postgres_data, on='query_index', suffixes=('_neo4j', '_postgres'))
+def evaluate_shortest_path(df):
+    shortest_path = df[df["variant"] == "shortest_path"]
+    merged_data = (shortest_path.pivot(index="query_index", columns="series", values="mean_execution_time_s")
+                   .dropna(subset=["Neo4j", "Postgres"]))
+    sizes = shortest_path.drop_duplicates("query_index").set_index("query_index")["scale_factor"]
 
     fig, ax = plt.subplots(figsize=(12, 6))
     bar_width = 0.35
     index = np.arange(len(merged_data))
 
-    bars_neo4j = ax.bar(index, merged_data['mean_execution_time_s_neo4j'], bar_width, label='Neo4j',
-                        color=db_colors['Neo4j'])
-    bars_postgres = ax.bar(index + bar_width, merged_data['mean_execution_time_s_postgres'], bar_width,
-                           label='Postgres', color=db_colors['Postgres'])
+    bars_neo4j = ax.bar(index, merged_data['Neo4j'], bar_width, label='Neo4j', color=db_colors['Neo4j'])
+    bars_postgres = ax.bar(index + bar_width, merged_data['Postgres'], bar_width, label='Postgres',
+                           color=db_colors['Postgres'])
 
-    for bars in [bars_neo4j, bars_postgres]:
-        for bar in bars:
-            height = bar.get_height()
-            ax.annotate(f'{height:.2f}s',
-                        xy=(bar.get_x() + bar.get_width() / 2, height),
-                        xytext=(0, 3),
-                        textcoords="offset points",
-                        ha='center', va='bottom')
+    for bar in [*bars_neo4j, *bars_postgres]:
+        height = bar.get_height()
+        ax.annotate(f'{height:.2f}s',
+                    xy=(bar.get_x() + bar.get_width() / 2, height),
+                    xytext=(0, 3),
+                    textcoords="offset points",
+                    ha='center', va='bottom')
 
     ax.set_xlabel('Database Size and Configuration')
     ax.set_ylabel('Mean Execution Time (s)')
     ax.set_xticks(index + bar_width / 2)
-    ax.set_xticklabels(merged_data['size_neo4j'])
+    ax.set_xticklabels(sizes.loc[merged_data.index])
     ax.legend()
     ax.set_yscale('log')
     ax.yaxis.grid(True, which='major', linestyle='--', linewidth='0.5', color='grey')
     ax.yaxis.grid(False, which='minor')
     plt.tight_layout()
-    plt.show()
-
-    postgres_means = postgres_data['mean_execution_time_s']
-    neo4j_means = neo4j_data['mean_execution_time_s']
-    speed_diff_percent = ((postgres_means - neo4j_means) / neo4j_means) * 100
-    for i in range(len(speed_diff_percent)):
-        print(
-            f"Query {i + 1}: PostgreSQL is {'faster' if speed_diff_percent[i] < 0 else 'slower'} than Neo4j by {abs(speed_diff_percent[i]):.2f}%")
 
+    speed_diff_percent = speed_differences(merged_data['Neo4j'], merged_data['Postgres']).to_numpy()
+    print_speed_differences(speed_diff_percent)
     print(f"Average speed difference: {np.mean(speed_diff_percent):.2f}%")
     print(f"Median speed difference: {np.median(speed_diff_percent):.2f}%")
+    return fig
 
 
-def plot_execution_time_vs_scaling_factor():
-    neo4j_data = pd.read_csv(f'{NEO4J_DIR}/neo4j_shortest_path_increase.csv')
-    postgres_data = pd.read_csv(f'{POSTGRES_DIR}/postgres_shortest_path_increase.csv')
-    sf_neo4j = neo4j_data['SF'].astype(str)
-    time_neo4j = neo4j_data['mean_execution_time_s']
-    edges_neo4j = neo4j_data['edges']
-
-    sf_postgres = postgres_data['SF'].astype(str)
-    time_postgres = postgres_data['mean_execution_time_s']
+def plot_execution_time_vs_scaling_factor(df):
+    increase = df[df["variant"] == "shortest_path_increase"]
+    means = increase.pivot(index="scale_factor", columns="series", values="mean_execution_time_s")
+    # the scale factors are strings, the growth factors need them in numeric order
+    means = means.loc[sorted(means.index, key=float)]
+    sf_neo4j = means.index.to_numpy()
+    time_neo4j = means['Neo4j'].to_numpy()
+    time_postgres = means['Postgres'].to_numpy()
+    edges_neo4j = increase[increase["series"] == "Neo4j"].set_index("scale_factor")["num_edges"].loc[sf_neo4j]
+    edges_neo4j = edges_neo4j.to_numpy()
 
     fig, ax1 = plt.subplots(figsize=(10, 4))
 
     ax1.set_xlabel('Scaling Factor (SF)')
     ax1.set_ylabel('Mean Execution Time (s)')
     ax1.plot(sf_neo4j, time_neo4j, label='Neo4j Execution Time', marker='o', linestyle='-', color=db_colors['Neo4j'])
-    ax1.plot(sf_postgres, time_postgres, label='PostgreSQL Execution Time', marker='o', linestyle='-', color=db_colors['Postgres'])
+    ax1.plot(sf_neo4j, time_postgres, label='PostgreSQL Execution Time', marker='o', linestyle='-',
+             color=db_colors['Postgres'])
     ax1.set_yscale('log')
     ax1.tick_params(axis='y')
 
+    neo4j_factors = np.concatenate([[1], time_neo4j[1:] / time_neo4j[:-1]])
+    postgres_factors = np.concatenate([[1], time_postgres[1:] / time_postgres[:-1]])
+    edge_factors = np.concatenate([[1], edges_neo4j[1:] / edges_neo4j[:-1]])
+
     for i, sf in enumerate(sf_neo4j):
         y_offset = time_neo4j[i] * 1.2
         if sf == '1':
             y_offset = max(time_postgres[i] * 1.2, edges_neo4j[i] * 1.1)
 
-        factor = "1x" if i == 0 else f"{(time_neo4j[i] / time_neo4j[i - 1]):.2f}x"
         if i == 0:
             ax1.text(i, y_offset, f'{time_neo4j[i]:.3f}s', ha='center', color=db_colors['Neo4j'])
         else:
-            ax1.text(i, y_offset, f'{time_neo4j[i]:.3f}s\n({factor})', ha='center', color=db_colors['Neo4j'])
+            ax1.text(i, y_offset, f'{time_neo4j[i]:.3f}s\n({neo4j_factors[i]:.2f}x)', ha='center',
+                     color=db_colors['Neo4j'])
 
     for i in range(len(time_postgres)):
-        factor = "1x" if i == 0 else f"{(time_postgres[i] / time_postgres[i - 1]):.2f}x"
         y_offset = time_postgres[i] * 1.2
         if i == 0:
             ax1.text(i, y_offset, f'{time_postgres[i]:.2f}s', ha='center', color=db_colors['Postgres'])
         else:
-            ax1.text(i, y_offset, f'{time_postgres[i]:.2f}s\n({factor})', ha='center', color=db_colors['Postgres'])
+            ax1.text(i, y_offset, f'{time_postgres[i]:.2f}s\n({postgres_factors[i]:.2f}x)', ha='center',
+                     color=db_colors['Postgres'])
 
     ax2 = ax1.twinx()
     ax2.set_ylabel('Number of "KNOWS" relations')
@@ -350,22 +327,139 @@ def plot_execution_time_vs_scaling_factor():
         elif sf == '1':
             y_offset = time_postgres[i]
 
-        factor = "1x" if i == 0 else f"{(edges_neo4j[i] / edges_neo4j[i - 1]):.2f}x"
         if i > 0:
-            ax2.text(i, y_offset, f'{factor}', ha='center', color='red')
+            ax2.text(i, y_offset, f'{edge_factors[i]:.2f}x', ha='center', color='red')
 
     lines_1, labels_1 = ax1.get_legend_handles_labels()
     lines_2, labels_2 = ax2.get_legend_handles_labels()
     ax1.legend(lines_1 + lines_2, labels_1 + labels_2, loc='upper left')
     ax1.grid(True)
     plt.tight_layout()
-    plt.show()
+    return fig
+
+
+def evaluate_shortest_path_implementations(df):
+    implementations = df[df["variant"] == "shortest_path_implementations"]
+    if implementations.empty:
+        print("No results of shortest_path_benchmark.py in the store.")
+        return None
+    means = implementations.pivot(index="scale_factor", columns="filename", values="mean_execution_time_s")
+    means = means.loc[sorted(means.index, key=float)]
+
+    fig, ax = plt.subplots(figsize=(10, 4))
+    for implementation in means.columns:
+        ax.plot(means.index, means[implementation], label=implementation, marker='o', linestyle='-')
+    ax.set_xlabel('Scaling Factor (SF)')
+    ax.set_ylabel('Mean Execution Time (s)')
+    ax.set_yscale('log')
+    ax.legend(title="PostgreSQL implementation")
+    ax.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+def evaluate_fof_adjacency(df):
+    """Postgres FOF frontier queries on the Person_knows_Person edge table vs. the person_adj adjacency lists."""
+    layouts = {"fof_frontier": "Edge table", "fof_adjacency": "Adjacency lists"}
+    postgres = df[(df["system"] == "postgres") & df["variant"].isin(list(layouts))]
+    if postgres["variant"].nunique() < 2:
+        print("No results of both fof_frontier and fof_adjacency in the store.")
+        return None
+    means = postgres.pivot_table(index=["scale_factor", "query_index"], columns="variant",
+                                 values="mean_execution_time_s")
+    configurations = [sf for sf in [*LSQB_SCALE_FACTORS, *FOF_CONFIGURATIONS] if sf in means.index.levels[0]]
+
+    fig, axs = plt.subplots(1, len(configurations), figsize=(5 * len(configurations), 4), squeeze=False,
+                            constrained_layout=True)
+    for ax, configuration in zip(axs[0], configurations):
+        configuration_means = means.loc[configuration]
+        for variant, label in layouts.items():
+            if variant in configuration_means:
+                ax.plot(configuration_means.index, configuration_means[variant], label=label, marker='o')
+        ax.set_title(configuration)
+        ax.set_xlabel('Hops')
+        ax.set_ylabel('Mean Execution Time (s)')
+        ax.set_yscale('log')
+        ax.grid(True)
+    axs[0][0].legend(title="PostgreSQL layout")
+    return fig
+
+
+def evaluate_parallel_speedup(df):
+    """Speedup of the in-process engines over the number of worker processes (variants with the suffix -<n>p)."""
+    parallel = df[df["variant"].str.contains(r"-\d+p$")].copy()
+    parallel["workers"] = parallel["variant"].str.extract(r"-(\d+)p$", expand=False).astype(int)
+    parallel["base_variant"] = parallel["variant"].str.replace(r"-\d+p$", "", regex=True)
+    groups = [(key, group) for key, group in parallel.groupby(["system", "base_variant", "scale_factor"])
+              if (group["workers"] == 1).any()]
+    if not groups:
+        print("No parallel results with a single-worker baseline in the store.")
+        return None
+
+    fig, axs = plt.subplots(1, len(groups), figsize=(5 * len(groups), 4), squeeze=False, constrained_layout=True)
+    for ax, ((system, variant, scale_factor), group) in zip(axs[0], groups):
+        means = group.pivot_table(index="workers", columns="filename", values="mean_execution_time_s")
+        speedup = means.loc[1] / means
+        for filename in speedup.columns:
+            ax.plot(speedup.index, speedup[filename], label=filename, marker='o')
+        ax.plot(speedup.index, speedup.index, color='grey', linestyle='--', label='Linear')
+        ax.set_title(f"{system_labels.get(system, system)} {variant} (SF {scale_factor})")
+        ax.set_xlabel('Worker Processes')
+        ax.set_ylabel('Speedup over 1 Worker')
+        ax.grid(True)
+        ax.legend(fontsize=8)
+    return fig
+
+
+FIGURES = {
+    "lsqb": lambda df: evaluate_lsqb(df, show_whiskers=False),
+    "lsqb-scaling": lambda df: evaluate_queries_across_scaling_factors(df, LSQB_SCALE_FACTORS),
+    "fof-configurations": lambda df: evaluate_fof_across_configurations(df, FOF_CONFIGURATIONS),
+    "fof-lsqb-scaling": lambda df: evaluate_fof_lsqb_across_scaling_factors(df, LSQB_SCALE_FACTORS),
+    "shortest-path": evaluate_shortest_path,
+    "shortest-path-scaling": plot_execution_time_vs_scaling_factor,
+    "shortest-path-implementations": evaluate_shortest_path_implementations,
+    "fof-adjacency": evaluate_fof_adjacency,
+    "parallel-speedup": evaluate_parallel_speedup,
+}
+
+
+def render(fig, name, output_dir=None, formats=("png",)):
+    """Show the figure interactively or, if an output directory is given, write it in every requested format."""
+    if fig is None:
+        return
+    if output_dir is None:
+        plt.show()
+        return
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    for extension in formats:
+        fig.savefig(f"{output_dir}/{name}.{extension}", bbox_inches="tight")
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the benchmark figures from the results store")
+    parser.add_argument("figures", nargs="*", default=[],
+                        help=f"Figures to render: {', '.join(FIGURES)} (default: all)")
+    parser.add_argument("-o", "--output-dir", type=str, default=None,
+                        help="Write the figures to this directory instead of showing them")
+    parser.add_argument("-f", "--formats", nargs="+", default=["png"], choices=["png", "pdf", "svg"],
+                        help="File formats written with --output-dir")
+    parser.add_argument("-s", "--store-dir", type=str, default=RESULTS_STORE_DIR, help="Results store directory")
+    args = parser.parse_args()
+    unknown = [name for name in args.figures if name not in FIGURES]
+    if unknown:
+        parser.error(f"unknown figures {', '.join(unknown)}, choose from {', '.join(FIGURES)}")
+
+    if args.output_dir is not None:
+        plt.switch_backend("Agg")
+
+    ensure_store([NEO4J_DIR, POSTGRES_DIR], args.store_dir)
+    df = load_tidy(args.store_dir)
+    for name in args.figures or FIGURES:
+        render(FIGURES[name](df), name, args.output_dir, args.formats)
 
 
 if __name__ == "__main__":
-    # evaluate_lsqb(show_whiskers=False)
-    # evaluate_queries_across_scaling_factors([0.1, 0.3, 1])
-    # evaluate_fof_across_configurations(["100K-50reg", "50K-100reg", "1M-5reg", "1M-10reg", "1M-20reg"])
-    # evaluate_fof_lsqb_across_scaling_factors(["0.1", "0.3", "1"])
-    # evaluate_shortest_path()
-    plot_execution_time_vs_scaling_factor()
+    main()
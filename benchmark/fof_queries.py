@@ -0,0 +1,216 @@
+import argparse
+import os
+import re
+
+import pandas as pd
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv(), override=True)
+
+NEO4J_URI = os.getenv('NEO4J_URI')
+NEO4J_USER = os.getenv('NEO4J_USER')
+NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
+POSTGRES_HOST = os.getenv('POSTGRES_HOST')
+POSTGRES_PORT = os.getenv('POSTGRES_PORT')
+POSTGRES_USER = os.getenv('POSTGRES_USER')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+CSR_DATA_DIR = os.getenv('CSR_DATA_DIR')
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+EXACT = "exact"
+WITHIN = "within"
+MODES = [EXACT, WITHIN]
+EDGES = "edges"
+ADJACENCY = "adjacency"
+LAYOUTS = [EDGES, ADJACENCY]
+# one BFS step from the persons of `hop{previous}` per physical layout (see sql/general/adjacency.sql)
+EXPANSIONS = {
+    EDGES: "    SELECT k.person2id AS person\n"
+           "    FROM hop{previous} f\n"
+           "    JOIN Person_knows_Person k ON k.person1id = f.person\n",
+    ADJACENCY: "    SELECT n.person\n"
+               "    FROM hop{previous} f\n"
+               "    JOIN person_adj a ON a.person_id = f.person\n"
+               "    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)\n",
+}
+
+
+def fof_sql(person_id, hops, mode=EXACT, layout=EDGES):
+    """k-hop FOF query with BFS frontier semantics for any `hops`.
+
+    Every CTE is one BFS level: the neighbors of the previous level minus the previous two levels. In an undirected
+    graph a neighbor of level i can only be on level i - 1, i or i + 1, so these are the only levels a new frontier has
+    to be checked against and the work grows with the number of persons reached instead of the number of paths.
+    `exact` counts the persons at shortest distance `hops`, `within` the persons reachable in 1..hops steps.
+    With the `adjacency` layout every step unnests the neighbor list of each frontier person from `person_adj`.
+    """
+    levels = [f"hop0 AS (\n    SELECT {int(person_id)} AS person\n)"]
+    for level in range(1, hops + 1):
+        seen = "".join(f"    EXCEPT\n    SELECT person FROM hop{previous}\n"
+                       for previous in range(max(0, level - 2), level))
+        levels.append(f"hop{level} AS (\n" + EXPANSIONS[layout].format(previous=level - 1) + f"{seen})")
+    if mode == EXACT:
+        reached = f"hop{hops}"
+    else:
+        reached = " UNION ALL ".join(f"SELECT person FROM hop{level}" for level in range(1, hops + 1))
+        reached = f"({reached}) reached"
+    return "WITH " + ",\n".join(levels) + f"\nSELECT COUNT(*) AS countOfPersons\nFROM {reached};"
+
+
+def fof_cypher(person_id, hops, mode=EXACT):
+    """Cypher counterpart of `fof_sql`: one collect() of distinct persons per BFS level instead of `[:KNOWS*k]`.
+
+    `n IN list` scans the list, so the new persons are not filtered with it. Instead every neighbor of the previous
+    level is tagged 1 and every person of the previous two levels 0, and grouping by person keeps those whose smallest
+    tag is 1. The grouping is a hash aggregation, so a level costs as much as its neighbors and the two levels before.
+    """
+    lines = [f"MATCH (start:Person {{id: {int(person_id)}}})", "WITH [start] AS hop0"]
+    for level in range(1, hops + 1):
+        previous = f"hop{level - 1}"
+        seen = " + ".join(f"hop{kept}" for kept in range(max(0, level - 2), level))
+        imported = ", ".join(f"hop{kept}" for kept in range(max(0, level - 2), level))
+        # `within` needs every level until the end, `exact` only the last two
+        carried = range(min(1, level - 1) if mode == WITHIN else level - 1, level + 1)
+        lines += [
+            "CALL {",
+            f"    WITH {imported}",
+            "    CALL {",
+            f"        WITH {previous}",
+            f"        UNWIND {previous} AS f",
+            "        MATCH (f)-[:KNOWS]-(n:Person)",
+            "        RETURN n, 1 AS new",
+            "        UNION ALL",
+            f"        WITH {imported}",
+            f"        UNWIND {seen} AS n",
+            "        RETURN n, 0 AS new",
+            "    }",
+            "    WITH n, min(new) AS new",
+            "    WHERE new = 1",
+            f"    RETURN collect(n) AS hop{level}",
+            "}",
+            "WITH " + ", ".join(f"hop{kept}" for kept in carried),
+        ]
+    if mode == EXACT:
+        lines.append(f"RETURN size(hop{hops}) AS countOfPersons;")
+    else:
+        lines.append("RETURN " + " + ".join(f"size(hop{level})" for level in range(1, hops + 1))
+                     + " AS countOfPersons;")
+    return "\n".join(lines)
+
+
+def write_queries(person_id, max_hops, sql_dir, cypher_dir, mode=EXACT, layout=EDGES):
+    """Write `frontier_fof_<k>.sql` and `.cypher` for k = 1..max_hops, named so that they sort like sql/fof/.
+
+    The Cypher queries do not depend on the layout and are skipped if `cypher_dir` is None.
+    """
+    for directory in [sql_dir, cypher_dir]:
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+    for hops in range(1, max_hops + 1):
+        with open(os.path.join(sql_dir, f"frontier_fof_{hops}.sql"), 'w') as file:
+            file.write(fof_sql(person_id, hops, mode, layout))
+        if cypher_dir:
+            with open(os.path.join(cypher_dir, f"frontier_fof_{hops}.cypher"), 'w') as file:
+                file.write(fof_cypher(person_id, hops, mode))
+
+
+def cross_check(person_id, max_hops, timeout_seconds=600, data_dir=CSR_DATA_DIR, neo4j=True, postgres=True,
+                adjacency=False):
+    """Run the hand-written sql/fof and cypher/fof queries next to the generated ones and compare the counts.
+
+    The hand-written queries count the end points of paths of length k (simple paths in SQL, trails in Cypher), the
+    generated ones the persons at shortest distance k (`exact`) or at most k (`within`). On forests the exact and
+    path-based counts agree; in general exact <= path-based <= within must hold, the generated SQL, Cypher and CSR
+    engine counts must be identical, and so must the Cypher and CSR engine trail counts.
+    With `adjacency` the Postgres queries also run on `person_adj`, whose counts must match the edge table.
+    """
+    from csr_graph import CSRGraph
+    from timing import monotonic_s
+    from neo4j_connection import Neo4jConnection
+    from postgres_connection import PostgreSQLConnection
+
+    connections = {}
+    if postgres:
+        connections["postgres"] = PostgreSQLConnection(POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD)
+    if neo4j:
+        connections["neo4j"] = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+    graph = CSRGraph.from_store(data_dir) if data_dir else None
+
+    def count(system, query):
+        try:
+            rows = connections[system].execute(query, timeout_seconds)
+        except Exception as e:
+            print(f"{system}: {e}")
+            return None
+        row = rows[0]
+        return row["countOfPersons"] if isinstance(row, dict) else row[0]
+
+    rows = []
+    try:
+        for hops in range(1, max_hops + 1):
+            row = {"hops": hops}
+            for system, extension, directory, generate in [("postgres", "sql", "sql", fof_sql),
+                                                           ("neo4j", "cypher", "cypher", fof_cypher)]:
+                if system not in connections:
+                    continue
+                path = os.path.join(ROOT_DIR, directory, "fof", f"bidirectional_foaf_{hops}.{extension}")
+                if os.path.exists(path):
+                    with open(path, 'r') as file:
+                        row[f"{system}_paths"] = count(system, re.sub(r"\b33\b", str(int(person_id)), file.read()))
+                for mode in MODES:
+                    row[f"{system}_{mode}"] = count(system, generate(person_id, hops, mode))
+            if adjacency and postgres:
+                row[f"postgres_adjacency_{EXACT}"] = count("postgres", fof_sql(person_id, hops, EXACT, ADJACENCY))
+            if graph is not None:
+                row["csr_exact"] = graph.k_hop_count(person_id, hops)
+                try:
+                    row["csr_paths"] = graph.k_trail_count(person_id, hops, monotonic_s() + timeout_seconds)
+                except TimeoutError as e:
+                    print(f"csr: {e}")
+            rows.append(row)
+    finally:
+        for connection in connections.values():
+            connection.close()
+
+    df = pd.DataFrame(rows).set_index("hops")
+    exact = df.filter(like="_exact")
+    df["exact_consistent"] = exact.nunique(axis=1) <= 1
+    for system in connections:
+        if f"{system}_paths" in df:
+            df[f"{system}_bounds_hold"] = ((df[f"{system}_exact"] <= df[f"{system}_paths"])
+                                           & (df[f"{system}_paths"] <= df[f"{system}_within"]))
+    if "neo4j_paths" in df and "csr_paths" in df:
+        df["trails_consistent"] = df["neo4j_paths"] == df["csr_paths"]
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate k-hop FOF queries with BFS frontier semantics")
+    parser.add_argument("-p", "--person", type=int, default=33, help="Start person id")
+    parser.add_argument("-k", "--max-hops", type=int, default=8, help="Generate queries for 1..k hops")
+    parser.add_argument("-m", "--mode", type=str, default=EXACT, choices=MODES,
+                        help="Count persons at exactly k hops or within k hops")
+    parser.add_argument("-l", "--layout", type=str, default=EDGES, choices=LAYOUTS,
+                        help="Expand the SQL BFS levels over the Person_knows_Person edge table or the person_adj "
+                             "adjacency lists of sql/general/adjacency.sql (only the SQL queries are written)")
+    parser.add_argument("-sd", "--sql-dir", type=str, default=None,
+                        help="Output directory of the SQL queries (default: sql/fof_frontier or sql/fof_adjacency)")
+    parser.add_argument("-cd", "--cypher-dir", type=str, default=os.path.join(ROOT_DIR, "cypher", "fof_frontier"),
+                        help="Output directory of the Cypher queries")
+    parser.add_argument("-c", "--check", action="store_true",
+                        help="Compare the generated queries with sql/fof and cypher/fof on the running databases")
+    parser.add_argument("-t", "--timeout", type=int, default=600, help="Timeout per query in seconds for --check")
+    parser.add_argument("-dd", "--data-dir", type=str, default=CSR_DATA_DIR,
+                        help="Data set directory to also compare against the CSR engine with --check")
+    args = parser.parse_args()
+
+    if args.check:
+        with pd.option_context("display.max_columns", None, "display.width", 200):
+            print(cross_check(args.person, args.max_hops, args.timeout, args.data_dir,
+                              adjacency=args.layout == ADJACENCY))
+    elif args.layout == ADJACENCY:
+        write_queries(args.person, args.max_hops, args.sql_dir or os.path.join(ROOT_DIR, "sql", "fof_adjacency"),
+                      None, args.mode, ADJACENCY)
+    else:
+        write_queries(args.person, args.max_hops, args.sql_dir or os.path.join(ROOT_DIR, "sql", "fof_frontier"),
+                      args.cypher_dir, args.mode)
@@ -1,13 +1,16 @@
 import argparse
-import csv
 import os
 import subprocess
-import time
 
-import networkx as nx
+import numpy as np
+import pandas as pd
 from dotenv import load_dotenv, find_dotenv
 
+from graph_generator import (regular_graph_edges, power_law_weights, chung_lu_edges, write_edges,
+                             deduplicate_edge_file, read_edge_chunks, DEFAULT_CHUNK_SIZE)
+from pg_loader import ADJACENCY_SCRIPT, connection_kwargs, copy_binary, run_script
 from postgres_connection import PostgreSQLConnection
+from timing import Timer
 
 load_dotenv(find_dotenv(), override=True)
 
@@ -22,8 +25,11 @@ POSTGRES_USER = os.getenv('POSTGRES_USER')
 POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 
 
-def generate_regular_graph(n: int, degree: int) -> nx.Graph:
-    return nx.random_regular_graph(degree, n)
+def generate_graph(n: int, degree: int, distribution: str, exponent: float, seed, chunk_size: int):
+    rng = np.random.default_rng(seed)
+    if distribution == "power-law":
+        return chung_lu_edges(power_law_weights(n, degree, exponent), rng, chunk_size)
+    return regular_graph_edges(n, degree, rng, chunk_size)
 
 
 def start_neo4j():
@@ -60,36 +66,39 @@ def import_graph_to_neo4j():
 
 
 
-def export_graph_to_csv(g: nx.Graph, neo4j: bool):
+def export_graph_to_csv(num_nodes: int, edge_file: str, neo4j: bool, chunk_size: int = DEFAULT_CHUNK_SIZE):
     if neo4j:
         with open(f'{NEO4J_IMPORT_PATH}/nodes.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(["id:ID(Person)"])
-            for node in g.nodes():
-                writer.writerow([node])
+            file.write("id:ID(Person)\n")
+            for start in range(0, num_nodes, chunk_size):
+                nodes = pd.Series(np.arange(start, min(start + chunk_size, num_nodes)))
+                nodes.to_csv(file, header=False, index=False)
 
         with open(f'{NEO4J_IMPORT_PATH}/edges.csv', 'w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([":START_ID(Person)", ":END_ID(Person)"])
-            for edge in g.edges():
-                writer.writerow([edge[0], edge[1]])
+            file.write(":START_ID(Person),:END_ID(Person)\n")
+            for edges in read_edge_chunks(edge_file, chunk_size):
+                pd.DataFrame(edges).to_csv(file, header=False, index=False)
 
 
-def bulk_import_to_postgres(g: nx.Graph, table_name: str):
+def bulk_import_to_postgres(edge_file: str, table_name: str):
     postgres_conn = PostgreSQLConnection(POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD)
     postgres_conn.connect()
     try:
         with postgres_conn.conn.cursor() as cursor:
             cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
-            cursor.execute(f"CREATE TABLE {table_name} (person1id INT, person2id INT);")
+            cursor.execute(f"CREATE TABLE {table_name} (person1id BIGINT, person2id BIGINT);")
             postgres_conn.conn.commit()
 
+        # Both directions of every edge, encoded chunk-wise as binary COPY instead of one write_row call per row
+        both_directions = (
+            [(np.concatenate([edges[:, 0], edges[:, 1]]), None), (np.concatenate([edges[:, 1], edges[:, 0]]), None)]
+            for edges in read_edge_chunks(edge_file)
+        )
         with postgres_conn.conn.cursor() as cursor:
-            with cursor.copy(f"COPY {table_name} (person1id, person2id) FROM STDIN") as copy:
-                for edge in g.edges():
-                    copy.write_row(edge)
-                    copy.write_row((edge[1], edge[0]))
-            postgres_conn.conn.commit()
+            with Timer() as timer:
+                rows = copy_binary(cursor, table_name, ["person1id", "person2id"], both_directions)
+                postgres_conn.conn.commit()
+        print(f"Imported {rows:_} rows into {table_name} in {timer.wall_s:.2f} s ({rows / timer.wall_s:_.0f} rows/s)")
 
     except Exception as e:
         print(f"An error occurred during PostgreSQL bulk import: {e}")
@@ -98,18 +107,27 @@ def bulk_import_to_postgres(g: nx.Graph, table_name: str):
             postgres_conn.close()
 
 
-def main(num_nodes: int, avg_friendships: int, neo4j: bool, postgres: bool):
-    graph_start_time = time.time()
-    g = generate_regular_graph(num_nodes, avg_friendships)
-    print(f"Graph generated in {time.time() - graph_start_time:.2f} seconds")
-    print(f"Generated a graph with {num_nodes:_} nodes and {len(g.edges()):_} edges")
-    export_graph_to_csv(g, neo4j)
+def main(num_nodes: int, avg_friendships: int, neo4j: bool, postgres: bool, distribution: str = "regular",
+         exponent: float = 2.5, seed=None, edge_file: str = "edges.bin", chunk_size: int = DEFAULT_CHUNK_SIZE,
+         adjacency: bool = False):
+    with Timer() as timer:
+        chunks = generate_graph(num_nodes, avg_friendships, distribution, exponent, seed, chunk_size)
+        write_edges(chunks, edge_file)
+        # both loaders would turn repeated pairs into parallel KNOWS edges
+        num_edges = deduplicate_edge_file(edge_file, num_nodes, chunk_size)
+    print(f"Graph generated in {timer.wall_s:.2f} seconds")
+    print(f"Generated a graph with {num_nodes:_} nodes and {num_edges:_} edges")
+    export_graph_to_csv(num_nodes, edge_file, neo4j, chunk_size)
     if neo4j:
         import_graph_to_neo4j()
         print("Graph created in Neo4j database.")
 
     if postgres:
-        bulk_import_to_postgres(g, "Person_knows_Person")
+        bulk_import_to_postgres(edge_file, "Person_knows_Person")
+        if adjacency:
+            with Timer() as timer:
+                run_script(connection_kwargs(), ADJACENCY_SCRIPT)
+            print(f"Built person_adj in {timer.wall_s:.2f} s")
         print("Graph created in PostgreSQL database.")
     print("Done!")
 
@@ -122,5 +140,16 @@ if __name__ == '__main__':
                         help='Average number of friendships per node')
     parser.add_argument("-nf", "--neo4j", action="store_true", help="Run Neo4j")
     parser.add_argument("-pf", "--postgres", action="store_true", help="Run PostgreSQL")
+    parser.add_argument("-d", "--distribution", choices=["regular", "power-law"], default="regular",
+                        help="Degree distribution: every node has exactly the average degree, or a skewed power law")
+    parser.add_argument("-e", "--exponent", type=float, default=2.5, help="Exponent of the power-law distribution")
+    parser.add_argument("-s", "--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("-o", "--edge-file", type=str, default="edges.bin",
+                        help="Binary file the generated edges are written to (int64 pairs)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Number of nodes or edges generated and written at once; bounds the memory usage")
+    parser.add_argument("-a", "--adjacency", action="store_true",
+                        help="Also build the person_adj adjacency lists (sql/general/adjacency.sql) in PostgreSQL")
     args = parser.parse_args()
-    main(args.num_nodes, args.avg_friendships, args.neo4j, args.postgres)
+    main(args.num_nodes, args.avg_friendships, args.neo4j, args.postgres, args.distribution, args.exponent, args.seed,
+         args.edge_file, args.chunk_size, args.adjacency)
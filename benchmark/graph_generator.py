@@ -0,0 +1,124 @@
+import os
+
+import numpy as np
+
+EDGE_DTYPE = np.dtype("<i8")
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+
+def canonical_edges(src, dst):
+    """The distinct undirected edges of a chunk as (min, max) pairs, without self-loops."""
+    keep = src != dst
+    pairs = np.unique(np.stack([np.minimum(src[keep], dst[keep]), np.maximum(src[keep], dst[keep])], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def regular_graph_edges(n, degree, rng, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (src, dst) chunks of a random `degree`-regular graph on `n` nodes.
+
+    Stub matching without materializing all n * degree stubs: every round pairs each node with a random partner from a
+    permutation (adding 2 to every degree), and for odd degrees one random perfect matching adds the last 1. Only one
+    permutation of `n` ids is in memory at a time. Chunks hold (min, max) pairs without self-loops or duplicates, so a
+    handful of nodes may end up with a slightly lower degree; edges repeated across chunks or rounds are only removed
+    by `deduplicate_edge_file`.
+    """
+    if (n * degree) % 2 != 0:
+        raise ValueError("n * degree must be even for a regular graph")
+
+    for _ in range(degree // 2):
+        partners = rng.permutation(n)
+        for start in range(0, n, chunk_size):
+            src = np.arange(start, min(start + chunk_size, n), dtype=np.int64)
+            dst = partners[start:start + chunk_size].astype(np.int64)
+            yield canonical_edges(src, dst)
+
+    if degree % 2 == 1:
+        matching = rng.permutation(n).astype(np.int64)
+        for start in range(0, n, 2 * chunk_size):
+            pairs = matching[start:start + 2 * chunk_size]
+            yield canonical_edges(pairs[0::2], pairs[1::2])
+
+
+def power_law_weights(n, avg_degree, exponent=2.5, max_degree=None):
+    """Expected degrees following a power law with the given exponent, scaled to `avg_degree` on average.
+
+    This resembles the skewed friendship distribution of the LDBC social network, where a few persons have orders of
+    magnitude more KNOWS edges than the median.
+    """
+    ranks = np.arange(1, n + 1, dtype=np.float64)
+    weights = ranks ** (-1.0 / (exponent - 1.0))
+    weights *= avg_degree / weights.mean()
+    max_degree = max_degree or np.sqrt(avg_degree * n)
+    return np.minimum(weights, max_degree)
+
+
+def chung_lu_edges(weights, rng, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (src, dst) chunks of a Chung-Lu multigraph in which node i has expected degree `weights[i]`.
+
+    Both endpoints of every edge are sampled independently proportional to the weights, so memory only depends on the
+    number of nodes and the chunk size. Chunks hold (min, max) pairs without self-loops or duplicates, but the hubs
+    are sampled together in many chunks: `deduplicate_edge_file` turns the written edges into a simple graph, whose
+    degrees of the hubs are then somewhat below their weights.
+    """
+    cumulative = np.cumsum(weights)
+    total = cumulative[-1]
+    num_edges = int(round(total / 2))
+    for start in range(0, num_edges, chunk_size):
+        size = min(chunk_size, num_edges - start)
+        src = np.searchsorted(cumulative, rng.random(size) * total, side="right").astype(np.int64)
+        dst = np.searchsorted(cumulative, rng.random(size) * total, side="right").astype(np.int64)
+        yield canonical_edges(src, dst)
+
+
+def write_edges(chunks, path):
+    """Write edge chunks as interleaved little-endian int64 (src, dst) pairs and return the number of edges."""
+    num_edges = 0
+    with open(path, "wb") as file:
+        for src, dst in chunks:
+            buffer = np.empty((len(src), 2), dtype=EDGE_DTYPE)
+            buffer[:, 0] = src
+            buffer[:, 1] = dst
+            buffer.tofile(file)
+            num_edges += len(src)
+    return num_edges
+
+
+def deduplicate_edge_file(path, num_nodes, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Remove the edges repeated across chunks from a file of (min, max) pairs and return the number of edges left.
+
+    The edges are spilled into about one bucket file per `chunk_size` edges by a hash of their smaller endpoint, so
+    every copy of an edge lands in the same bucket and only one bucket is in memory at a time.
+    """
+    num_edges = os.path.getsize(path) // (2 * EDGE_DTYPE.itemsize)
+    buckets = max(1, -(-num_edges // chunk_size))
+    bucket_paths = [f"{path}.bucket{bucket}" for bucket in range(buckets)]
+    files = [open(bucket_path, "wb") for bucket_path in bucket_paths]
+    try:
+        for edges in read_edge_chunks(path, chunk_size):
+            # one int64 key per edge; exact for up to 3 * 10^9 nodes
+            keys = edges[:, 0] * num_nodes + edges[:, 1]
+            bucket_of = edges[:, 0] % buckets
+            for bucket, file in enumerate(files):
+                keys[bucket_of == bucket].astype(EDGE_DTYPE).tofile(file)
+    finally:
+        for file in files:
+            file.close()
+
+    def unique_chunks():
+        for bucket_path in bucket_paths:
+            keys = np.unique(np.fromfile(bucket_path, dtype=EDGE_DTYPE))
+            os.remove(bucket_path)
+            yield keys // num_nodes, keys % num_nodes
+
+    num_edges = write_edges(unique_chunks(), f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    return num_edges
+
+
+def read_edge_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield (chunk_size, 2) views of an edge file written by `write_edges` without loading it into memory."""
+    if os.path.getsize(path) == 0:
+        return
+    edges = np.memmap(path, dtype=EDGE_DTYPE, mode="r").reshape(-1, 2)
+    for start in range(0, len(edges), chunk_size):
+        yield edges[start:start + chunk_size]
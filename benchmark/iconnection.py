@@ -3,6 +3,10 @@ class IConnection:
         """Close the connection to the database."""
         pass
 
+    def execute(self, query, timeout_seconds=120):
+        """Run a single query and return its result rows."""
+        pass
+
     def run_queries(self, queries, result_dir="postgres_results"):
         """Run the queries and return the results and query statistics."""
         pass
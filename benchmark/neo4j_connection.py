@@ -1,46 +1,116 @@
 import csv
 import os
 import statistics
-import time
+import uuid
 
-import neo4j.exceptions
 from neo4j import GraphDatabase, Query
 from tqdm import tqdm
 
+from cancellation import WATCHDOG
+from query_plans import PROFILE, neo4j_shape, neo4j_db_hits, plan_stats, save_plans
+from repetitions import RepetitionScheduler, TIMEOUT
+from result_stream import consume_stream
+from server_timings import neo4j_server_timings, client_overhead
+from timing import Timer, save_runs
+
 
 class Neo4jConnection:
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, streaming=False, capture_plans=False):
         self.uri = uri
         self.user = user
         self.password = password
+        # iterate over the records and keep only a count and checksum instead of materializing result.data()
+        self.streaming = streaming
+        # run one extra PROFILE pass per query and record the plan and its fingerprint
+        self.capture_plans = capture_plans
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
 
     def close(self):
         self.driver.close()
 
-    def run_queries(self, queries, result_dir="neo4j_results", runs=5, timeout_seconds=120):
+    def reconnect(self):
+        """Replace the driver after a server restart; the first connection is opened here, outside any timed run."""
+        self.driver.close()
+        self.driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+        self.driver.verify_connectivity()
+
+    def terminate_transactions(self, run_tag):
+        """Terminate the transactions of one run server-side; called by the watchdog thread."""
+        with self.driver.session() as session:
+            transaction_ids = [record["transactionId"] for record in session.run(
+                "SHOW TRANSACTIONS YIELD transactionId, metaData "
+                "WHERE metaData.benchmark_run = $run_tag RETURN transactionId", run_tag=run_tag
+            )]
+            if transaction_ids:
+                session.run("TERMINATE TRANSACTIONS $ids", ids=transaction_ids).consume()
+
+    def watched_query(self, query_string, timeout_seconds):
+        """The query tagged with a run id in its transaction metadata and a watchdog guard that terminates it."""
+        run_tag = uuid.uuid4().hex
+        query = Query(query_string, metadata={"benchmark_run": run_tag})
+        return query, WATCHDOG.watch(timeout_seconds, cancel=lambda: self.terminate_transactions(run_tag))
+
+    def execute(self, query_string, timeout_seconds=120):
+        # the driver is thread-safe, sessions are not, so every call gets its own session
+        query, guard = self.watched_query(query_string, timeout_seconds)
+        with self.driver.session() as session, guard:
+            result = session.run(query)
+            return result.data()
+
+    def run_queries(self, queries, result_dir="neo4j_results", runs=5, timeout_seconds=120, scheduler=None):
+        scheduler = scheduler or RepetitionScheduler(runs)
         results = []
         all_query_stats = []
         for idx, (filename, query_string) in enumerate(queries):
             execution_times = []
+            wall_times_ns = []
+            cpu_times_ns = []
             query_errors = []
+            summaries = []
             data = []
-            with self.driver.session() as session:
-                for _ in tqdm(range(runs), desc=f"Executing {filename}"):
-                    try:
-                        start_time = time.time()
-                        query = Query(query_string, timeout=timeout_seconds)
-                        result = session.run(query)
-                        data = result.data()
-                        end_time = time.time()
-                        execution_times.append(end_time - start_time)
-                    except neo4j.exceptions.Neo4jError as e:
-                        query_errors.append(str(e))
-                        break
+            num_records = 0
+            checksum = None
+            censored_runs = 0
+            schedule = scheduler.schedule(execution_times)
+            for warmup in tqdm(schedule, total=schedule.total, desc=f"Executing {filename}"):
+                try:
+                    query, guard = self.watched_query(query_string, timeout_seconds)
+                    # a session per run, so that a restarted server (see cache_control.py) never leaves a stale one
+                    with self.driver.session() as session:
+                        with guard, Timer() as timer:
+                            result = session.run(query)
+                            if self.streaming:
+                                data, num_records, checksum = consume_stream(result,
+                                                                             to_sample=lambda record: record.data())
+                            else:
+                                data = result.data()
+                                num_records = len(data)
+                        if not warmup:
+                            execution_times.append(timer.wall_s)
+                            wall_times_ns.append(timer.wall_ns)
+                            cpu_times_ns.append(timer.cpu_ns)
+                            # all records are already fetched, so this only reads the summary
+                            summaries.append(result.consume())
+                except TimeoutError as e:
+                    # a censored sample: the run took at least timeout_seconds
+                    query_errors.append(str(e))
+                    censored_runs += 1
+                    schedule.stop(TIMEOUT)
+                    break
+                except Exception as e:
+                    # an aborted run must not take down the rest of the sweep
+                    query_errors.append(f"{type(e).__name__}: {e}")
+                    schedule.stop()
+                    break
+
+            plan = {}
+            if self.capture_plans and execution_times:
+                plan = self.capture_plan(query_string, timeout_seconds, query_errors)
 
             mean_time = statistics.mean(execution_times) if execution_times else None
             stdev_time = statistics.stdev(execution_times) if len(execution_times) > 1 else 0
-            num_records = len(data) if data else 0
+            num_records = num_records if execution_times else 0
+            server_timings = neo4j_server_timings(summaries)
 
             query_stats = {
                 "query_index": idx + 1,
@@ -49,15 +119,39 @@ class Neo4jConnection:
                 "mean_execution_time_s": mean_time,
                 "std_dev_time_s": stdev_time,
                 "num_records": num_records,
+                "result_checksum": checksum,
+                **server_timings,
+                "client_overhead_s": client_overhead(mean_time, server_timings["result_available_after_s"],
+                                                     server_timings["result_consumed_after_s"]),
+                "mean_cpu_time_s": statistics.mean(cpu_times_ns) / 1e9 if cpu_times_ns else None,
+                **schedule.summary(),
+                "censored_runs": censored_runs,
+                **plan,
                 "execution_times": execution_times,
+                "wall_times_ns": wall_times_ns,
+                "cpu_times_ns": cpu_times_ns,
                 "errors": query_errors
             }
 
             all_query_stats.append(query_stats)
             results.append({"data": data if data else []})
         self.save_all_query_stats(all_query_stats, result_dir)
+        save_runs(all_query_stats, result_dir, "neo4j")
+        if self.capture_plans:
+            save_plans(all_query_stats, result_dir, "neo4j")
         return results, all_query_stats
 
+    def capture_plan(self, query_string, timeout_seconds, query_errors):
+        """Run one additional PROFILE pass after the timed runs."""
+        query, guard = self.watched_query(PROFILE + query_string, timeout_seconds)
+        try:
+            with self.driver.session() as session, guard:
+                profile = session.run(query).consume().profile
+            return plan_stats(neo4j_shape(profile), neo4j_db_hits(profile))
+        except Exception as e:
+            query_errors.append(f"PROFILE failed: {e}")
+            return {}
+
     @staticmethod
     def save_all_query_stats(all_results, result_dir):
         if not os.path.exists(result_dir):
@@ -65,7 +159,9 @@ class Neo4jConnection:
         filename = f"{result_dir}/neo4j_query_summary.csv"
         with open(filename, "w", newline="") as file:
             fieldnames = ['query_index', "filename", "result", 'mean_execution_time_s', 'std_dev_time_s', 'num_records',
-                          'errors']
+                          'mean_cpu_time_s', 'result_checksum', 'result_available_after_s', 'result_consumed_after_s',
+                          'client_overhead_s', 'median_execution_time_s', 'median_ci_low_s', 'median_ci_high_s',
+                          'warmup_runs', 'stop_reason', 'censored_runs', 'plan_fingerprint', 'db_hits', 'errors']
             writer = csv.DictWriter(file, fieldnames=fieldnames)
             writer.writeheader()
             for result in all_results:
@@ -0,0 +1,149 @@
+import argparse
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from timing import Timer
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCHMARK_DIR, "..")
+LOG_DIR = "orchestrator_logs"
+
+SEQUENTIAL = "sequential"
+PARALLEL = "parallel"
+MODES = [SEQUENTIAL, PARALLEL]
+
+# system -> (benchmark.py flag, directory of the docker scripts, prefix of the resource limit variables, container)
+SUITES = {
+    "neo4j": ("-n", "neo", "NEO4J", "lsqb-neo"),
+    "postgres": ("-p", "pos", "POSTGRES", "lsqb-pos"),
+    "csr": ("-c", None, None, None),
+}
+
+
+def parse_cpus(spec):
+    """CPU list in the docker/taskset syntax, e.g. "0-3,8", as a set of CPU ids."""
+    cpus = set()
+    for part in spec.split(","):
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+class Suite:
+    """The queries of one system, run by `benchmark.py` in its own process on its own CPU set."""
+
+    def __init__(self, system, cpus=None, memory=None, manage_containers=False, benchmark_args=()):
+        self.system = system
+        self.flag, self.script_dir, self.prefix, self.container = SUITES[system]
+        self.cpus = cpus
+        self.memory = memory
+        self.manage_containers = manage_containers
+        self.benchmark_args = list(benchmark_args)
+
+    def start(self):
+        """Start the container with its limits, or apply them to the already running container."""
+        if self.script_dir is None:
+            return
+        if self.manage_containers:
+            env = dict(os.environ)
+            env[f"{self.prefix}_CPUSET"] = self.cpus or ""
+            env[f"{self.prefix}_MEMORY"] = self.memory or ""
+            subprocess.run([os.path.join(ROOT_DIR, self.script_dir, "start.sh")], env=env, check=True)
+        elif self.cpus or self.memory:
+            limits = [f"--cpuset-cpus={self.cpus}"] if self.cpus else []
+            limits += [f"--memory={self.memory}", f"--memory-swap={self.memory}"] if self.memory else []
+            subprocess.run(["docker", "update", *limits, self.container], check=True)
+
+    def stop(self):
+        if self.script_dir is not None and self.manage_containers:
+            subprocess.run([os.path.join(ROOT_DIR, self.script_dir, "stop.sh")], check=True)
+
+    def run(self, log_file=None):
+        """Run the suite and return its exit code and wall time; output goes to `log_file` if given."""
+        cpus = parse_cpus(self.cpus) if self.cpus else None
+        command = [sys.executable, os.path.join(BENCHMARK_DIR, "benchmark.py"), self.flag, *self.benchmark_args]
+        with Timer() as timer, open(log_file, "w") if log_file else nullcontext() as log:
+            process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT if log else None,
+                                       preexec_fn=lambda: cpus and os.sched_setaffinity(0, cpus))
+            return_code = process.wait()
+        return return_code, timer.wall_s
+
+
+def run_sequential(suites):
+    """Strict sequential mode: only one system is running at any time, as used for the published numbers."""
+    outcomes = {}
+    for suite in suites:
+        suite.start()
+        try:
+            outcomes[suite.system] = suite.run()
+        finally:
+            suite.stop()
+    return outcomes
+
+
+def run_parallel(suites, log_dir=LOG_DIR):
+    """Run all suites at the same time in separate processes; the output of every suite goes to its own log file."""
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    pinned = [parse_cpus(suite.cpus) for suite in suites if suite.cpus]
+    overlapping = len(pinned) < len(suites) or len(set().union(*pinned)) < sum(len(cpus) for cpus in pinned)
+    if len(suites) > 1 and overlapping:
+        print("Warning: the suites do not have disjoint CPU sets and will influence each other's timings")
+
+    for suite in suites:
+        suite.start()
+    try:
+        with ThreadPoolExecutor(max_workers=len(suites)) as executor:
+            futures = {suite.system: executor.submit(suite.run, os.path.join(log_dir, f"{suite.system}.log"))
+                       for suite in suites}
+            return {system: future.result() for system, future in futures.items()}
+    finally:
+        for suite in suites:
+            suite.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the benchmark suites of several systems one after another or concurrently on separate CPU "
+                    "sets. All unknown arguments are passed on to benchmark.py, e.g. -t 300 -r 5.",
+        # no prefix matching, so that benchmark.py flags like -pm are passed on instead of being taken for -pmem
+        allow_abbrev=False
+    )
+    parser.add_argument("-om", "--mode", choices=MODES, default=SEQUENTIAL,
+                        help="sequential runs one system at a time (for publication), parallel runs all at once")
+    parser.add_argument("-sy", "--systems", nargs="+", choices=list(SUITES), default=["neo4j", "postgres"],
+                        help="Systems to benchmark")
+    parser.add_argument("-nc", "--neo4j-cpus", type=str, default=None, help="CPU set of Neo4j and its client, e.g. 0-7")
+    parser.add_argument("-pc", "--postgres-cpus", type=str, default=None,
+                        help="CPU set of PostgreSQL and its client, e.g. 8-15")
+    parser.add_argument("-cc", "--csr-cpus", type=str, default=None, help="CPU set of the CSR engine")
+    parser.add_argument("-nm", "--neo4j-memory", type=str, default=None, help="Memory limit of Neo4j, e.g. 16g")
+    parser.add_argument("-pmem", "--postgres-memory", type=str, default=None, help="Memory limit of PostgreSQL")
+    parser.add_argument("-mc", "--manage-containers", action="store_true",
+                        help="Start every container with its limits before its suite and stop it afterwards; "
+                             "otherwise the limits are applied to the running containers with docker update")
+    parser.add_argument("-ld", "--log-dir", type=str, default=LOG_DIR, help="Log directory in parallel mode")
+    args, benchmark_args = parser.parse_known_args()
+
+    cpus = {"neo4j": args.neo4j_cpus, "postgres": args.postgres_cpus, "csr": args.csr_cpus}
+    memory = {"neo4j": args.neo4j_memory, "postgres": args.postgres_memory, "csr": None}
+    suites = [Suite(system, cpus[system], memory[system], args.manage_containers, benchmark_args)
+              for system in args.systems]
+
+    with Timer() as timer:
+        if args.mode == PARALLEL:
+            outcomes = run_parallel(suites, args.log_dir)
+        else:
+            outcomes = run_sequential(suites)
+
+    for system, (return_code, seconds) in outcomes.items():
+        print(f"{system}: {'finished' if return_code == 0 else f'failed ({return_code})'} after {seconds:.1f} s")
+    print(f"Total wall time ({args.mode}): {timer.wall_s:.1f} s")
+    sys.exit(max(return_code for return_code, _ in outcomes.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+import argparse
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from count_executor import (LSQB_QUERIES, SYSTEM, CountExecutorConnection, ExecutorCatalog, lsqb_sql, plan_term,
+                            query_terms)
+from csr_connection import FOF_PATTERN, FRONTIER_FOF_PATTERN, CSRConnection, frontier_fof
+from csr_graph import CSRGraph
+from query_files import read_queries
+from results_store import RESULTS_STORE_DIR, append_results
+from timing import Timer, monotonic_s
+from trie_join import EXPECTED_OUTPUT, expected_counts, scale_factor_of
+
+PARTITION = "partition"
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+# partial trails per worker the parent expands before it splits the trail enumeration across the workers
+TRAILS_PER_WORKER = 16
+
+
+def partition_of(values, parts):
+    """Hash partition of every value; the multiplicative hash also spreads ids with a common stride evenly."""
+    hashed = (np.asarray(values).astype(np.uint64) * HASH_MULTIPLIER) >> np.uint64(32)
+    return (hashed % np.uint64(parts)).astype(np.int64)
+
+
+class SharedArrays:
+    """Read-only NumPy arrays in shared memory: created once by the parent, attached by name in every worker."""
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec[key] = (block.name, array.shape, array.dtype.str)
+
+    def array(self, key):
+        name, shape, dtype = self.spec[key]
+        block = next(block for block in self.blocks if block.name == name)
+        return np.ndarray(shape, dtype, buffer=block.buf)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+# state of a worker process, set by its pool initializer
+_worker = {}
+
+
+def _attach(spec):
+    arrays = {}
+    blocks = []
+    for key, (name, shape, dtype) in spec.items():
+        # the workers share the resource tracker of the parent, which unlinks the memory if the parent dies
+        block = shared_memory.SharedMemory(name=name)
+        blocks.append(block)
+        arrays[key] = np.ndarray(shape, dtype, buffer=block.buf)
+    _worker.update(blocks=blocks, arrays=arrays)
+
+
+def _attach_relations(spec):
+    _attach(spec)
+    relations = {}
+    for (name, column), values in _worker["arrays"].items():
+        relations.setdefault(name, {})[column] = values
+    _worker["relations"] = {name: tuple(columns[column] for column in sorted(columns))
+                            for name, columns in relations.items()}
+
+
+def _attach_graph(spec):
+    _attach(spec)
+    arrays = _worker["arrays"]
+    _worker["graph"] = CSRGraph(arrays["ids"], arrays["indptr"], arrays["indices"], arrays["edge_ids"])
+
+
+class PartitionCatalog(ExecutorCatalog):
+    """The relations of the shared memory, plus the hash partitions of a relation on one of its columns.
+
+    A partition is named (PARTITION, relation, column, part, parts); it is derived in the worker, so every worker only
+    sorts and aggregates its share of the rows.
+    """
+
+    def __init__(self, relations):
+        super().__init__(None)
+        self.shared = relations
+
+    def _read_relation(self, name):
+        if name in self.shared:
+            return self.shared[name]
+        if isinstance(name, tuple) and name[0] == PARTITION:
+            _, relation, column, part, parts = name
+            columns = self.relation(relation)
+            keep = partition_of(columns[column], parts) == part
+            return tuple(values[keep] for values in columns)
+        return super()._read_relation(name)
+
+
+def driving_variable(atoms):
+    """The variable in most atoms of a term (the first one on ties): partitioning it splits the most relations."""
+    occurrences = {}
+    for _, *variables in atoms:
+        for variable in variables:
+            occurrences[variable] = occurrences.get(variable, 0) + 1
+    return max(occurrences, key=occurrences.get)
+
+
+def partition_term(atoms, optional, variable, part, parts):
+    """Restrict every atom of `variable` to the values of one hash partition.
+
+    Every match of the term binds `variable` to exactly one value, so the counts of the partitions add up to the count
+    of the term. Optional atoms only contain a variable of the required atoms on their preserved side, so restricting
+    them as well keeps the LEFT JOIN semantics.
+    """
+    def restrict(atom):
+        relation, *variables = atom
+        if variable not in variables:
+            return atom
+        return ((PARTITION, relation, variables.index(variable), part, parts), *variables)
+
+    return [restrict(atom) for atom in atoms], [restrict(atom) for atom in optional]
+
+
+def _count_partition(query, part, parts, deadline):
+    # a new catalog per task, so that no partition, plan or trie is cached across runs
+    catalog = PartitionCatalog(_worker["relations"])
+    total = 0
+    for sign, atoms, optional in query_terms(query):
+        if parts > 1:
+            atoms, optional = partition_term(atoms, optional, driving_variable(atoms), part, parts)
+        plan, _ = plan_term(atoms, optional, catalog, LSQB_QUERIES[query].get("order"))
+        total += sign * plan.count(catalog, deadline)
+    return total
+
+
+def _expand_partition(frontier):
+    graph = _worker["graph"]
+    reached, _ = graph.neighbors(frontier)
+    return np.unique(reached[~_worker["arrays"]["visited"][reached]])
+
+
+def _trail_ends(vertices, used, hops, deadline):
+    graph = _worker["graph"]
+    reached = np.zeros(graph.num_vertices, dtype=bool)
+    graph.mark_trail_ends(vertices, used, hops, reached, deadline)
+    return np.flatnonzero(reached)
+
+
+def _gather(futures):
+    """Results of all futures; on the first error the pending ones are cancelled and the error is raised."""
+    wait(futures)
+    try:
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _start(pool):
+    # a fork-based pool starts all its processes on the first task, so they are not started in a timed run
+    pool.submit(int).result()
+
+
+class ParallelCountConnection(CountExecutorConnection):
+    """The count executor on a pool of worker processes.
+
+    Every filter-free term of a query is hash-partitioned on its driving variable (e.g. person2 of q6, the person in
+    both KNOWS atoms), one partition per worker, and the partial counts are added up. The relations are shared with the
+    workers through shared memory once; the partitions, plans and tries are built by the workers in every run.
+    """
+
+    def __init__(self, data_dir, workers, queries=tuple(LSQB_QUERIES)):
+        self.data_dir = data_dir
+        self.workers = workers
+        self.names = lsqb_sql()
+        catalog = ExecutorCatalog(data_dir)
+        with Timer() as timer:
+            relations = {relation: catalog.relation(relation) for query in queries
+                         for _, atoms, optional in query_terms(query) for relation, *_ in atoms + optional}
+            self.shared = SharedArrays({(name, column): values for name, columns in relations.items()
+                                        for column, values in enumerate(columns)})
+            self.pool = ProcessPoolExecutor(workers, initializer=_attach_relations, initargs=(self.shared.spec,))
+            _start(self.pool)
+        self.load_time = timer.wall_s
+        print(f"Shared {len(relations)} relations with {workers} workers in {self.load_time:.2f} seconds")
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.shared.close()
+
+    def execute(self, query, timeout_seconds=None):
+        name = self.resolve(query)
+        if name is None:
+            raise ValueError("Unsupported query: only the LSQB queries of sql/lsqb/ can run on the count executor")
+        deadline = monotonic_s() + timeout_seconds if timeout_seconds is not None else None
+        futures = [self.pool.submit(_count_partition, name, part, self.workers, deadline)
+                   for part in range(self.workers)]
+        return [(sum(_gather(futures)),)]
+
+
+class ParallelCSRConnection(CSRConnection):
+    """The FOF queries of the CSR engine on a pool of worker processes, with the same semantics as CSRConnection.
+
+    `-[:KNOWS*k]-` queries expand the trails from the start person in the parent until there are enough to split, then
+    hash-partition them on their last edge; every worker enumerates the rest of its trails on the shared adjacency
+    arrays and returns their distinct end persons. The frontier queries run a level-synchronous BFS: the frontier of
+    every level is hash-partitioned, every worker returns the new unvisited vertices of its share, and the parent
+    merges them and marks them visited. Shortest path queries run in the parent. Concurrent clients of the frontier
+    queries take turns, as the visited array is shared.
+    """
+
+    def __init__(self, data_dir, workers):
+        super().__init__(data_dir)
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.shared = SharedArrays({"ids": self.graph.ids, "indptr": self.graph.indptr, "indices": self.graph.indices,
+                                    "edge_ids": self.graph.edge_ids,
+                                    "visited": np.zeros(self.graph.num_vertices, dtype=bool)})
+        self.visited = self.shared.array("visited")
+        self.pool = ProcessPoolExecutor(workers, initializer=_attach_graph, initargs=(self.shared.spec,))
+        _start(self.pool)
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        self.shared.close()
+        super().close()
+
+    def execute(self, query_string, timeout_seconds=None):
+        deadline = monotonic_s() + timeout_seconds if timeout_seconds is not None else None
+        match = FOF_PATTERN.search(query_string)
+        if match:
+            start_id, hops = (int(group) for group in match.groups())
+            return [{"countOfPersons": self.k_trail_count(start_id, hops, deadline)}]
+        match = FRONTIER_FOF_PATTERN.search(query_string)
+        if match:
+            start_id, hops, within = frontier_fof(match)
+            with self.lock:
+                return [{"countOfPersons": self.k_hop_count(start_id, hops, deadline, within)}]
+        return super().execute(query_string, timeout_seconds)
+
+    def k_trail_count(self, person_id, hops, deadline=None):
+        source = self.graph.vertex(person_id)
+        if source is None:
+            return 0
+        vertices, used = np.array([source], dtype=np.int64), np.empty((1, 0), dtype=np.int64)
+        while used.shape[1] < hops and 0 < len(vertices) < TRAILS_PER_WORKER * self.workers:
+            _check_deadline(deadline)
+            vertices, used = self.graph.extend_trails(vertices, used)
+        parts = partition_of(used[:, -1] if used.shape[1] else vertices, self.workers)
+        futures = [self.pool.submit(_trail_ends, vertices[parts == part], used[parts == part],
+                                    hops - used.shape[1], deadline) for part in range(self.workers)]
+        reached = np.zeros(self.graph.num_vertices, dtype=bool)
+        for ends in _gather(futures):
+            reached[ends] = True
+        reached[source] = False
+        return int(reached.sum())
+
+    def k_hop_count(self, person_id, hops, deadline=None, within=False):
+        source = self.graph.vertex(person_id)
+        if source is None:
+            return 0
+        self.visited[:] = False
+        self.visited[source] = True
+        frontier = np.array([source], dtype=np.int64)
+        for _ in range(hops):
+            _check_deadline(deadline)
+            parts = partition_of(frontier, self.workers)
+            futures = [self.pool.submit(_expand_partition, frontier[parts == part]) for part in range(self.workers)]
+            frontier = np.unique(np.concatenate(_gather(futures)))
+            self.visited[frontier] = True
+            if len(frontier) == 0:
+                break
+        return max(int(self.visited.sum()) - 1, 0) if within else len(frontier)
+
+
+def _check_deadline(deadline):
+    if deadline is not None and monotonic_s() > deadline:
+        raise TimeoutError("Query exceeded the configured timeout")
+
+
+def worker_counts(max_workers):
+    """1, 2, 4, ... up to and including `max_workers`."""
+    counts = [1]
+    while counts[-1] * 2 < max_workers:
+        counts.append(counts[-1] * 2)
+    return counts + [max_workers] if max_workers > 1 else counts
+
+
+def speedup_curves(rows):
+    """Median time per system, query and number of workers, with the speedup and efficiency relative to 1 worker."""
+    curves = pd.DataFrame(rows, columns=["system", "filename", "workers", "median_execution_time_s", "count"])
+    single = curves.loc[curves["workers"] == 1, ["system", "filename", "median_execution_time_s"]]
+    curves = curves.merge(single, on=["system", "filename"], how="left", suffixes=("", "_single"))
+    curves["speedup"] = curves.pop("median_execution_time_s_single") / curves["median_execution_time_s"]
+    curves["efficiency"] = curves["speedup"] / curves["workers"]
+    return curves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the speedup of the LSQB count executor and the CSR FOF "
+                                                 "queries over the number of worker processes")
+    parser.add_argument("data_dir", type=str, help="Data set directory in either format")
+    parser.add_argument("-q", "--queries", nargs="*", default=list(LSQB_QUERIES), choices=list(LSQB_QUERIES),
+                        help="LSQB queries to run (none with -q and no values)")
+    parser.add_argument("-f", "--fof-dir", type=str, default=None,
+                        help="Directory of FOF Cypher queries for the CSR engine, e.g. ../cypher/fof or "
+                             "../cypher/fof_frontier; without it no FOF queries are run")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=worker_counts(os.cpu_count()),
+                        help="Numbers of worker processes (default: powers of two up to the number of cores)")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="Number of runs per query")
+    parser.add_argument("-t", "--timeout", type=int, default=600, help="Timeout per run in seconds")
+    parser.add_argument("-sf", "--scale-factor", type=str, default=None,
+                        help="Scale factor of the expected counts and the results store (default: from data_dir)")
+    parser.add_argument("-e", "--expected", type=str, default=EXPECTED_OUTPUT, help="Expected output file")
+    parser.add_argument("-o", "--result-dir", type=str, default="parallel_results", help="Result directory")
+    parser.add_argument("-sd", "--store-dir", type=str, default=RESULTS_STORE_DIR,
+                        help="Directory of the partitioned Parquet results store")
+    args = parser.parse_args()
+
+    scale_factor = args.scale_factor or scale_factor_of(args.data_dir)
+    expected = expected_counts(scale_factor, args.expected) if scale_factor else {}
+    workers = sorted(set([1, *args.workers]))
+    rows = []
+    for count in workers:
+        if args.queries:
+            connection = ParallelCountConnection(args.data_dir, count, args.queries)
+            try:
+                _, query_stats = connection.run_queries([(query, None) for query in args.queries],
+                                                        result_dir=f"{args.result_dir}/{SYSTEM}-{count}p",
+                                                        runs=args.runs, timeout_seconds=args.timeout,
+                                                        expected=expected)
+            finally:
+                connection.close()
+            rows += [(SYSTEM, stats["filename"], count, stats["median_execution_time_s"], stats["count"])
+                     for stats in query_stats]
+            append_results(query_stats, SYSTEM, f"lsqb-{count}p", scale_factor, store_dir=args.store_dir)
+        if args.fof_dir is not None:
+            connection = ParallelCSRConnection(args.data_dir, count)
+            try:
+                _, query_stats = connection.run_queries(read_queries(args.fof_dir, ".cypher"),
+                                                        result_dir=f"{args.result_dir}/csr-{count}p",
+                                                        runs=args.runs, timeout_seconds=args.timeout)
+            finally:
+                connection.close()
+            rows += [("csr", stats["filename"], count, stats["median_execution_time_s"],
+                      stats["result"][0]["countOfPersons"] if stats["result"] else None) for stats in query_stats]
+            variant = os.path.basename(os.path.normpath(args.fof_dir))
+            append_results(query_stats, "csr", f"{variant}-{count}p", scale_factor, store_dir=args.store_dir)
+
+    curves = speedup_curves(rows)
+    if not os.path.exists(args.result_dir):
+        os.makedirs(args.result_dir)
+    curves.to_csv(f"{args.result_dir}/parallel_speedup.csv", index=False)
+    print(curves.pivot_table(index=["system", "filename"], columns="workers", values="speedup").round(2).to_string())
+    inconsistent = curves.groupby(["system", "filename"])["count"].nunique() > 1
+    for system, filename in inconsistent[inconsistent].index:
+        print(f"{system} {filename}: the counts differ between the numbers of workers")
+
+
+if __name__ == "__main__":
+    main()
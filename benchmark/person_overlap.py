@@ -1,26 +1,24 @@
-import pandas as pd
+from functools import reduce
 
-# Define the base path and the specific file paths
+import numpy as np
+
+from dataset_convert import open_table
+
+# Define the base path and the specific data set directories
 BASE_PATH = "../data"
 
-file_paths = [
-    f'{BASE_PATH}/social-network-sf0.1-merged-fk/Person.csv',
-    f'{BASE_PATH}/social-network-sf0.3-merged-fk/Person.csv',
-    f'{BASE_PATH}/social-network-sf1-merged-fk/Person.csv'
+data_dirs = [
+    f'{BASE_PATH}/social-network-sf0.1-merged-fk',
+    f'{BASE_PATH}/social-network-sf0.3-merged-fk',
+    f'{BASE_PATH}/social-network-sf1-merged-fk'
 ]
 
 def main():
-    # Initialize a list to hold ID sets from each file
-    id_sets = []
-
-    for file_path in file_paths:
-        df = pd.read_csv(file_path, delimiter='|')
-        # Append the set of IDs from this file to the list
-        id_sets.append(set(df['id']))
+    # The id column of Person.csv of every data set, memory-mapped from its column store
+    id_columns = [open_table(data_dir, "Person")["id"][0] for data_dir in data_dirs]
 
-    # Compute the intersection of all ID sets
-    common_person_ids = set.intersection(*id_sets)
-    common_person_ids = sorted(list(common_person_ids))
+    # Intersect the sorted id arrays instead of building Python sets
+    common_person_ids = reduce(np.intersect1d, id_columns)
 
     # Print all person IDs that are common across all files
     for person_id in common_person_ids:
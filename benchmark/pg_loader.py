@@ -0,0 +1,173 @@
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv, find_dotenv
+from psycopg import connect
+
+from column_store import read_chunks
+from timing import Timer
+
+load_dotenv(find_dotenv(), override=True)
+
+POSTGRES_HOST = os.getenv('POSTGRES_HOST')
+POSTGRES_PORT = os.getenv('POSTGRES_PORT')
+POSTGRES_USER = os.getenv('POSTGRES_USER')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sql", "general")
+# optional post-load script that materializes the person_adj adjacency lists
+ADJACENCY_SCRIPT = os.path.join(SQL_DIR, "adjacency.sql")
+CHUNK_ROWS = 1_000_000
+
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + np.array([0, 0], dtype=">i4").tobytes()
+COPY_TRAILER = np.array([-1], dtype=">i2").tobytes()
+LOAD_STATEMENT = re.compile(r"COPY\s+(\w+)\s*(?:\(([^)]*)\))?\s+FROM\s+'PATHVAR/([^']+)'", re.IGNORECASE)
+
+
+def parse_load_script(path):
+    """Return (table, columns, csv file) for every COPY statement of a load script like `snb-load.sql`."""
+    with open(path, 'r') as file:
+        script = file.read()
+    tasks = []
+    for table, columns, filename in LOAD_STATEMENT.findall(script):
+        columns = [column.strip() for column in columns.split(",")] if columns else None
+        tasks.append((table, columns, filename))
+    return tasks
+
+
+def encode_binary_copy(columns):
+    """Encode int64 columns as the tuples of a `COPY ... (FORMAT binary)` stream without a per-row Python loop.
+
+    `columns` is a list of (values, null_mask) pairs; `null_mask` may be None for columns without NULLs. Every tuple is
+    a big-endian int16 field count followed by an int32 length (-1 for NULL) and the 8 byte value of each field.
+    """
+    num_rows = len(columns[0][0])
+    not_null = [np.ones(num_rows, dtype=bool) if null is None else ~null for _, null in columns]
+    row_sizes = 2 + sum(4 + 8 * mask.astype(np.int64) for mask in not_null)
+    starts = np.zeros(num_rows, dtype=np.int64)
+    np.cumsum(row_sizes[:-1], out=starts[1:])
+    buffer = np.empty(int(row_sizes.sum()), dtype=np.uint8)
+
+    def scatter(positions, values, dtype):
+        # an explicit width, since a chunk can have no value at all for a column that is NULL in every row
+        width = np.dtype(dtype).itemsize
+        encoded = np.ascontiguousarray(values, dtype=dtype).view(np.uint8).reshape(len(positions), width)
+        buffer[positions[:, None] + np.arange(encoded.shape[1])] = encoded
+
+    scatter(starts, np.full(num_rows, len(columns)), ">i2")
+    positions = starts + 2
+    for (values, _), mask in zip(columns, not_null):
+        scatter(positions, np.where(mask, 8, -1), ">i4")
+        positions = positions + 4
+        scatter(positions[mask], values[mask], ">i8")
+        positions = positions + 8 * mask
+    return buffer.tobytes()
+
+
+def copy_binary(cursor, table, columns, chunks):
+    """Stream chunks of columns (lists of (values, null_mask)) into `table` with binary COPY; returns the row count."""
+    column_list = f" ({', '.join(columns)})" if columns else ""
+    rows = 0
+    with cursor.copy(f"COPY {table}{column_list} FROM STDIN (FORMAT binary)") as copy:
+        copy.write(COPY_HEADER)
+        for chunk in chunks:
+            copy.write(encode_binary_copy(chunk))
+            rows += len(chunk[0][0])
+        copy.write(COPY_TRAILER)
+    return rows
+
+
+def read_csv_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield the columns of an LSQB CSV file as (int64 values, null mask) pairs in chunks of `chunk_rows` rows."""
+    for frame in pd.read_csv(path, delimiter='|', dtype="Int64", chunksize=chunk_rows):
+        yield [(frame[column].to_numpy(dtype=np.int64, na_value=0), frame[column].isna().to_numpy())
+               for column in frame.columns]
+
+
+def connection_kwargs():
+    return {"host": POSTGRES_HOST, "port": POSTGRES_PORT, "user": POSTGRES_USER, "password": POSTGRES_PASSWORD}
+
+
+def load_table(table, columns, path, kwargs, chunk_rows=CHUNK_ROWS, store_dir=None):
+    """Load one CSV file over its own connection; runs in a worker process.
+
+    With `store_dir` the columns are read from the column store of `dataset_convert.py` instead of parsing the CSV file.
+    """
+    if store_dir:
+        chunks = read_chunks(store_dir, os.path.splitext(os.path.basename(path))[0], chunk_rows)
+    else:
+        chunks = read_csv_chunks(path, chunk_rows)
+    with connect(**kwargs) as conn, conn.cursor() as cursor:
+        cursor.execute("SET synchronous_commit TO off")
+        with Timer() as timer:
+            rows = copy_binary(cursor, table, columns, chunks)
+            conn.commit()
+    return table, os.path.basename(path), rows, timer.wall_s
+
+
+def run_script(kwargs, path):
+    with open(path, 'r') as file, connect(**kwargs) as conn:
+        conn.execute(file.read())
+
+
+def load_dataset(data_dir, kwargs, workers=4, load_script=None, pre_load_scripts=None, post_load_scripts=None,
+                 chunk_rows=CHUNK_ROWS, store_dir=None):
+    """Recreate the schema, load all tables of `load_script` in parallel and only then run the post-load scripts.
+
+    Views, indexes and constraints belong into the post-load scripts so they are built once over the complete data
+    instead of being maintained row by row during the load.
+    """
+    load_script = load_script or os.path.join(SQL_DIR, "snb-load.sql")
+    if pre_load_scripts is None:
+        pre_load_scripts = [os.path.join(SQL_DIR, "drop.sql"), os.path.join(SQL_DIR, "schema.sql")]
+    if post_load_scripts is None:
+        post_load_scripts = [os.path.join(SQL_DIR, "views.sql")]
+
+    for script in pre_load_scripts:
+        run_script(kwargs, script)
+
+    stats = []
+    with Timer() as load_timer:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(load_table, table, columns, os.path.join(data_dir, filename), kwargs, chunk_rows,
+                                store_dir)
+                for table, columns, filename in parse_load_script(load_script)
+            ]
+            for future in as_completed(futures):
+                table, filename, rows, seconds = future.result()
+                stats.append({"table": table, "file": filename, "rows": rows, "seconds": seconds,
+                              "rows_per_s": rows / seconds if seconds > 0 else None})
+                print(f"Loaded {rows:_} rows into {table} from {filename} in {seconds:.2f} s "
+                      f"({rows / max(seconds, 1e-9):_.0f} rows/s)")
+
+    with Timer() as post_load_timer:
+        for script in post_load_scripts:
+            run_script(kwargs, script)
+
+    total_rows = sum(stat["rows"] for stat in stats)
+    print(f"Loaded {total_rows:_} rows in {load_timer.wall_s:.2f} s "
+          f"({total_rows / max(load_timer.wall_s, 1e-9):_.0f} rows/s), post-load took {post_load_timer.wall_s:.2f} s")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load an LSQB merged-fk data set into PostgreSQL with binary COPY")
+    parser.add_argument("data_dir", type=str, help="Data set directory, e.g. data/social-network-sf1-merged-fk")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Number of tables loaded in parallel")
+    parser.add_argument("-c", "--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows encoded per COPY buffer")
+    parser.add_argument("-l", "--load-script", type=str, default=None,
+                        help="Load script with the COPY statements (default: sql/general/snb-load.sql)")
+    parser.add_argument("-pl", "--post-load", nargs="*", default=None,
+                        help="SQL scripts run after all tables are loaded, e.g. views, indexes and "
+                             "sql/general/adjacency.sql (default: sql/general/views.sql)")
+    parser.add_argument("-cs", "--column-store", type=str, default=None,
+                        help="Read the tables from this column store built by dataset_convert.py instead of the CSV "
+                             "files")
+    args = parser.parse_args()
+    load_dataset(args.data_dir, connection_kwargs(), args.workers, args.load_script,
+                 post_load_scripts=args.post_load, chunk_rows=args.chunk_rows, store_dir=args.column_store)
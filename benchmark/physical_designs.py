@@ -0,0 +1,281 @@
+import argparse
+import csv
+import os
+import statistics
+import subprocess
+
+from dotenv import load_dotenv, find_dotenv
+from psycopg import connect
+
+from neo4j_connection import Neo4jConnection
+from postgres_connection import PostgreSQLConnection
+from query_files import read_queries
+from repetitions import RepetitionScheduler
+from results_store import RESULTS_STORE_DIR, append_results
+
+load_dotenv(find_dotenv(), override=True)
+
+NEO4J_URI = os.getenv('NEO4J_URI')
+NEO4J_USER = os.getenv('NEO4J_USER')
+NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
+POSTGRES_HOST = os.getenv('POSTGRES_HOST')
+POSTGRES_PORT = os.getenv('POSTGRES_PORT')
+POSTGRES_USER = os.getenv('POSTGRES_USER')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+SF = os.getenv('SF')
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SWEEP_DIR = "design_sweep"
+BASELINE = "baseline"
+
+# feature -> statements; everything a design creates is prefixed with design_ so that reset() can drop it again
+POSTGRES_INDEXES = {
+    "btree": "CREATE INDEX design_pkp_btree ON Person_knows_Person USING btree (person1id)",
+    "hash": "CREATE INDEX design_pkp_hash ON Person_knows_Person USING hash (person1id)",
+    "composite": "CREATE INDEX design_pkp_composite ON Person_knows_Person USING btree (person1id, person2id)",
+}
+# features with a value, e.g. work_mem=256MB; applied with ALTER SYSTEM so that every new connection picks them up
+POSTGRES_SETTINGS = {
+    "work_mem": ["ALTER SYSTEM SET work_mem = '{value}'"],
+    "parallel_workers": ["ALTER SYSTEM SET max_parallel_workers_per_gather = {value}",
+                         "ALTER TABLE Person_knows_Person SET (parallel_workers = {value})"],
+}
+POSTGRES_RESET = [
+    "ALTER SYSTEM RESET work_mem",
+    "ALTER SYSTEM RESET max_parallel_workers_per_gather",
+    "ALTER TABLE Person_knows_Person RESET (parallel_workers)",
+    "SELECT pg_reload_conf()",
+]
+CLUSTER = "cluster"
+POSTGRES_FEATURES = list(POSTGRES_INDEXES) + list(POSTGRES_SETTINGS) + [CLUSTER]
+
+NEO4J_SCHEMA = {
+    "index": "CREATE INDEX design_person_id IF NOT EXISTS FOR (p:Person) ON (p.id)",
+    "constraint": "CREATE CONSTRAINT design_person_id_unique IF NOT EXISTS FOR (p:Person) REQUIRE p.id IS UNIQUE",
+}
+NEO4J_RESET = [
+    "DROP INDEX design_person_id IF EXISTS",
+    "DROP CONSTRAINT design_person_id_unique IF EXISTS",
+]
+PAGECACHE = "pagecache"
+NEO4J_FEATURES = list(NEO4J_SCHEMA) + [PAGECACHE]
+VALUED_FEATURES = list(POSTGRES_SETTINGS) + [PAGECACHE]
+
+DEFAULT_POSTGRES_DESIGNS = [BASELINE, "btree", "hash", "composite", "composite+work_mem=256MB",
+                            "composite+parallel_workers=4", "composite+cluster"]
+DEFAULT_NEO4J_DESIGNS = [BASELINE, "index", "constraint", "constraint+pagecache=4g"]
+
+
+def parse_design(spec, features):
+    """Features of a design spec like "composite+cluster+work_mem=256MB" as a dict of feature -> value."""
+    design = {}
+    if spec == BASELINE:
+        return design
+    for part in spec.split("+"):
+        feature, _, value = part.partition("=")
+        if feature not in features:
+            raise ValueError(f"Unknown feature '{feature}' in design '{spec}', expected one of {features}")
+        if (feature in VALUED_FEATURES) != bool(value):
+            raise ValueError(f"Feature '{feature}' in design '{spec}' "
+                             f"{'needs a value, e.g. ' + feature + '=...' if not value else 'takes no value'}")
+        design[feature] = value or None
+    return design
+
+
+class PostgresDesigner:
+    """Applies physical designs of Person_knows_Person to the running Postgres database."""
+
+    def __init__(self, host, port, user, password):
+        self.kwargs = {"host": host, "port": port, "user": user, "password": password}
+
+    def execute(self, statements):
+        # ALTER SYSTEM and CLUSTER cannot run inside a transaction block
+        with connect(**self.kwargs, autocommit=True) as conn:
+            for statement in statements:
+                print(f"  {statement}")
+                conn.execute(statement)
+
+    def reset(self):
+        """Drop the indexes and settings of the previous design.
+
+        CLUSTER rewrites the table once and cannot be undone, so designs after a clustered one keep its row order;
+        put clustered designs last or reload the data set.
+        """
+        statements = [f"DROP INDEX IF EXISTS {name}" for name in
+                      [statement.split()[2] for statement in POSTGRES_INDEXES.values()]]
+        self.execute(statements + POSTGRES_RESET)
+
+    def apply(self, spec):
+        design = parse_design(spec, POSTGRES_FEATURES)
+        self.reset()
+        statements = [POSTGRES_INDEXES[feature] for feature in POSTGRES_INDEXES if feature in design]
+        for feature in POSTGRES_SETTINGS:
+            if feature in design:
+                statements += [statement.format(value=design[feature]) for statement in POSTGRES_SETTINGS[feature]]
+        if CLUSTER in design:
+            clusterable = [statement.split()[2] for feature, statement in POSTGRES_INDEXES.items()
+                           if feature in design and "USING hash" not in statement]
+            if not clusterable:
+                raise ValueError(f"Design '{spec}' clusters the table but has no B-tree index to cluster on")
+            statements.append(f"CLUSTER Person_knows_Person USING {clusterable[0]}")
+        self.execute(statements + ["SELECT pg_reload_conf()", "ANALYZE"])
+
+
+class Neo4jDesigner:
+    """Applies physical designs to Neo4j: the Person(id) index or constraint and the page cache size.
+
+    A page cache size restarts the container through neo/stop.sh and neo/start.sh with the setting passed as an
+    environment variable; designs without one restart it with the default once a previous design changed it.
+    """
+
+    def __init__(self, uri, user, password):
+        self.uri = uri
+        self.user = user
+        self.password = password
+        self.pagecache = None
+
+    def execute(self, statements):
+        connection = Neo4jConnection(self.uri, self.user, self.password)
+        try:
+            for statement in statements:
+                print(f"  {statement}")
+                connection.execute(statement, timeout_seconds=None)
+        finally:
+            connection.close()
+
+    def restart(self, pagecache):
+        env = dict(os.environ)
+        if pagecache:
+            env["NEO4J_ENV_VARS"] = f"--env NEO4J_server_memory_pagecache_size={pagecache}"
+        print(f"  Restarting Neo4j with page cache {pagecache or 'default'}")
+        subprocess.run([os.path.join(ROOT_DIR, "neo", "stop.sh")], check=True)
+        subprocess.run([os.path.join(ROOT_DIR, "neo", "start.sh")], env=env, check=True)
+        self.pagecache = pagecache
+
+    def apply(self, spec):
+        design = parse_design(spec, NEO4J_FEATURES)
+        if design.get(PAGECACHE) != self.pagecache:
+            self.restart(design.get(PAGECACHE))
+        statements = NEO4J_RESET + [NEO4J_SCHEMA[feature] for feature in NEO4J_SCHEMA if feature in design]
+        # Neo4j has no ANALYZE: wait for the indexes to come online and replan with fresh statistics
+        self.execute(statements + ["CALL db.awaitIndexes(3600)", "CALL db.resampleOutdatedIndexes()",
+                                   "CALL db.clearQueryCaches()"])
+
+
+def sweep(system, designer, create_connection, designs, suites, scheduler, timeout_seconds, scale_factor,
+          store_dir=RESULTS_STORE_DIR, sweep_dir=SWEEP_DIR):
+    """Apply every design, run the query suites on it and return the stats per (suite, design)."""
+    extension, query_root = (".sql", "sql") if system == "postgres" else (".cypher", "cypher")
+    stats = {}
+    for spec in designs:
+        print(f"Applying {system} design {spec}")
+        designer.apply(spec)
+        connection = create_connection()
+        try:
+            for suite in suites:
+                queries = read_queries(os.path.join(ROOT_DIR, query_root, suite), extension)
+                result_dir = os.path.join(sweep_dir, system, f"{suite}-{spec}")
+                _, suite_stats = connection.run_queries(queries, result_dir=result_dir, runs=scheduler.runs,
+                                                        timeout_seconds=timeout_seconds, scheduler=scheduler)
+                for index, query_stats in enumerate(suite_stats):
+                    query_stats["query_index"] = index + 1
+                append_results(suite_stats, system, f"{suite}-{spec}", scale_factor, store_dir=store_dir)
+                stats[(suite, spec)] = suite_stats
+        finally:
+            connection.close()
+    designer.apply(BASELINE)
+    return stats
+
+
+def rank_designs(stats, timeout_seconds):
+    """Rank the designs of every suite by the geometric mean of their per-query median times.
+
+    Failed and timed-out queries count with the timeout, so a design cannot win by failing its slowest queries.
+    """
+    rows = []
+    for (suite, spec), suite_stats in stats.items():
+        if not suite_stats:
+            continue
+        times = []
+        failed = 0
+        for query_stats in suite_stats:
+            time_s = query_stats.get("median_execution_time_s") or query_stats.get("mean_execution_time_s")
+            if query_stats["errors"] or query_stats.get("censored_runs") or not time_s:
+                failed += 1
+                time_s = timeout_seconds
+            times.append(time_s)
+        rows.append({"suite": suite, "design": spec, "queries": len(times), "failed": failed,
+                     "geomean_s": statistics.geometric_mean(times),
+                     "total_s": sum(times)})
+    ranked = []
+    for suite in dict.fromkeys(row["suite"] for row in rows):
+        suite_rows = sorted((row for row in rows if row["suite"] == suite), key=lambda row: row["geomean_s"])
+        baseline = next((row["geomean_s"] for row in suite_rows if row["design"] == BASELINE), None)
+        for rank, row in enumerate(suite_rows, start=1):
+            row["rank"] = rank
+            row["speedup_vs_baseline"] = baseline / row["geomean_s"] if baseline else None
+            ranked.append(row)
+    return ranked
+
+
+def save_ranking(ranking, system, sweep_dir=SWEEP_DIR):
+    if not os.path.exists(sweep_dir):
+        os.makedirs(sweep_dir)
+    with open(os.path.join(sweep_dir, f"{system}_ranking.csv"), "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=["suite", "rank", "design", "geomean_s", "speedup_vs_baseline",
+                                                  "total_s", "queries", "failed"])
+        writer.writeheader()
+        writer.writerows(ranking)
+
+
+def print_ranking(ranking, system):
+    for row in ranking:
+        speedup = f"{row['speedup_vs_baseline']:.2f}x" if row["speedup_vs_baseline"] else "-"
+        print(f"{system} {row['suite']:<6} #{row['rank']} {row['design']:<32} geomean {row['geomean_s']:.4f} s  "
+              f"vs baseline {speedup:>7}  failed {row['failed']}/{row['queries']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply a matrix of physical designs one after another and rank "
+                                                 "them by the run time of the query suites")
+    parser.add_argument("-p", "--postgres-designs", nargs="*", default=None,
+                        help=f"Postgres designs, features joined with +, e.g. composite+work_mem=256MB (features: "
+                             f"{', '.join(POSTGRES_FEATURES)}; default: {' '.join(DEFAULT_POSTGRES_DESIGNS)})")
+    parser.add_argument("-n", "--neo4j-designs", nargs="*", default=None,
+                        help=f"Neo4j designs, e.g. constraint+pagecache=4g (features: {', '.join(NEO4J_FEATURES)}; "
+                             f"default: {' '.join(DEFAULT_NEO4J_DESIGNS)})")
+    parser.add_argument("-su", "--suites", nargs="+", default=["fof", "lsqb"],
+                        help="Query suites, i.e. directories of sql/ and cypher/")
+    parser.add_argument("-t", "--timeout", type=int, default=120, help="Timeout in seconds for each individual run")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="Number of measured runs for each query")
+    parser.add_argument("-w", "--warmup", type=int, default=1, help="Unrecorded warm-up runs after applying a design")
+    parser.add_argument("-sf", "--scale-factor", type=str, default=SF,
+                        help="Scale factor recorded in the results store (defaults to $SF)")
+    parser.add_argument("-sd", "--store-dir", type=str, default=RESULTS_STORE_DIR,
+                        help="Directory of the partitioned Parquet results store")
+    parser.add_argument("-o", "--output-dir", type=str, default=SWEEP_DIR,
+                        help="Directory of the per-design summaries and the rankings")
+    args = parser.parse_args()
+
+    scheduler = RepetitionScheduler(args.runs, warmup=args.warmup)
+    systems = []
+    if args.postgres_designs is not None:
+        systems.append(("postgres", PostgresDesigner(POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD),
+                        lambda: PostgreSQLConnection(POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD),
+                        args.postgres_designs or DEFAULT_POSTGRES_DESIGNS))
+    if args.neo4j_designs is not None:
+        systems.append(("neo4j", Neo4jDesigner(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD),
+                        lambda: Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD),
+                        args.neo4j_designs or DEFAULT_NEO4J_DESIGNS))
+    if not systems:
+        parser.error("Pass -p and/or -n, optionally followed by the designs to sweep")
+
+    for system, designer, create_connection, designs in systems:
+        # validate the whole matrix before the first design changes the database
+        for spec in designs:
+            parse_design(spec, POSTGRES_FEATURES if system == "postgres" else NEO4J_FEATURES)
+        stats = sweep(system, designer, create_connection, designs, args.suites, scheduler, args.timeout,
+                      args.scale_factor, args.store_dir, args.output_dir)
+        ranking = rank_designs(stats, args.timeout)
+        save_ranking(ranking, system, args.output_dir)
+        print_ranking(ranking, system)
@@ -1,79 +1,210 @@
 import csv
 import os
 import statistics
-import time
+from contextlib import contextmanager
 
 from psycopg import connect, OperationalError, ProgrammingError
+from psycopg_pool import ConnectionPool
 from tqdm import tqdm
 
+from cancellation import WATCHDOG
 from iconnection import IConnection
+from query_plans import postgres_plan, postgres_shape, plan_stats, save_plans
+from repetitions import RepetitionScheduler, TIMEOUT
+from result_stream import consume_stream
+from server_timings import postgres_server_timings, client_overhead
+from timing import Timer, save_runs
+
+
+COLD_CONNECTION = "cold"
+POOLED_CONNECTION = "pooled"
+CONNECTION_MODES = [COLD_CONNECTION, POOLED_CONNECTION]
 
 
 class PostgreSQLConnection(IConnection):
-    def __init__(self, host, port, user, password):
+    """Postgres client with two connection modes.
+
+    `cold` opens a new connection for every run and closes it afterwards, so each run starts on a fresh backend.
+    `pooled` keeps `pool_size` warm connections open in a psycopg_pool and hands them out per run; the pool is filled
+    before the first query so connection setup never ends up in the measured time.
+
+    With `streaming` the result is read through a server-side cursor in batches of `itersize` rows and only a row count
+    and checksum are kept, which bounds the client memory for large results.
+    """
+
+    def __init__(self, host, port, user, password, mode=COLD_CONNECTION, pool_size=1, server_timings=False,
+                 streaming=False, itersize=2000, capture_plans=False):
+        if mode not in CONNECTION_MODES:
+            raise ValueError(f"Unknown connection mode '{mode}', expected one of {CONNECTION_MODES}")
         self.host = host
         self.port = port
         self.user = user
         self.password = password
+        self.mode = mode
+        self.pool_size = pool_size
+        self.server_timings = server_timings
+        self.streaming = streaming
+        self.itersize = itersize
+        self.capture_plans = capture_plans
         self.conn = None
+        self.pool = None
 
     def connect(self):
         if self.conn is None or self.conn.closed:
             self.conn = connect(host=self.host, port=self.port, user=self.user, password=self.password)
 
+    def open_pool(self):
+        if self.pool is None:
+            self.pool = ConnectionPool(
+                kwargs={"host": self.host, "port": self.port, "user": self.user, "password": self.password},
+                min_size=self.pool_size, max_size=self.pool_size, open=True
+            )
+            # block until all connections are established
+            self.pool.wait()
+
     def close(self):
         if self.conn and not self.conn.closed:
             self.conn.close()
-
-    def run_queries(self, queries, result_dir="postgres_results", runs=5, timeout_seconds=120):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    @contextmanager
+    def session(self):
+        """Yield a connection according to the connection mode; setup happens before the caller starts timing."""
+        if self.mode == POOLED_CONNECTION:
+            self.open_pool()
+            # the pool commits on success and rolls back on errors when the connection is returned
+            with self.pool.connection() as conn:
+                yield conn
+        else:
+            self.connect()
+            try:
+                yield self.conn
+            finally:
+                self.conn.close()
+
+    def cancel_backend(self, backend_pid):
+        """Cancel the statement running on `backend_pid` server-side; called by the watchdog thread."""
+        with connect(host=self.host, port=self.port, user=self.user, password=self.password) as conn:
+            conn.execute("SELECT pg_cancel_backend(%s)", (backend_pid,))
+
+    def watch(self, conn, timeout_seconds):
+        backend_pid = conn.info.backend_pid
+        return WATCHDOG.watch(timeout_seconds, cancel=lambda: self.cancel_backend(backend_pid))
+
+    def execute(self, query, timeout_seconds=120):
+        with self.session() as conn:
+            with conn.cursor() as cursor, self.watch(conn, timeout_seconds):
+                cursor.execute(query)
+                rows = cursor.fetchall()
+            return rows
+
+    def run_queries(self, queries, result_dir="postgres_results", runs=5, timeout_seconds=120, scheduler=None):
+        scheduler = scheduler or RepetitionScheduler(runs)
         results = []
         all_query_stats = []
 
         for idx, (filename, query) in enumerate(queries):
             execution_times = []
+            wall_times_ns = []
+            cpu_times_ns = []
             query_errors = []
             rows = []
+            num_records = 0
+            checksum = None
+            censored_runs = 0
 
-            for _ in tqdm(range(runs), desc=f"Executing {filename}"):
+            schedule = scheduler.schedule(execution_times)
+            for warmup in tqdm(schedule, total=schedule.total, desc=f"Executing {filename}"):
                 try:
-                    self.connect()
-                    with self.conn.cursor() as cursor:
-                        cursor.execute(f"SET statement_timeout TO {timeout_seconds * 1000}")
-
-                        start_time = time.time()
-                        cursor.execute(query)
-                        rows = cursor.fetchall()
-                        end_time = time.time()
-                        execution_times.append(end_time - start_time)
-
-                        cursor.execute("SET statement_timeout TO DEFAULT")
-                except (OperationalError, ProgrammingError) as e:
-                    self.close()
+                    with self.session() as conn, conn.cursor() as cursor, self.watch(conn, timeout_seconds):
+                        with Timer() as timer:
+                            if self.streaming:
+                                with conn.cursor(name="benchmark_stream") as stream:
+                                    stream.itersize = self.itersize
+                                    stream.execute(query)
+                                    rows, num_records, checksum = consume_stream(stream)
+                            else:
+                                cursor.execute(query)
+                                rows = cursor.fetchall()
+                                num_records = len(rows)
+                        if not warmup:
+                            execution_times.append(timer.wall_s)
+                            wall_times_ns.append(timer.wall_ns)
+                            cpu_times_ns.append(timer.cpu_ns)
+                except TimeoutError as e:
+                    # a censored sample: the run took at least timeout_seconds
                     query_errors.append(str(e))
+                    censored_runs += 1
+                    schedule.stop(TIMEOUT)
+                    break
+                except Exception as e:
+                    # an aborted run must not take down the rest of the sweep
+                    query_errors.append(f"{type(e).__name__}: {e}")
+                    schedule.stop()
                     break
-                finally:
-                    self.close()
+
+            server_timings = {}
+            if self.server_timings and execution_times:
+                server_timings = self.capture_server_timings(query, timeout_seconds, query_errors)
+
+            plan = {}
+            if self.capture_plans and execution_times:
+                plan = self.capture_plan(query, timeout_seconds, query_errors)
 
             mean_time = statistics.mean(execution_times) if execution_times else None
             stdev_time = statistics.stdev(execution_times) if len(execution_times) > 1 else 0
-            num_records = len(rows) if execution_times else 0
+            num_records = num_records if execution_times else 0
 
             query_stats = {
                 "query_index": idx + 1,
                 "filename": filename,
+                "connection_mode": self.mode,
                 "result": rows,
                 "mean_execution_time_s": mean_time,
                 "std_dev_time_s": stdev_time,
                 "num_records": num_records,
+                "result_checksum": checksum,
+                **server_timings,
+                "client_overhead_s": client_overhead(mean_time, server_timings.get("planning_time_s"),
+                                                     server_timings.get("server_execution_time_s")),
+                "mean_cpu_time_s": statistics.mean(cpu_times_ns) / 1e9 if cpu_times_ns else None,
+                **schedule.summary(),
+                "censored_runs": censored_runs,
+                **plan,
                 "execution_times": execution_times,
+                "wall_times_ns": wall_times_ns,
+                "cpu_times_ns": cpu_times_ns,
                 "errors": query_errors
             }
             all_query_stats.append(query_stats)
             results.append({"data": rows if execution_times else []})
 
         self.save_postgres_results(all_query_stats, result_dir)
+        save_runs(all_query_stats, result_dir, "postgres")
+        if self.capture_plans:
+            save_plans(all_query_stats, result_dir, "postgres")
         return results, all_query_stats
 
+    def capture_plan(self, query, timeout_seconds, query_errors):
+        """Run one additional EXPLAIN (without ANALYZE) after the timed runs."""
+        try:
+            with self.session() as conn, conn.cursor() as cursor, self.watch(conn, timeout_seconds):
+                return plan_stats(postgres_shape(postgres_plan(cursor, query)))
+        except Exception as e:
+            query_errors.append(f"EXPLAIN failed: {e}")
+            return {}
+
+    def capture_server_timings(self, query, timeout_seconds, query_errors):
+        """Run one additional EXPLAIN ANALYZE pass after the timed runs."""
+        try:
+            with self.session() as conn, conn.cursor() as cursor, self.watch(conn, timeout_seconds):
+                return postgres_server_timings(cursor, query)
+        except (OperationalError, ProgrammingError, TimeoutError) as e:
+            query_errors.append(f"EXPLAIN ANALYZE failed: {e}")
+            return {}
+
     @staticmethod
     def save_postgres_results(all_results, result_dir):
         if not os.path.exists(result_dir):
@@ -81,8 +212,11 @@ class PostgreSQLConnection(IConnection):
 
         filename = f"{result_dir}/postgres_query_summary.csv"
         with open(filename, "w", newline="") as file:
-            fieldnames = ['query_index', 'filename', 'result', 'mean_execution_time_s', 'std_dev_time_s', 'num_records',
-                          'errors']
+            fieldnames = ['query_index', 'filename', 'connection_mode', 'result', 'mean_execution_time_s',
+                          'std_dev_time_s', 'num_records', 'mean_cpu_time_s', 'result_checksum', 'planning_time_s',
+                          'server_execution_time_s', 'shared_hit_blocks', 'shared_read_blocks', 'client_overhead_s',
+                          'median_execution_time_s', 'median_ci_low_s', 'median_ci_high_s', 'warmup_runs',
+                          'stop_reason', 'censored_runs', 'plan_fingerprint', 'errors']
             writer = csv.DictWriter(file, fieldnames=fieldnames)
             writer.writeheader()
             for result in all_results:
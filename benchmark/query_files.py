@@ -0,0 +1,13 @@
+import os
+
+
+def read_queries(directory, extension):
+    queries = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(extension):
+            file_path = os.path.join(directory, filename)
+            with open(file_path, 'r') as file:
+                query = file.read().strip()
+                queries.append((os.path.splitext(filename)[0], query))
+
+    return queries
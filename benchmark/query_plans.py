@@ -0,0 +1,152 @@
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+
+from results_store import RESULTS_STORE_DIR, PARTITION_COLUMNS, load_results
+
+EXPLAIN = "EXPLAIN (FORMAT JSON) "
+PROFILE = "PROFILE "
+# properties that describe the shape of a Postgres plan; costs and row estimates change with every ANALYZE
+POSTGRES_SHAPE_KEYS = ["Node Type", "Join Type", "Strategy", "Parent Relationship", "Relation Name", "Index Name",
+                       "Hash Cond", "Merge Cond", "Index Cond", "Filter"]
+# generated names of unnamed variables, which may be numbered differently by every planner version
+ANONYMOUS_VARIABLE = re.compile(r"anon_\d+|  UNNAMED\d+")
+
+
+def postgres_plan(cursor, query):
+    """The plan Postgres chooses for the query, without executing it."""
+    cursor.execute(EXPLAIN + query)
+    explain = cursor.fetchone()[0]
+    if isinstance(explain, str):
+        explain = json.loads(explain)
+    return explain[0]["Plan"]
+
+
+def postgres_shape(plan):
+    node = {key: plan[key] for key in POSTGRES_SHAPE_KEYS if key in plan}
+    node["children"] = [postgres_shape(child) for child in plan.get("Plans", [])]
+    return node
+
+
+def neo4j_shape(profile):
+    arguments = profile.get("args", profile.get("arguments", {}))
+    node = {
+        "operator": profile["operatorType"].split("@")[0],
+        "details": ANONYMOUS_VARIABLE.sub("anon", str(arguments.get("Details", ""))),
+        "children": [neo4j_shape(child) for child in profile.get("children", [])],
+    }
+    return node
+
+
+def neo4j_db_hits(profile):
+    return profile.get("dbHits", 0) + sum(neo4j_db_hits(child) for child in profile.get("children", []))
+
+
+def plan_fingerprint(shape):
+    """Short hash of the plan shape: equal fingerprints mean the same operators, join order and access paths."""
+    return hashlib.sha256(json.dumps(shape, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def plan_lines(shape, depth=0):
+    """Indented one-line-per-operator rendering of a plan shape, used for diffs."""
+    if "operator" in shape:
+        label = f"{shape['operator']} {shape['details']}".strip()
+    else:
+        label = " ".join(str(shape[key]) for key in POSTGRES_SHAPE_KEYS if key in shape)
+    lines = ["  " * depth + label]
+    for child in shape.get("children", []):
+        lines += plan_lines(child, depth + 1)
+    return lines
+
+
+def plan_stats(shape, db_hits=None):
+    return {"plan_fingerprint": plan_fingerprint(shape), "plan": json.dumps(shape), "db_hits": db_hits}
+
+
+def save_plans(all_query_stats, result_dir, prefix):
+    """Write the captured plans to `<prefix>_plans.json` next to the summary."""
+    if not os.path.exists(result_dir):
+        os.makedirs(result_dir)
+    plans = {
+        stats["filename"]: {"plan_fingerprint": stats["plan_fingerprint"], "db_hits": stats.get("db_hits"),
+                            "plan": json.loads(stats["plan"])}
+        for stats in all_query_stats if stats.get("plan")
+    }
+    with open(f"{result_dir}/{prefix}_plans.json", "w") as file:
+        json.dump(plans, file, indent=2)
+
+
+def regression_report(store_dir=RESULTS_STORE_DIR, threshold=1.2, **filters):
+    """Compare the latest run of every query with its history and explain slowdowns by plan changes.
+
+    A query is reported if its latest median (or mean) time is more than `threshold` times the median of its earlier
+    runs. For every reported query the report states whether the plan fingerprint differs from the previous run and
+    shows a diff of the two plans.
+    """
+    columns = ["query_index", "filename", "recorded_at", "mean_execution_time_s", "median_execution_time_s",
+               "plan_fingerprint", "plan"]
+    df = load_results(store_dir, columns=columns + PARTITION_COLUMNS, latest=False, **filters)
+    if df.empty:
+        return []
+    df["time_s"] = df["median_execution_time_s"].fillna(df["mean_execution_time_s"])
+
+    regressions = []
+    for key, history in df.sort_values("recorded_at").groupby(PARTITION_COLUMNS + ["query_index"], sort=True):
+        history = history.dropna(subset=["time_s"])
+        if len(history) < 2:
+            continue
+        latest, earlier = history.iloc[-1], history.iloc[:-1]
+        baseline = earlier["time_s"].median()
+        if baseline <= 0 or latest["time_s"] <= threshold * baseline:
+            continue
+
+        previous = earlier.iloc[-1]
+        plan_changed = None
+        diff = []
+        if isinstance(latest["plan_fingerprint"], str) and isinstance(previous["plan_fingerprint"], str):
+            plan_changed = latest["plan_fingerprint"] != previous["plan_fingerprint"]
+            if plan_changed:
+                diff = list(difflib.unified_diff(plan_lines(json.loads(previous["plan"])),
+                                                 plan_lines(json.loads(latest["plan"])),
+                                                 "previous plan", "latest plan", lineterm=""))
+        regressions.append({
+            **dict(zip(PARTITION_COLUMNS + ["query_index"], key)),
+            "filename": latest["filename"],
+            "baseline_s": baseline,
+            "latest_s": latest["time_s"],
+            "slowdown": latest["time_s"] / baseline,
+            "plan_changed": plan_changed,
+            "plan_diff": diff,
+        })
+    return regressions
+
+
+def print_report(regressions):
+    if not regressions:
+        print("No query got slower than its history.")
+    for regression in regressions:
+        if regression["plan_changed"] is None:
+            cause = "plan not captured"
+        else:
+            cause = "plan changed" if regression["plan_changed"] else "same plan"
+        print(f"{regression['system']} {regression['variant']} SF {regression['scale_factor']} "
+              f"{regression['filename']}: {regression['baseline_s']:.4f} s -> {regression['latest_s']:.4f} s "
+              f"({regression['slowdown']:.2f}x, {cause})")
+        for line in regression["plan_diff"]:
+            print(f"    {line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report queries that got slower than their history and whether "
+                                                 "their plan changed")
+    parser.add_argument("-s", "--store-dir", type=str, default=RESULTS_STORE_DIR, help="Results store directory")
+    parser.add_argument("-th", "--threshold", type=float, default=1.2,
+                        help="Report queries slower than this factor times the median of their earlier runs")
+    parser.add_argument("-sy", "--system", type=str, default=None, help="Only report this system")
+    parser.add_argument("-v", "--variant", type=str, default=None, help="Only report this variant")
+    args = parser.parse_args()
+    filters = {key: value for key, value in [("system", args.system), ("variant", args.variant)] if value}
+    print_report(regression_report(args.store_dir, args.threshold, **filters))
@@ -0,0 +1,129 @@
+import math
+import statistics
+
+from timing import monotonic_s
+
+FIXED_RUNS = "fixed_runs"
+CI_TARGET = "ci_target"
+TIME_BUDGET = "time_budget"
+MAX_RUNS = "max_runs"
+ERROR = "error"
+TIMEOUT = "timeout"
+
+
+def median_confidence_interval(samples, confidence=0.95):
+    """Distribution-free confidence interval of the median, taken from the order statistics of the samples.
+
+    The ranks come from the normal approximation of the binomial distribution of the number of samples below the
+    median. With few samples they are clipped to the minimum and maximum, so the interval stays conservative.
+    """
+    n = len(samples)
+    if n == 0:
+        return None, None
+    ordered = sorted(samples)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * math.sqrt(n) / 2
+    lower_rank = max(math.floor(n / 2 - half_width), 1)
+    upper_rank = min(math.ceil(1 + n / 2 + half_width), n)
+    return ordered[lower_rank - 1], ordered[upper_rank - 1]
+
+
+class RepetitionScheduler:
+    """Decide how often a query is repeated.
+
+    Without `target_ci` and `time_budget_s` every query runs exactly `runs` times, as before. Otherwise `runs` is the
+    minimum and the repetitions continue until the confidence interval of the median is narrower than `target_ci`
+    (relative half width, e.g. 0.05 for +-5%), the next run would exceed the `time_budget_s` of the query, or
+    `max_runs` is reached. `warmup` runs are executed first and not recorded. `before_run(first_run)` is called before
+    every measured run, e.g. to put the caches into a defined state (see cache_control.py).
+    """
+
+    def __init__(self, runs=5, warmup=0, target_ci=None, time_budget_s=None, max_runs=100, confidence=0.95,
+                 before_run=None):
+        self.runs = runs
+        self.warmup = warmup
+        self.target_ci = target_ci
+        self.time_budget_s = time_budget_s
+        self.max_runs = max_runs
+        self.confidence = confidence
+        self.before_run = before_run
+
+    @property
+    def adaptive(self):
+        return self.target_ci is not None or self.time_budget_s is not None
+
+    def schedule(self, samples):
+        """Iterate over the runs of one query; `samples` is the list the caller appends the measured times to."""
+        return Schedule(self, samples)
+
+
+class Schedule:
+    """Yields True for every warm-up run and False for every measured run until a stopping rule applies.
+
+        schedule = scheduler.schedule(execution_times)
+        for warmup in schedule:
+            with Timer() as timer:
+                run()
+            if not warmup:
+                execution_times.append(timer.wall_s)
+    """
+
+    def __init__(self, scheduler, samples):
+        self.scheduler = scheduler
+        self.samples = samples
+        self.warmup_runs = 0
+        self.measured_runs = 0
+        self.stop_reason = None
+        self._start = None
+
+    @property
+    def total(self):
+        """Number of runs if it is known in advance, e.g. for progress bars."""
+        return None if self.scheduler.adaptive else self.scheduler.warmup + self.scheduler.runs
+
+    def __iter__(self):
+        self._start = monotonic_s()
+        for _ in range(self.scheduler.warmup):
+            if self.stop_reason:
+                return
+            self.warmup_runs += 1
+            yield True
+        while self.stop_reason is None:
+            self.stop_reason = self._check()
+            if self.stop_reason is None:
+                if self.scheduler.before_run is not None:
+                    self.scheduler.before_run(self.measured_runs == 0)
+                self.measured_runs += 1
+                yield False
+
+    def stop(self, reason=ERROR):
+        self.stop_reason = reason
+
+    def _check(self):
+        scheduler = self.scheduler
+        n = len(self.samples)
+        if not scheduler.adaptive:
+            return FIXED_RUNS if n >= scheduler.runs else None
+        if n >= scheduler.max_runs:
+            return MAX_RUNS
+        if n < max(scheduler.runs, 1):
+            return None
+        if scheduler.target_ci is not None:
+            low, high = median_confidence_interval(self.samples, scheduler.confidence)
+            if (high - low) / 2 <= scheduler.target_ci * statistics.median(self.samples):
+                return CI_TARGET
+        if scheduler.time_budget_s is not None:
+            elapsed = monotonic_s() - self._start
+            if elapsed + statistics.mean(self.samples) > scheduler.time_budget_s:
+                return TIME_BUDGET
+        return None
+
+    def summary(self):
+        low, high = median_confidence_interval(self.samples, self.scheduler.confidence)
+        return {
+            "warmup_runs": self.warmup_runs,
+            "stop_reason": self.stop_reason,
+            "median_execution_time_s": statistics.median(self.samples) if self.samples else None,
+            "median_ci_low_s": low,
+            "median_ci_high_s": high,
+        }
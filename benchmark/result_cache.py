@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import pickle
+
+RESULT_CACHE_DIR = "result_cache"
+DEFAULT_CACHE_SIZE_MB = 1024
+FINGERPRINTS_FILE = "fingerprints.json"
+
+
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of query stats, keyed by a hash of everything that determines the result and its timings.
+
+    Entries are pickled query stats in `<cache_dir>/<key[:2]>/<key>.pkl`. A hit touches the entry, so the file
+    modification time is the last use and `evict` can drop the least recently used entries once the cache grows
+    beyond `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def dataset_fingerprint(self, scale_factor, data_dir=None):
+        """Hash of the scale factor and the checksums of all CSV files of the data set directory.
+
+        Checksums are remembered per file together with its size and modification time, so the data set is only
+        read again after it changed. Returns None if neither the scale factor nor the directory identifies the data set.
+        """
+        if not scale_factor and not data_dir:
+            return None
+        fingerprints_path = os.path.join(self.cache_dir, FINGERPRINTS_FILE)
+        known = {}
+        if os.path.exists(fingerprints_path):
+            with open(fingerprints_path, 'r') as file:
+                known = json.load(file)
+
+        parts = [str(scale_factor)]
+        if data_dir:
+            for filename in sorted(os.listdir(data_dir)):
+                if not filename.endswith(".csv"):
+                    continue
+                path = os.path.abspath(os.path.join(data_dir, filename))
+                stat = os.stat(path)
+                entry = known.get(path)
+                if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+                    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_checksum(path)}
+                    known[path] = entry
+                parts.append(f"{filename}:{entry['sha256']}")
+
+        # suites running in parallel (see orchestrator.py) may update the file at the same time
+        with open(f"{fingerprints_path}.{os.getpid()}", 'w') as file:
+            json.dump(known, file, indent=2)
+        os.replace(f"{fingerprints_path}.{os.getpid()}", fingerprints_path)
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def key(query, system, variant, fingerprint, config):
+        payload = json.dumps({"query": query, "system": system, "variant": variant, "dataset": fingerprint,
+                              "config": config}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        # suites sharing the cache may evict the entry at any time
+        try:
+            with open(path, 'rb') as file:
+                stats = pickle.load(file)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return stats
+
+    def put(self, key, stats):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so an interrupted run never leaves a truncated entry behind, one per process
+        # so two suites writing the same key cannot interleave
+        with open(f"{path}.{os.getpid()}.tmp", 'wb') as file:
+            pickle.dump(stats, file)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+        self.evict()
+
+    def entries(self):
+        """(path, size, last use) of every entry, least recently used first."""
+        entries = []
+        for directory, _, filenames in os.walk(self.cache_dir):
+            for filename in filenames:
+                if filename.endswith(".pkl"):
+                    # suites sharing the cache may evict the entry between listing and stat
+                    try:
+                        stat = os.stat(os.path.join(directory, filename))
+                    except FileNotFoundError:
+                        continue
+                    entries.append((os.path.join(directory, filename), stat.st_size, stat.st_mtime_ns))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                evicted += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        return evicted
+
+
+def run_cached(run_queries, queries, keys, cache, reuse=False):
+    """Run `queries` with `run_queries`, reusing the cached stats of unchanged queries if `reuse` is set.
+
+    Returns the stats of all queries in the original order and the stats of the queries that actually ran. Fresh stats
+    are cached unless a run failed, so errors and timeouts are retried on the next sweep. Queries whose key is None are
+    neither looked up nor cached.
+    """
+    cached = {index: cache.get(key) for index, key in enumerate(keys) if key is not None} if reuse else {}
+    pending = [index for index in range(len(queries)) if cached.get(index) is None]
+
+    fresh = {}
+    if pending:
+        _, stats = run_queries([queries[index] for index in pending])
+        for index, query_stats in zip(pending, stats):
+            query_stats["query_index"] = index + 1
+            fresh[index] = query_stats
+            if not query_stats["errors"] and keys[index] is not None:
+                cache.put(keys[index], query_stats)
+
+    for index, query_stats in cached.items():
+        if query_stats is not None:
+            print(f"Reusing cached result of {query_stats['filename']}")
+            cached[index] = {**query_stats, "query_index": index + 1}
+    all_stats = [fresh[index] if index in fresh else cached[index] for index in range(len(queries))]
+    return all_stats, [fresh[index] for index in pending]
@@ -0,0 +1,20 @@
+import zlib
+
+STREAM_SAMPLE_ROWS = 10
+
+
+def consume_stream(rows, to_sample=None, sample_size=STREAM_SAMPLE_ROWS):
+    """Iterate over `rows` keeping only a row count, a checksum and the first `sample_size` rows.
+
+    The checksum is the sum of the CRC32 of every row, so it does not depend on the row order and can be compared
+    between runs and systems without holding the full result in memory.
+    """
+    sample = []
+    count = 0
+    checksum = 0
+    for row in rows:
+        if count < sample_size:
+            sample.append(to_sample(row) if to_sample else row)
+        checksum = (checksum + zlib.crc32(repr(tuple(row)).encode())) & 0xFFFFFFFF
+        count += 1
+    return sample, count, checksum
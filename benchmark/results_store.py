@@ -0,0 +1,172 @@
+import argparse
+import os
+import re
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+RESULTS_STORE_DIR = "results_store"
+PARTITION_COLUMNS = ["system", "variant", "scale_factor"]
+
+PARTITIONING = ds.partitioning(
+    pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS]), flavor="hive"
+)
+SCHEMA = pa.schema([
+    ("system", pa.string()),
+    ("variant", pa.string()),
+    ("scale_factor", pa.string()),
+    ("query_index", pa.int32()),
+    ("filename", pa.string()),
+    ("run_id", pa.string()),
+    ("recorded_at", pa.timestamp("us", tz="UTC")),
+    ("mean_execution_time_s", pa.float64()),
+    ("std_dev_time_s", pa.float64()),
+    ("mean_cpu_time_s", pa.float64()),
+    ("median_execution_time_s", pa.float64()),
+    ("median_ci_low_s", pa.float64()),
+    ("median_ci_high_s", pa.float64()),
+    ("stop_reason", pa.string()),
+    ("censored_runs", pa.int64()),
+    ("plan_fingerprint", pa.string()),
+    ("plan", pa.string()),
+    ("db_hits", pa.int64()),
+    ("num_records", pa.int64()),
+    ("num_edges", pa.int64()),
+    ("result", pa.string()),
+    ("errors", pa.string()),
+    ("execution_times", pa.list_(pa.float64())),
+])
+
+# <system>_lsqb-<sf>_<n>-times_<suffix>.csv and <system>_<graph>_summary.csv, see neo4j_results/ and postgres_results/
+LSQB_RESULT_FILE = re.compile(r"^(neo4j|postgres)_lsqb-([\d.]+)_\d+-times_(summary|fof|fof-index)\.csv$")
+GRAPH_RESULT_FILE = re.compile(r"^(neo4j|postgres)_(\d+[KM]-\d+reg)_summary\.csv$")
+SHORTEST_PATH_FILE = re.compile(r"^(neo4j|postgres)_shortest_path(_increase)?\.csv$")
+
+
+def append_results(rows, system, variant, scale_factor, store_dir=RESULTS_STORE_DIR, run_id=None):
+    """Append one benchmark run to the store.
+
+    `rows` are query stats as returned by the `run_queries` methods of the connection classes. Every call writes new
+    files with a unique name into the system/variant/scale_factor partition, so earlier runs are never overwritten.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    recorded_at = datetime.now(timezone.utc)
+    records = []
+    for row in rows:
+        records.append({
+            "system": system,
+            "variant": variant,
+            "scale_factor": str(scale_factor),
+            "query_index": row["query_index"],
+            "filename": row.get("filename"),
+            "run_id": run_id,
+            "recorded_at": recorded_at,
+            "mean_execution_time_s": row.get("mean_execution_time_s"),
+            "std_dev_time_s": row.get("std_dev_time_s"),
+            "mean_cpu_time_s": row.get("mean_cpu_time_s"),
+            "median_execution_time_s": row.get("median_execution_time_s"),
+            "median_ci_low_s": row.get("median_ci_low_s"),
+            "median_ci_high_s": row.get("median_ci_high_s"),
+            "stop_reason": row.get("stop_reason"),
+            "censored_runs": row.get("censored_runs"),
+            "plan_fingerprint": row.get("plan_fingerprint"),
+            "plan": row.get("plan"),
+            "db_hits": row.get("db_hits"),
+            "num_records": row.get("num_records"),
+            "num_edges": row.get("num_edges"),
+            "result": str(row.get("result", "")),
+            "errors": str(row.get("errors", [])),
+            "execution_times": list(row.get("execution_times", [])),
+        })
+    table = pa.Table.from_pylist(records, schema=SCHEMA)
+    pq.write_to_dataset(table, store_dir, partition_cols=PARTITION_COLUMNS,
+                        basename_template=f"{run_id}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore")
+    return run_id
+
+
+def load_results(store_dir=RESULTS_STORE_DIR, columns=None, latest=True, **filters):
+    """Load results as a DataFrame, e.g. `load_results(system="neo4j", variant="fof", scale_factor=["0.1", "1"])`.
+
+    Filters on the partition columns prune whole directories and the other filters are pushed down into the Parquet
+    row groups, so only matching data is read. A list value matches any of its elements. With `latest` only the most
+    recent run of every system/variant/scale_factor/query is returned.
+    """
+    dataset = ds.dataset(store_dir, format="parquet", partitioning=PARTITIONING, schema=SCHEMA)
+    expression = None
+    for column, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            condition = ds.field(column).isin([str(v) if column in PARTITION_COLUMNS else v for v in value])
+        else:
+            condition = ds.field(column) == (str(value) if column in PARTITION_COLUMNS else value)
+        expression = condition if expression is None else expression & condition
+
+    if columns is not None and latest:
+        columns = list(dict.fromkeys(columns + PARTITION_COLUMNS + ["query_index", "recorded_at"]))
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    if latest and not df.empty:
+        df = (df.sort_values("recorded_at")
+              .drop_duplicates(PARTITION_COLUMNS + ["query_index"], keep="last")
+              .sort_values(PARTITION_COLUMNS + ["query_index"])
+              .reset_index(drop=True))
+    return df
+
+
+def parse_result_filename(filename):
+    """Map a legacy result file name to (system, variant, scale_factor) or None if it is not a known layout."""
+    match = LSQB_RESULT_FILE.match(filename)
+    if match:
+        system, scale_factor, suffix = match.groups()
+        return system, "lsqb" if suffix == "summary" else suffix, scale_factor
+    match = GRAPH_RESULT_FILE.match(filename)
+    if match:
+        system, graph = match.groups()
+        return system, "fof", graph
+    return None
+
+
+def import_legacy_results(result_dirs, store_dir=RESULTS_STORE_DIR):
+    """Import the hand-named CSV files of `neo4j_results/` and `postgres_results/` into the store."""
+    imported = []
+    for result_dir in result_dirs:
+        for filename in sorted(os.listdir(result_dir)):
+            path = os.path.join(result_dir, filename)
+            key = parse_result_filename(filename)
+            if key:
+                df = pd.read_csv(path)
+                append_results(df.to_dict("records"), *key, store_dir=store_dir)
+                imported.append(filename)
+                continue
+
+            match = SHORTEST_PATH_FILE.match(filename)
+            if match:
+                system, increase = match.groups()
+                df = pd.read_csv(path, dtype={"SF": str, "size": str})
+                if "query_index" not in df:
+                    df["query_index"] = 1
+                df = df.assign(filename="shortest_path").rename(columns={"edges": "num_edges"})
+                variant = "shortest_path_increase" if increase else "shortest_path"
+                for scale_factor, group in df.groupby("SF" if increase else "size", sort=False):
+                    append_results(group.to_dict("records"), system, variant, scale_factor, store_dir=store_dir)
+                imported.append(filename)
+    return imported
+
+
+def ensure_store(result_dirs, store_dir=RESULTS_STORE_DIR):
+    """Create the store from the legacy CSV files if it does not exist yet."""
+    if not os.path.exists(store_dir):
+        imported = import_legacy_results(result_dirs, store_dir)
+        print(f"Imported {len(imported)} legacy result files into {store_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the legacy per-configuration CSV files into the results store")
+    parser.add_argument("result_dirs", nargs="*", default=["neo4j_results", "postgres_results"],
+                        help="Directories containing the legacy result CSV files")
+    parser.add_argument("-s", "--store-dir", type=str, default=RESULTS_STORE_DIR, help="Results store directory")
+    args = parser.parse_args()
+    for name in import_legacy_results(args.result_dirs, args.store_dir):
+        print(f"Imported {name}")
@@ -0,0 +1,41 @@
+import json
+import statistics
+
+EXPLAIN_ANALYZE = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
+
+
+def postgres_server_timings(cursor, query):
+    """Run the query once under EXPLAIN ANALYZE and return the engine-reported planning and execution time.
+
+    The instrumented run is slower than a plain one, so its numbers are only used for the breakdown and never for the
+    measured execution time.
+    """
+    cursor.execute(EXPLAIN_ANALYZE + query)
+    explain = cursor.fetchone()[0]
+    if isinstance(explain, str):
+        explain = json.loads(explain)
+    explain = explain[0]
+    plan = explain["Plan"]
+    return {
+        "planning_time_s": explain["Planning Time"] / 1000,
+        "server_execution_time_s": explain["Execution Time"] / 1000,
+        "shared_hit_blocks": plan.get("Shared Hit Blocks"),
+        "shared_read_blocks": plan.get("Shared Read Blocks"),
+    }
+
+
+def neo4j_server_timings(summaries):
+    """Average `result_available_after` and `result_consumed_after` of the result summaries of all runs."""
+    available = [summary.result_available_after for summary in summaries if summary.result_available_after is not None]
+    consumed = [summary.result_consumed_after for summary in summaries if summary.result_consumed_after is not None]
+    return {
+        "result_available_after_s": statistics.mean(available) / 1000 if available else None,
+        "result_consumed_after_s": statistics.mean(consumed) / 1000 if consumed else None,
+    }
+
+
+def client_overhead(mean_time, *server_times):
+    """Part of the client-measured time that is not spent in the engine (network transfer, row materialization)."""
+    if mean_time is None or any(server_time is None for server_time in server_times):
+        return None
+    return max(mean_time - sum(server_times), 0)
@@ -0,0 +1,118 @@
+import argparse
+import os
+
+from dotenv import load_dotenv, find_dotenv
+
+from pg_loader import ADJACENCY_SCRIPT
+from postgres_connection import PostgreSQLConnection
+from results_store import RESULTS_STORE_DIR, append_results
+
+load_dotenv(find_dotenv(), override=True)
+
+POSTGRES_HOST = os.getenv('POSTGRES_HOST')
+POSTGRES_PORT = os.getenv('POSTGRES_PORT')
+POSTGRES_USER = os.getenv('POSTGRES_USER')
+POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+SF = os.getenv('SF')
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sql", "functions")
+VARIANT = "shortest_path_implementations"
+
+# same query as sql/shortest_path-lsqb.sql with the endpoints and depth limit as parameters
+RECURSIVE_CTE = """WITH RECURSIVE path(start_id, end_id, path, depth) AS (
+    SELECT person1id AS start_id, person2id AS end_id, ARRAY[person1id, person2id]::bigint[] AS path, 1 AS depth
+    FROM Person_knows_Person
+    WHERE person1id = {start}
+
+    UNION ALL
+
+    SELECT p.start_id, pkp.person2id AS end_id, p.path || pkp.person2id, p.depth + 1
+    FROM path p
+    JOIN Person_knows_Person pkp ON p.end_id = pkp.person1id
+    WHERE pkp.person2id != ALL(p.path)
+    AND p.depth < {max_depth}
+)
+SELECT path, depth
+FROM path
+WHERE end_id = {end}
+ORDER BY depth ASC
+LIMIT 1"""
+
+ADJACENCY = "bidirectional_bfs_adjacency"
+# name -> (function definition to install, query)
+IMPLEMENTATIONS = {
+    "recursive_cte": (None, RECURSIVE_CTE),
+    "function2": ("ShortestPathFunction2.sql",
+                  "SELECT find_shortest_path_with_depth_limit({start}, {end}, {max_depth})"),
+    "bidirectional_bfs": ("ShortestPathFunction3.sql",
+                          "SELECT bidirectional_shortest_path({start}, {end}, {max_depth})"),
+    # needs the person_adj table of sql/general/adjacency.sql, which install_functions builds if it is missing
+    ADJACENCY: ("ShortestPathFunction4.sql",
+                "SELECT bidirectional_shortest_path_adjacency({start}, {end}, {max_depth})"),
+}
+
+
+def install_functions(postgres_conn, implementations):
+    postgres_conn.connect()
+    try:
+        if ADJACENCY in implementations:
+            if postgres_conn.conn.execute("SELECT to_regclass('person_adj')").fetchone()[0] is None:
+                print("Building person_adj")
+                with open(ADJACENCY_SCRIPT, 'r') as file:
+                    postgres_conn.conn.execute(file.read())
+        for name in implementations:
+            definition, _ = IMPLEMENTATIONS[name]
+            if definition:
+                with open(os.path.join(FUNCTIONS_DIR, definition), 'r') as file:
+                    postgres_conn.conn.execute(file.read())
+        postgres_conn.conn.commit()
+    finally:
+        postgres_conn.close()
+
+
+def path_length(result):
+    """Number of edges of the path returned by any of the implementations, None if no path was found."""
+    if not result or result[0][0] is None:
+        return None
+    path = result[0][0]
+    if isinstance(path, str):
+        return None if path == 'No path found' else path.count(',')
+    return len(path) - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the PostgreSQL shortest path implementations on the loaded "
+                                                 "data set")
+    parser.add_argument("-s", "--start", type=int, default=14, help="Start person id")
+    parser.add_argument("-e", "--end", type=int, default=66, help="End person id")
+    parser.add_argument("-m", "--max-depth", type=int, default=4, help="Maximum path length")
+    parser.add_argument("-i", "--implementations", nargs="*", default=list(IMPLEMENTATIONS),
+                        choices=list(IMPLEMENTATIONS), help="Implementations to compare")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="Number of runs per implementation")
+    parser.add_argument("-t", "--timeout", type=int, default=600, help="Timeout per run in seconds")
+    parser.add_argument("-pd", "--postgres-dir", type=str, default="shortest_path_results", help="Result directory")
+    parser.add_argument("-sf", "--scale-factor", type=str, default=SF,
+                        help="Scale factor recorded in the results store (defaults to $SF)")
+    parser.add_argument("-sd", "--store-dir", type=str, default=RESULTS_STORE_DIR,
+                        help="Directory of the partitioned Parquet results store")
+    args = parser.parse_args()
+
+    postgres_conn = PostgreSQLConnection(POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD)
+    install_functions(postgres_conn, args.implementations)
+
+    queries = [(name, IMPLEMENTATIONS[name][1].format(start=args.start, end=args.end, max_depth=args.max_depth))
+               for name in args.implementations]
+    try:
+        _, query_stats = postgres_conn.run_queries(queries, result_dir=args.postgres_dir, runs=args.runs,
+                                                   timeout_seconds=args.timeout)
+    finally:
+        postgres_conn.close()
+
+    for stats in query_stats:
+        print(f"{stats['filename']}: {stats['mean_execution_time_s']} s, "
+              f"path length {path_length(stats['result'])}, errors {stats['errors']}")
+    append_results(query_stats, "postgres", VARIANT, args.scale_factor, store_dir=args.store_dir)
+
+
+if __name__ == "__main__":
+    main()
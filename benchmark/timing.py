@@ -0,0 +1,75 @@
+import os
+import time
+
+import pandas as pd
+
+
+class Timer:
+    """Measure one run with the monotonic `perf_counter_ns` clock and the CPU time of the client process.
+
+    The CPU time shows how much of the wall time the client itself spends, e.g. on row materialization.
+
+        with Timer() as timer:
+            data = result.data()
+        execution_times.append(timer.wall_s)
+    """
+
+    def __init__(self):
+        self.wall_ns = None
+        self.cpu_ns = None
+        self._wall_start = None
+        self._cpu_start = None
+
+    def __enter__(self):
+        self._cpu_start = time.process_time_ns()
+        self._wall_start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wall_ns = time.perf_counter_ns() - self._wall_start
+        self.cpu_ns = time.process_time_ns() - self._cpu_start
+        return False
+
+    @property
+    def wall_s(self):
+        return self.wall_ns / 1e9
+
+    @property
+    def cpu_s(self):
+        return self.cpu_ns / 1e9
+
+
+def monotonic_s():
+    """Monotonic timestamp in seconds for deadlines; unlike time.time() it never jumps."""
+    return time.perf_counter()
+
+
+def save_runs(all_query_stats, result_dir, prefix):
+    """Persist every individual run (not only mean and stdev) to `<prefix>_runs.parquet`.
+
+    Stats of concurrent clients (see concurrent_runner.py) record the `client_id` of every run instead of its CPU time,
+    which `Timer` can only take for the whole process.
+    """
+    if not os.path.exists(result_dir):
+        os.makedirs(result_dir)
+
+    columns = ["query_index", "filename", "run", "wall_time_ns", "cpu_time_ns"]
+    dtypes = {"query_index": "int32", "run": "int32", "wall_time_ns": "int64", "cpu_time_ns": "int64"}
+    if any("client_id" in stats for stats in all_query_stats):
+        columns = ["query_index", "filename", "client_id", "run", "wall_time_ns"]
+        dtypes = {"query_index": "int32", "client_id": "int32", "run": "int32", "wall_time_ns": "int64"}
+    rows = []
+    for stats in all_query_stats:
+        cpu_times_ns = stats.get("cpu_times_ns", [None] * len(stats["wall_times_ns"]))
+        for run, (wall_ns, cpu_ns) in enumerate(zip(stats["wall_times_ns"], cpu_times_ns)):
+            rows.append({
+                "query_index": stats["query_index"],
+                "filename": stats["filename"],
+                "client_id": stats.get("client_id"),
+                "run": run + 1,
+                "wall_time_ns": wall_ns,
+                "cpu_time_ns": cpu_ns,
+            })
+    runs = pd.DataFrame(rows, columns=columns).astype(dtypes)
+    runs.to_parquet(f"{result_dir}/{prefix}_runs.parquet", index=False)
+    return runs
@@ -0,0 +1,401 @@
+import argparse
+import csv
+import os
+import re
+import statistics
+
+import numpy as np
+from tqdm import tqdm
+
+from dataset_convert import NODE_TABLES, open_table
+from iconnection import IConnection
+from repetitions import RepetitionScheduler, TIMEOUT
+from results_store import RESULTS_STORE_DIR, append_results
+from timing import Timer, monotonic_s, save_runs
+
+EXPECTED_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "expected-output",
+                               "expected-output.csv")
+# upper bound for the candidate bindings expanded at once; larger frontiers are split
+BATCH_ROWS = 1 << 21
+
+# relation -> (table, source column, target column) of the binary relations the queries are built from; the node
+# tables themselves are unary relations of their ids
+RELATIONS = {
+    "Person_isLocatedIn_City": ("Person", "id", "islocatedin_city"),
+    "City_isPartOf_Country": ("City", "id", "ispartof_country"),
+    "Comment_hasCreator_Person": ("Comment", "id", "hascreator_person"),
+    "Comment_replyOf_Post": ("Comment", "id", "replyof_post"),
+    "Comment_replyOf_Comment": ("Comment", "id", "replyof_comment"),
+    "Post_hasCreator_Person": ("Post", "id", "hascreator_person"),
+    "Forum_containerOf_Post": ("Post", "forum_containerof", "id"),
+    "Tag_hasType_TagClass": ("Tag", "id", "hastype_tagclass"),
+    "Comment_hasTag_Tag": ("Comment_hasTag_Tag", "id", "hastag_tag"),
+    "Post_hasTag_Tag": ("Post_hasTag_Tag", "id", "hastag_tag"),
+    "Forum_hasMember_Person": ("Forum_hasMember_Person", "id", "hasmember_person"),
+    "Person_hasInterest_Tag": ("Person_hasInterest_Tag", "id", "hasinterest_tag"),
+    "Person_likes_Comment": ("Person_likes_Comment", "id", "likes_comment"),
+    "Person_likes_Post": ("Person_likes_Post", "id", "likes_post"),
+}
+# the Message views of sql/general/views.sql as the relations they concatenate
+VIEWS = {
+    "Message_hasTag_Tag": ["Comment_hasTag_Tag", "Post_hasTag_Tag"],
+    "Message_hasCreator_Person": ["Comment_hasCreator_Person", "Post_hasCreator_Person"],
+    "Comment_replyOf_Message": ["Comment_replyOf_Post", "Comment_replyOf_Comment"],
+    "Person_likes_Message": ["Person_likes_Comment", "Person_likes_Post"],
+}
+KNOWS = "Person_knows_Person"
+
+# query -> (variable order, atoms as (relation, source variable, target variable)), the same joins as sql/lsqb/.
+# Only full conjunctive queries: q7 is an acyclic star with two LEFT JOINs, whose count the trie join cannot express
+# and whose join core needs no worst-case optimal join; count_executor.py counts it with an acyclic tree plan.
+CYCLIC_QUERIES = {
+    # Person1 knows Person2, Person1 wrote a Comment that replies to a Post of Person2: a 4-cycle
+    "q2": (["post", "person2", "person1", "comment"],
+           [(KNOWS, "person1", "person2"),
+            ("Comment_hasCreator_Person", "comment", "person1"),
+            ("Post_hasCreator_Person", "post", "person2"),
+            ("Comment_replyOf_Post", "comment", "post")]),
+    # a KNOWS triangle whose three persons live in cities of the same country
+    "q3": (["personA", "personB", "personC", "cityA", "cityB", "cityC", "country"],
+           [(KNOWS, "personA", "personB"),
+            (KNOWS, "personB", "personC"),
+            (KNOWS, "personC", "personA"),
+            ("Person_isLocatedIn_City", "personA", "cityA"),
+            ("Person_isLocatedIn_City", "personB", "cityB"),
+            ("Person_isLocatedIn_City", "personC", "cityC"),
+            ("City_isPartOf_Country", "cityA", "country"),
+            ("City_isPartOf_Country", "cityB", "country"),
+            ("City_isPartOf_Country", "cityC", "country")]),
+}
+
+
+class Trie:
+    """A relation sorted lexicographically and stored level by level as the distinct prefixes of its columns.
+
+    Level d holds one node per distinct prefix of length d + 1: its last value, and its parent on level d - 1 (the
+    virtual root 0 for level 0). The children of a parent are contiguous and sorted by value, so `keys[d]`, the parent
+    times the number of distinct values plus the rank of the value, is sorted and a seek is a binary search.
+    Duplicate rows are kept as the multiplicity of their leaf.
+    """
+
+    def __init__(self, columns):
+        columns = [np.asarray(column, dtype=np.int64) for column in columns]
+        order = np.lexsort(columns[::-1])
+        columns = [column[order] for column in columns]
+        num_rows = len(columns[0])
+        self.values = []
+        self.uniques = []
+        self.keys = []
+        self.child_bounds = []
+        new = np.zeros(num_rows, dtype=bool)
+        new[:1] = True
+        parent_of_row = np.zeros(num_rows, dtype=np.int64)
+        num_parents = 1
+        for column in columns:
+            new[1:] |= column[1:] != column[:-1]
+            parents = parent_of_row[new]
+            values = column[new]
+            uniques = np.unique(values)
+            self.values.append(values)
+            self.uniques.append(uniques)
+            self.keys.append(parents * len(uniques) + np.searchsorted(uniques, values))
+            self.child_bounds.append(np.searchsorted(parents, np.arange(num_parents + 1)))
+            parent_of_row = np.cumsum(new) - 1
+            num_parents = len(values)
+        self.leaf_counts = np.bincount(parent_of_row, minlength=num_parents)
+        self.leaf_prefix = np.concatenate([[0], np.cumsum(self.leaf_counts)])
+
+    def children(self, level, parents):
+        """[start, end) of the child nodes of `parents` on `level`."""
+        bounds = self.child_bounds[level]
+        return bounds[parents], bounds[parents + 1]
+
+    def seek(self, level, parents, values):
+        """The child node of every parent with the given value, or -1."""
+        uniques, keys = self.uniques[level], self.keys[level]
+        if len(uniques) == 0:
+            return np.full(len(values), -1, dtype=np.int64)
+        ranks = np.minimum(np.searchsorted(uniques, values), len(uniques) - 1)
+        wanted = parents * len(uniques) + ranks
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = (uniques[ranks] == values) & (keys[positions] == wanted)
+        return np.where(found, positions, -1)
+
+
+def expand(starts, counts):
+    """Concatenated ranges [start, start + count) and the index of the range every element comes from."""
+    origin = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return origin, starts[origin] + offsets
+
+
+def count_join(atoms, variables, deadline=None, batch_rows=BATCH_ROWS):
+    """Count the result of a full conjunctive query with a worst-case optimal, Leapfrog Triejoin style join.
+
+    `atoms` are (trie, atom variables) with the variables of every atom in the order of `variables`. The variables are
+    bound one at a time: for every partial binding the atom with the fewest candidates on the level of the variable is
+    enumerated and its values are sought in the tries of the other atoms containing it. Instead of leapfrogging one
+    binding at a time, all partial bindings advance together as NumPy arrays, in batches of about `batch_rows`.
+    """
+    for _, atom_variables in atoms:
+        if [variable for variable in variables if variable in atom_variables] != list(atom_variables):
+            raise ValueError(f"Atom variables {atom_variables} do not follow the variable order {variables}")
+    participants = [[(atom, atom_variables.index(variable)) for atom, (_, atom_variables) in enumerate(atoms)
+                     if variable in atom_variables] for variable in variables]
+    finishing = [[atom for atom, (_, atom_variables) in enumerate(atoms) if atom_variables[-1] == variable]
+                 for variable in variables]
+    tries = [trie for trie, _ in atoms]
+
+    def step(position, nodes, weights):
+        if position == len(variables):
+            return int(weights.sum())
+        if deadline is not None and monotonic_s() > deadline:
+            raise TimeoutError("Query exceeded the configured timeout")
+        parts = participants[position]
+        ranges = [tries[atom].children(level, nodes[atom]) for atom, level in parts]
+        sizes = np.stack([end - start for start, end in ranges])
+        smallest = sizes.min(axis=0)
+        if len(weights) > 1 and smallest.sum() > batch_rows:
+            # batches start where the running candidate count crosses a multiple of batch_rows
+            bounds = np.flatnonzero(np.diff((np.cumsum(smallest) - smallest) // batch_rows)) + 1
+            if len(bounds):
+                return sum(step(position, [atom_nodes[batch] for atom_nodes in nodes], weights[batch])
+                           for batch in np.split(np.arange(len(weights)), bounds))
+
+        if position == len(variables) - 1 and len(parts) == 1:
+            # a single atom ends with the last variable: sum the multiplicities of the leaves in every range
+            (atom, _), (start, end) = parts[0], ranges[0]
+            return int((weights * (tries[atom].leaf_prefix[end] - tries[atom].leaf_prefix[start])).sum())
+
+        total = 0
+        choice = sizes.argmin(axis=0)
+        for index, (atom, level) in enumerate(parts):
+            selected = np.flatnonzero(choice == index)
+            if len(selected) == 0:
+                continue
+            origin, candidates = expand(ranges[index][0][selected], smallest[selected])
+            bindings = selected[origin]
+            values = tries[atom].values[level][candidates]
+            found = {atom: candidates}
+            keep = np.ones(len(bindings), dtype=bool)
+            for other, other_level in parts:
+                if other != atom:
+                    found[other] = tries[other].seek(other_level, nodes[other][bindings], values)
+                    keep &= found[other] >= 0
+            bindings = bindings[keep]
+            next_nodes = [found[other][keep] if other in found else other_nodes[bindings]
+                          for other, other_nodes in enumerate(nodes)]
+            next_weights = weights[bindings]
+            for other in finishing[position]:
+                next_weights = next_weights * tries[other].leaf_counts[next_nodes[other]]
+            total += step(position + 1, next_nodes, next_weights)
+        return total
+
+    roots = [np.zeros(1, dtype=np.int64) for _ in atoms]
+    return step(0, roots, np.ones(1, dtype=np.int64))
+
+
+class LSQBCatalog:
+    """LSQB relations of a data set as NumPy columns and tries, read from the column store on first use and cached."""
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.relations = {}
+        self.tries = {}
+
+    def relation(self, name):
+        if name not in self.relations:
+            self.relations[name] = self._read_relation(name)
+        return self.relations[name]
+
+    def _read_relation(self, name):
+        if name == KNOWS:
+            # loaded in both directions, like sql/general/snb-load.sql does
+            (person1, _), (person2, _) = list(open_table(self.data_dir, KNOWS).values())[:2]
+            return np.concatenate([person1, person2]), np.concatenate([person2, person1])
+        if name in VIEWS:
+            parts = [self.relation(part) for part in VIEWS[name]]
+            return tuple(np.concatenate(columns) for columns in zip(*parts))
+        if name in NODE_TABLES:
+            return (np.asarray(open_table(self.data_dir, name)["id"][0]),)
+        table, source, target = RELATIONS[name]
+        columns = open_table(self.data_dir, table)
+        (sources, source_null), (targets, target_null) = columns[source], columns[target]
+        null = target_null if source_null is None else source_null
+        if null is not None:
+            return np.asarray(sources[~null]), np.asarray(targets[~null])
+        return np.asarray(sources), np.asarray(targets)
+
+    def trie(self, name, reverse=False):
+        if (name, reverse) not in self.tries:
+            columns = list(self.relation(name))
+            self.tries[(name, reverse)] = Trie(columns[::-1] if reverse else columns)
+        return self.tries[(name, reverse)]
+
+    def atoms(self, query):
+        variables, relations = CYCLIC_QUERIES[query]
+        atoms = []
+        for name, source, target in relations:
+            reverse = variables.index(target) < variables.index(source)
+            atoms.append((self.trie(name, reverse), [target, source] if reverse else [source, target]))
+        return atoms, variables
+
+
+def scale_factor_of(data_dir):
+    match = re.search(r"-sf([^-/]+)-", os.path.basename(os.path.normpath(data_dir)) + "-")
+    return match.group(1) if match else None
+
+
+def expected_counts(scale_factor, path=EXPECTED_OUTPUT):
+    """Counts of `expected-output.csv` for one scale factor as query name -> count, e.g. {"q2": 1085627}."""
+    counts = {}
+    with open(path, "r") as file:
+        for row in csv.reader(file, delimiter="\t"):
+            if len(row) >= 6 and row[2] == str(scale_factor):
+                counts[f"q{row[3]}"] = int(row[5])
+    return counts
+
+
+class TrieJoinConnection(IConnection):
+    """In-process reference engine that counts the cyclic LSQB queries with a worst-case optimal join.
+
+    The queries are identified by their file name (q2, q3); the SQL text is not parsed. The tries are built once
+    when the engine is created, like indexes of a database, so the measured time is the join itself.
+    """
+
+    system = "lftj"
+
+    def __init__(self, data_dir, queries=tuple(CYCLIC_QUERIES)):
+        self.data_dir = data_dir
+        self.lsqb = LSQBCatalog(data_dir)
+        with Timer() as timer:
+            self.plans = {query: self.lsqb.atoms(query) for query in queries}
+        self.load_time = timer.wall_s
+        print(f"Built {len(self.lsqb.tries)} tries for {', '.join(self.plans)} in {self.load_time:.2f} seconds")
+
+    def close(self):
+        self.plans = {}
+        self.lsqb = None
+
+    def supports(self, query_name):
+        return query_name in self.plans
+
+    def execute(self, query_name, timeout_seconds=None):
+        if query_name not in self.plans:
+            raise ValueError(f"Unsupported query '{query_name}': the trie join engine runs {list(self.plans)}")
+        deadline = monotonic_s() + timeout_seconds if timeout_seconds is not None else None
+        atoms, variables = self.plans[query_name]
+        return [(count_join(atoms, variables, deadline),)]
+
+    def run_queries(self, queries, result_dir=None, runs=5, timeout_seconds=120, scheduler=None,
+                    expected=None):
+        scheduler = scheduler or RepetitionScheduler(runs)
+        result_dir = result_dir or f"{self.system}_results"
+        expected = expected or {}
+        results = []
+        all_query_stats = []
+        for idx, (filename, _) in enumerate(queries):
+            execution_times = []
+            wall_times_ns = []
+            cpu_times_ns = []
+            query_errors = []
+            data = []
+            censored_runs = 0
+            schedule = scheduler.schedule(execution_times)
+            for warmup in tqdm(schedule, total=schedule.total, desc=f"Executing {filename}"):
+                try:
+                    with Timer() as timer:
+                        data = self.execute(filename, timeout_seconds)
+                    if not warmup:
+                        execution_times.append(timer.wall_s)
+                        wall_times_ns.append(timer.wall_ns)
+                        cpu_times_ns.append(timer.cpu_ns)
+                except TimeoutError as e:
+                    query_errors.append(str(e))
+                    censored_runs += 1
+                    schedule.stop(TIMEOUT)
+                    break
+                except Exception as e:
+                    query_errors.append(f"{type(e).__name__}: {e}")
+                    schedule.stop()
+                    break
+
+            count = data[0][0] if data and execution_times else None
+            if count is not None and filename in expected and count != expected[filename]:
+                query_errors.append(f"Count {count} differs from the expected count {expected[filename]}")
+            query_stats = {
+                "query_index": idx + 1,
+                "filename": filename,
+                "result": data,
+                "mean_execution_time_s": statistics.mean(execution_times) if execution_times else None,
+                "std_dev_time_s": statistics.stdev(execution_times) if len(execution_times) > 1 else 0,
+                "num_records": len(data) if execution_times else 0,
+                "mean_cpu_time_s": statistics.mean(cpu_times_ns) / 1e9 if cpu_times_ns else None,
+                **schedule.summary(),
+                "censored_runs": censored_runs,
+                "count": count,
+                "expected_count": expected.get(filename),
+                "execution_times": execution_times,
+                "wall_times_ns": wall_times_ns,
+                "cpu_times_ns": cpu_times_ns,
+                "errors": query_errors
+            }
+            all_query_stats.append(query_stats)
+            results.append({"data": data if execution_times else []})
+        self.save_results(all_query_stats, result_dir)
+        save_runs(all_query_stats, result_dir, self.system)
+        return results, all_query_stats
+
+    def save_results(self, all_results, result_dir):
+        if not os.path.exists(result_dir):
+            os.makedirs(result_dir)
+        filename = f"{result_dir}/{self.system}_query_summary.csv"
+        with open(filename, "w", newline="") as file:
+            fieldnames = ['query_index', 'filename', 'count', 'expected_count', 'mean_execution_time_s',
+                          'std_dev_time_s', 'num_records', 'mean_cpu_time_s', 'median_execution_time_s',
+                          'median_ci_low_s', 'median_ci_high_s', 'warmup_runs', 'stop_reason', 'censored_runs',
+                          'errors']
+            writer = csv.DictWriter(file, fieldnames=fieldnames)
+            writer.writeheader()
+            for result in all_results:
+                row = {key: result[key] for key in result if key in fieldnames}
+                row['errors'] = str(result['errors'])
+                writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the cyclic LSQB queries with an in-process worst-case "
+                                                 "optimal trie join and check them against the expected output")
+    parser.add_argument("data_dir", type=str, help="Data set directory in either format, e.g. "
+                                                   "data/social-network-sf1-merged-fk")
+    parser.add_argument("-q", "--queries", nargs="*", default=list(CYCLIC_QUERIES), choices=list(CYCLIC_QUERIES),
+                        help="Queries to run")
+    parser.add_argument("-r", "--runs", type=int, default=5, help="Number of runs per query")
+    parser.add_argument("-t", "--timeout", type=int, default=600, help="Timeout per run in seconds")
+    parser.add_argument("-sf", "--scale-factor", type=str, default=None,
+                        help="Scale factor of the expected counts and the results store (default: from data_dir)")
+    parser.add_argument("-e", "--expected", type=str, default=EXPECTED_OUTPUT, help="Expected output file")
+    parser.add_argument("-o", "--result-dir", type=str, default="lftj_results", help="Result directory")
+    parser.add_argument("-sd", "--store-dir", type=str, default=RESULTS_STORE_DIR,
+                        help="Directory of the partitioned Parquet results store")
+    args = parser.parse_args()
+
+    scale_factor = args.scale_factor or scale_factor_of(args.data_dir)
+    expected = expected_counts(scale_factor, args.expected) if scale_factor else {}
+    connection = TrieJoinConnection(args.data_dir, args.queries)
+    try:
+        _, query_stats = connection.run_queries([(query, None) for query in args.queries], result_dir=args.result_dir,
+                                                runs=args.runs, timeout_seconds=args.timeout, expected=expected)
+    finally:
+        connection.close()
+
+    for stats in query_stats:
+        status = "no expected count" if stats["expected_count"] is None else (
+            "ok" if stats["count"] == stats["expected_count"] else "MISMATCH")
+        print(f"{stats['filename']}: {stats['count']} ({status}), median {stats['median_execution_time_s']} s, "
+              f"errors {stats['errors']}")
+    append_results(query_stats, "lftj", "lsqb", scale_factor, store_dir=args.store_dir)
+
+
+if __name__ == "__main__":
+    main()
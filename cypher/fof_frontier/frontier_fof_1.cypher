@@ -0,0 +1,20 @@
+MATCH (start:Person {id: 33})
+WITH [start] AS hop0
+CALL {
+    WITH hop0
+    CALL {
+        WITH hop0
+        UNWIND hop0 AS f
+        MATCH (f)-[:KNOWS]-(n:Person)
+        RETURN n, 1 AS new
+        UNION ALL
+        WITH hop0
+        UNWIND hop0 AS n
+        RETURN n, 0 AS new
+    }
+    WITH n, min(new) AS new
+    WHERE new = 1
+    RETURN collect(n) AS hop1
+}
+WITH hop0, hop1
+RETURN size(hop1) AS countOfPersons;
\ No newline at end of file
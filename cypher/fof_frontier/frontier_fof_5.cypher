@@ -0,0 +1,88 @@
+MATCH (start:Person {id: 33})
+WITH [start] AS hop0
+CALL {
+    WITH hop0
+    CALL {
+        WITH hop0
+        UNWIND hop0 AS f
+        MATCH (f)-[:KNOWS]-(n:Person)
+        RETURN n, 1 AS new
+        UNION ALL
+        WITH hop0
+        UNWIND hop0 AS n
+        RETURN n, 0 AS new
+    }
+    WITH n, min(new) AS new
+    WHERE new = 1
+    RETURN collect(n) AS hop1
+}
+WITH hop0, hop1
+CALL {
+    WITH hop0, hop1
+    CALL {
+        WITH hop1
+        UNWIND hop1 AS f
+        MATCH (f)-[:KNOWS]-(n:Person)
+        RETURN n, 1 AS new
+        UNION ALL
+        WITH hop0, hop1
+        UNWIND hop0 + hop1 AS n
+        RETURN n, 0 AS new
+    }
+    WITH n, min(new) AS new
+    WHERE new = 1
+    RETURN collect(n) AS hop2
+}
+WITH hop1, hop2
+CALL {
+    WITH hop1, hop2
+    CALL {
+        WITH hop2
+        UNWIND hop2 AS f
+        MATCH (f)-[:KNOWS]-(n:Person)
+        RETURN n, 1 AS new
+        UNION ALL
+        WITH hop1, hop2
+        UNWIND hop1 + hop2 AS n
+        RETURN n, 0 AS new
+    }
+    WITH n, min(new) AS new
+    WHERE new = 1
+    RETURN collect(n) AS hop3
+}
+WITH hop2, hop3
+CALL {
+    WITH hop2, hop3
+    CALL {
+        WITH hop3
+        UNWIND hop3 AS f
+        MATCH (f)-[:KNOWS]-(n:Person)
+        RETURN n, 1 AS new
+        UNION ALL
+        WITH hop2, hop3
+        UNWIND hop2 + hop3 AS n
+        RETURN n, 0 AS new
+    }
+    WITH n, min(new) AS new
+    WHERE new = 1
+    RETURN collect(n) AS hop4
+}
+WITH hop3, hop4
+CALL {
+    WITH hop3, hop4
+    CALL {
+        WITH hop4
+        UNWIND hop4 AS f
+        MATCH (f)-[:KNOWS]-(n:Person)
+        RETURN n, 1 AS new
+        UNION ALL
+        WITH hop3, hop4
+        UNWIND hop3 + hop4 AS n
+        RETURN n, 0 AS new
+    }
+    WITH n, min(new) AS new
+    WHERE new = 1
+    RETURN collect(n) AS hop5
+}
+WITH hop4, hop5
+RETURN size(hop5) AS countOfPersons;
\ No newline at end of file
@@ -8,13 +8,13 @@ def query_fun(tx, query):
     return result.single()
 
 def run_query(session, system_variant, sf, query_id, query_spec, results_file):
-    start = time.time()
+    start = time.perf_counter()
     print(f"Running query {query_id}...")
     # turn on the parallel runtime for the Enterprise edition
     if system_variant == "enterprise" and query_id != 9:
         query_spec = f"CYPHER runtime=parallel {query_spec}"
     result = session.read_transaction(query_fun, query_spec)
-    end = time.time()
+    end = time.perf_counter()
     duration = end - start
     results_file.write(f"Neo4j-{__version__}\t{system_variant}\t{sf}\t{query_id}\t{duration:.4f}\t{result[0]}\n")
     results_file.flush()
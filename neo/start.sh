@@ -13,8 +13,17 @@ if [ ! -d ${NEO4J_DATA_DIR} ]; then
     exit 1
 fi
 
+RESOURCE_LIMITS=""
+if [ -n "${NEO4J_CPUSET}" ]; then
+    RESOURCE_LIMITS="${RESOURCE_LIMITS} --cpuset-cpus=${NEO4J_CPUSET}"
+fi
+if [ -n "${NEO4J_MEMORY}" ]; then
+    RESOURCE_LIMITS="${RESOURCE_LIMITS} --memory=${NEO4J_MEMORY} --memory-swap=${NEO4J_MEMORY}"
+fi
+
 docker run \
     --rm \
+    ${RESOURCE_LIMITS} \
     --publish=7474:7474 \
     --publish=7687:7687 \
     --detach \
@@ -30,7 +39,13 @@ docker run \
     --name ${NEO4J_CONTAINER_NAME} \
     neo4j:${NEO4J_VERSION}
 
+# only allocate a TTY when there is one, so the script also works when started by benchmark/orchestrator.py
+TTY_FLAGS=""
+if [ -t 0 ]; then
+    TTY_FLAGS="--interactive --tty"
+fi
+
 echo "Waiting for Neo4j to start..."
-until docker exec --interactive --tty ${NEO4J_CONTAINER_NAME} cypher-shell "RETURN 'Neo4j started' AS message"; do
+until docker exec ${TTY_FLAGS} ${NEO4J_CONTAINER_NAME} cypher-shell "RETURN 'Neo4j started' AS message"; do
     sleep 1
 done
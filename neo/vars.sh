@@ -1,5 +1,8 @@
 export NEO4J_HOME=`pwd`/neo/scratch
 export NEO4J_DATA_DIR=`pwd`/neo/scratch/data
 export NEO4J_VERSION=5.20.0
-export NEO4J_ENV_VARS=""
+export NEO4J_ENV_VARS=${NEO4J_ENV_VARS:-}
 export NEO4J_CONTAINER_NAME=lsqb-neo
+# optional resource limits of the container, e.g. NEO4J_CPUSET=0-7 NEO4J_MEMORY=16g
+export NEO4J_CPUSET=${NEO4J_CPUSET:-}
+export NEO4J_MEMORY=${NEO4J_MEMORY:-}
@@ -1,31 +1,33 @@
+import os
 import psycopg
 import time
 import sys
 
-from contextlib import contextmanager
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmark"))
+from cancellation import WATCHDOG, QueryTimeout
 
-@contextmanager
-def timeout(cursor, t):
-    cursor.execute(f"SET statement_timeout TO {int(t * 1000)}")
-    try:
-        yield
-    finally:
-        cursor.execute("SET statement_timeout TO 0")
+CONNECTION = "host=localhost user=postgres password=mysecretpassword port=5432"
+TIMEOUT_SECONDS = 300
+
+def cancel_backend(backend_pid):
+    """Cancel the statement running on `backend_pid` server-side; called by the watchdog thread."""
+    with psycopg.connect(CONNECTION) as cancel_con:
+        cancel_con.execute("SELECT pg_cancel_backend(%s)", (backend_pid,))
 
 def run_query(con, variant, sf, query_id, query_spec, system, results_file):
     print(f"Running query {query_id}...")
-    start = time.time()
+    start = time.perf_counter()
     with con.cursor() as cur:
+        backend_pid = con.info.backend_pid
         try:
-            with timeout(cur, 300):  # 300 seconds timeout
+            with WATCHDOG.watch(TIMEOUT_SECONDS, cancel=lambda: cancel_backend(backend_pid)):
                 cur.execute(query_spec)
-            result = cur.fetchall()
-        except psycopg.OperationalError as e:
-            if "timeout" in str(e).lower():
-                print(f"Query {query_id} timed out")
-                return
-            raise
-    end = time.time()
+                result = cur.fetchall()
+        except QueryTimeout:
+            print(f"Query {query_id} timed out")
+            con.rollback()
+            return
+    end = time.perf_counter()
     duration = end - start
     results_file.write(f"{system}-new\t{variant}\t{sf}\t{query_id}\t{duration:.4f}\t{result[0][0]}\n")
     results_file.flush()
@@ -42,7 +44,7 @@ else:
 system = sys.argv[2] if len(sys.argv) > 2 else "PostgreSQL"
 variant = sys.argv[3] if len(sys.argv) > 3 else ""
 
-con = psycopg.connect("host=localhost user=postgres password=mysecretpassword port=5432")
+con = psycopg.connect(CONNECTION)
 
 with open(f"results/postgres-results.csv", "a+") as results_file:
     for i in range(1, 10):
@@ -1,36 +1,37 @@
+import os
 import psycopg2
 import time
 import sys
-import signal
-from contextlib import contextmanager
 
-@contextmanager
-def timeout(t):
-    signal.signal(signal.SIGALRM, raise_timeout)
-    signal.alarm(t)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmark"))
+from cancellation import WATCHDOG, QueryTimeout
 
+CONNECTION = {"host": "localhost", "user": "postgres", "password": "mysecretpassword", "port": 5432}
+TIMEOUT_SECONDS = 300
+
+def cancel_backend(backend_pid):
+    """Cancel the statement running on `backend_pid` server-side; called by the watchdog thread."""
+    cancel_con = psycopg2.connect(**CONNECTION)
     try:
-        yield
-    except TimeoutError:
-        raise
+        with cancel_con.cursor() as cur:
+            cur.execute("SELECT pg_cancel_backend(%s)", (backend_pid,))
     finally:
-        signal.signal(signal.SIGALRM, signal.SIG_IGN)
-
-def raise_timeout(signum, frame):
-    raise TimeoutError
+        cancel_con.close()
 
 def run_query(con, variant, sf, query_id, query_spec, system, results_file):
     print(f"Running query {query_id}...")
-    start = time.time()
+    start = time.perf_counter()
     cur = con.cursor()
+    backend_pid = con.get_backend_pid()
     try:
-        with timeout(300):
+        with WATCHDOG.watch(TIMEOUT_SECONDS, cancel=lambda: cancel_backend(backend_pid)):
             cur.execute(query_spec)
-    except TimeoutError:
+    except QueryTimeout:
         print(f"Query {query_id} timed out")
+        con.rollback()
         return
     result = cur.fetchall()
-    end = time.time()
+    end = time.perf_counter()
     duration = end - start
     results_file.write(f"{system}\t{variant}\t{sf}\t{query_id}\t{duration:.4f}\t{result[0][0]}\n")
     results_file.flush()
@@ -54,7 +55,7 @@ if len(sys.argv) > 3:
 else:
     variant = ""
 
-con = psycopg2.connect(host="localhost", user="postgres", password="mysecretpassword", port=5432)
+con = psycopg2.connect(**CONNECTION)
 
 with open(f"results/postgres-results.csv", "a+") as results_file:
     for i in range(1, 10):
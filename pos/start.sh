@@ -9,8 +9,17 @@ cd ..
 . pos/vars.sh
 . scripts/import-vars.sh
 
+RESOURCE_LIMITS=""
+if [ -n "${POSTGRES_CPUSET}" ]; then
+    RESOURCE_LIMITS="${RESOURCE_LIMITS} --cpuset-cpus=${POSTGRES_CPUSET}"
+fi
+if [ -n "${POSTGRES_MEMORY}" ]; then
+    RESOURCE_LIMITS="${RESOURCE_LIMITS} --memory=${POSTGRES_MEMORY} --memory-swap=${POSTGRES_MEMORY}"
+fi
+
 docker run \
     --rm \
+    ${RESOURCE_LIMITS} \
     --publish=5432:5432 \
     --name ${POSTGRES_CONTAINER_NAME} \
     --env ${POSTGRES_PASSWORD_POLICY} \
@@ -4,3 +4,6 @@ export POSTGRES_SCHEMA_DIR=`pwd`/sql
 export POSTGRES_CONTAINER_NAME=lsqb-pos
 export POSTGRES_PASSWORD_POLICY="POSTGRES_PASSWORD=mysecretpassword"
 export POSTGRES_SHARED_MEMORY=12g
+# optional resource limits of the container, e.g. POSTGRES_CPUSET=0-7 POSTGRES_MEMORY=16g
+export POSTGRES_CPUSET=${POSTGRES_CPUSET:-}
+export POSTGRES_MEMORY=${POSTGRES_MEMORY:-}
@@ -0,0 +1,23 @@
+WITH hop0 AS (
+    SELECT 33 AS person
+),
+hop1 AS (
+    SELECT n.person
+    FROM hop0 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop0
+),
+hop2 AS (
+    SELECT n.person
+    FROM hop1 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop0
+    EXCEPT
+    SELECT person FROM hop1
+)
+SELECT COUNT(*) AS countOfPersons
+FROM hop2;
\ No newline at end of file
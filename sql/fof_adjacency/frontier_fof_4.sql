@@ -0,0 +1,43 @@
+WITH hop0 AS (
+    SELECT 33 AS person
+),
+hop1 AS (
+    SELECT n.person
+    FROM hop0 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop0
+),
+hop2 AS (
+    SELECT n.person
+    FROM hop1 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop0
+    EXCEPT
+    SELECT person FROM hop1
+),
+hop3 AS (
+    SELECT n.person
+    FROM hop2 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop1
+    EXCEPT
+    SELECT person FROM hop2
+),
+hop4 AS (
+    SELECT n.person
+    FROM hop3 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop2
+    EXCEPT
+    SELECT person FROM hop3
+)
+SELECT COUNT(*) AS countOfPersons
+FROM hop4;
\ No newline at end of file
@@ -0,0 +1,73 @@
+WITH hop0 AS (
+    SELECT 33 AS person
+),
+hop1 AS (
+    SELECT n.person
+    FROM hop0 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop0
+),
+hop2 AS (
+    SELECT n.person
+    FROM hop1 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop0
+    EXCEPT
+    SELECT person FROM hop1
+),
+hop3 AS (
+    SELECT n.person
+    FROM hop2 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop1
+    EXCEPT
+    SELECT person FROM hop2
+),
+hop4 AS (
+    SELECT n.person
+    FROM hop3 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop2
+    EXCEPT
+    SELECT person FROM hop3
+),
+hop5 AS (
+    SELECT n.person
+    FROM hop4 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop3
+    EXCEPT
+    SELECT person FROM hop4
+),
+hop6 AS (
+    SELECT n.person
+    FROM hop5 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop4
+    EXCEPT
+    SELECT person FROM hop5
+),
+hop7 AS (
+    SELECT n.person
+    FROM hop6 f
+    JOIN person_adj a ON a.person_id = f.person
+    CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+    EXCEPT
+    SELECT person FROM hop5
+    EXCEPT
+    SELECT person FROM hop6
+)
+SELECT COUNT(*) AS countOfPersons
+FROM hop7;
\ No newline at end of file
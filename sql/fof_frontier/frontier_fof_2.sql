@@ -0,0 +1,21 @@
+WITH hop0 AS (
+    SELECT 33 AS person
+),
+hop1 AS (
+    SELECT k.person2id AS person
+    FROM hop0 f
+    JOIN Person_knows_Person k ON k.person1id = f.person
+    EXCEPT
+    SELECT person FROM hop0
+),
+hop2 AS (
+    SELECT k.person2id AS person
+    FROM hop1 f
+    JOIN Person_knows_Person k ON k.person1id = f.person
+    EXCEPT
+    SELECT person FROM hop0
+    EXCEPT
+    SELECT person FROM hop1
+)
+SELECT COUNT(*) AS countOfPersons
+FROM hop2;
\ No newline at end of file
@@ -0,0 +1,48 @@
+WITH hop0 AS (
+    SELECT 33 AS person
+),
+hop1 AS (
+    SELECT k.person2id AS person
+    FROM hop0 f
+    JOIN Person_knows_Person k ON k.person1id = f.person
+    EXCEPT
+    SELECT person FROM hop0
+),
+hop2 AS (
+    SELECT k.person2id AS person
+    FROM hop1 f
+    JOIN Person_knows_Person k ON k.person1id = f.person
+    EXCEPT
+    SELECT person FROM hop0
+    EXCEPT
+    SELECT person FROM hop1
+),
+hop3 AS (
+    SELECT k.person2id AS person
+    FROM hop2 f
+    JOIN Person_knows_Person k ON k.person1id = f.person
+    EXCEPT
+    SELECT person FROM hop1
+    EXCEPT
+    SELECT person FROM hop2
+),
+hop4 AS (
+    SELECT k.person2id AS person
+    FROM hop3 f
+    JOIN Person_knows_Person k ON k.person1id = f.person
+    EXCEPT
+    SELECT person FROM hop2
+    EXCEPT
+    SELECT person FROM hop3
+),
+hop5 AS (
+    SELECT k.person2id AS person
+    FROM hop4 f
+    JOIN Person_knows_Person k ON k.person1id = f.person
+    EXCEPT
+    SELECT person FROM hop3
+    EXCEPT
+    SELECT person FROM hop4
+)
+SELECT COUNT(*) AS countOfPersons
+FROM hop5;
\ No newline at end of file
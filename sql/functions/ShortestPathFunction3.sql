@@ -0,0 +1,86 @@
+-- Bidirectional, level-synchronous BFS. Every step expands the whole frontier of the smaller side with one set-based
+-- INSERT ... SELECT, the visited persons of both sides and their parents live in temp tables with a primary key, and
+-- the path is rebuilt from the parent pointers once both searches meet. Person_knows_Person holds both directions of
+-- every edge (see snb-load.sql), so both sides follow person1id -> person2id.
+CREATE OR REPLACE FUNCTION bidirectional_shortest_path(start_person BIGINT, end_person BIGINT, max_depth INT)
+RETURNS BIGINT[] AS $$
+DECLARE
+    forward_depth INT := 0;
+    backward_depth INT := 0;
+    forward_size BIGINT := 1;
+    backward_size BIGINT := 1;
+    meeting_person BIGINT;
+    forward_path BIGINT[];
+    backward_path BIGINT[];
+BEGIN
+    IF start_person = end_person THEN
+        RETURN ARRAY[start_person];
+    END IF;
+
+    CREATE TEMP TABLE IF NOT EXISTS sp_forward (person BIGINT PRIMARY KEY, parent BIGINT, depth INT NOT NULL);
+    CREATE TEMP TABLE IF NOT EXISTS sp_backward (person BIGINT PRIMARY KEY, parent BIGINT, depth INT NOT NULL);
+    TRUNCATE sp_forward, sp_backward;
+    INSERT INTO sp_forward VALUES (start_person, NULL, 0);
+    INSERT INTO sp_backward VALUES (end_person, NULL, 0);
+
+    WHILE forward_depth + backward_depth < max_depth AND forward_size > 0 AND backward_size > 0 LOOP
+        IF forward_size <= backward_size THEN
+            INSERT INTO sp_forward
+            SELECT DISTINCT ON (k.person2id) k.person2id, k.person1id, forward_depth + 1
+            FROM sp_forward f
+            JOIN Person_knows_Person k ON k.person1id = f.person
+            WHERE f.depth = forward_depth
+            ON CONFLICT (person) DO NOTHING;
+            GET DIAGNOSTICS forward_size = ROW_COUNT;
+            forward_depth := forward_depth + 1;
+
+            SELECT f.person INTO meeting_person
+            FROM sp_forward f
+            JOIN sp_backward b ON b.person = f.person
+            WHERE f.depth = forward_depth
+            ORDER BY b.depth
+            LIMIT 1;
+        ELSE
+            INSERT INTO sp_backward
+            SELECT DISTINCT ON (k.person2id) k.person2id, k.person1id, backward_depth + 1
+            FROM sp_backward b
+            JOIN Person_knows_Person k ON k.person1id = b.person
+            WHERE b.depth = backward_depth
+            ON CONFLICT (person) DO NOTHING;
+            GET DIAGNOSTICS backward_size = ROW_COUNT;
+            backward_depth := backward_depth + 1;
+
+            SELECT b.person INTO meeting_person
+            FROM sp_backward b
+            JOIN sp_forward f ON f.person = b.person
+            WHERE b.depth = backward_depth
+            ORDER BY f.depth
+            LIMIT 1;
+        END IF;
+
+        EXIT WHEN meeting_person IS NOT NULL;
+    END LOOP;
+
+    IF meeting_person IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- start .. meeting_person
+    WITH RECURSIVE walk(person, parent, depth) AS (
+        SELECT person, parent, depth FROM sp_forward WHERE person = meeting_person
+        UNION ALL
+        SELECT f.person, f.parent, f.depth FROM sp_forward f JOIN walk w ON f.person = w.parent
+    )
+    SELECT array_agg(person ORDER BY depth) INTO forward_path FROM walk;
+
+    -- meeting_person (exclusive) .. end
+    WITH RECURSIVE walk(person, parent, depth) AS (
+        SELECT person, parent, depth FROM sp_backward WHERE person = meeting_person
+        UNION ALL
+        SELECT b.person, b.parent, b.depth FROM sp_backward b JOIN walk w ON b.person = w.parent
+    )
+    SELECT array_agg(person ORDER BY depth DESC) INTO backward_path FROM walk WHERE person <> meeting_person;
+
+    RETURN forward_path || backward_path;
+END;
+$$ LANGUAGE plpgsql;
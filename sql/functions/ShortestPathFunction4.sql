@@ -0,0 +1,87 @@
+-- Bidirectional BFS of ShortestPathFunction3.sql on the adjacency lists of sql/general/adjacency.sql: every frontier
+-- person is one primary key lookup into person_adj whose neighbor array is unnested, instead of one index lookup per
+-- edge of Person_knows_Person. Run adjacency.sql first.
+CREATE OR REPLACE FUNCTION bidirectional_shortest_path_adjacency(start_person BIGINT, end_person BIGINT, max_depth INT)
+RETURNS BIGINT[] AS $$
+DECLARE
+    forward_depth INT := 0;
+    backward_depth INT := 0;
+    forward_size BIGINT := 1;
+    backward_size BIGINT := 1;
+    meeting_person BIGINT;
+    forward_path BIGINT[];
+    backward_path BIGINT[];
+BEGIN
+    IF start_person = end_person THEN
+        RETURN ARRAY[start_person];
+    END IF;
+
+    CREATE TEMP TABLE IF NOT EXISTS spa_forward (person BIGINT PRIMARY KEY, parent BIGINT, depth INT NOT NULL);
+    CREATE TEMP TABLE IF NOT EXISTS spa_backward (person BIGINT PRIMARY KEY, parent BIGINT, depth INT NOT NULL);
+    TRUNCATE spa_forward, spa_backward;
+    INSERT INTO spa_forward VALUES (start_person, NULL, 0);
+    INSERT INTO spa_backward VALUES (end_person, NULL, 0);
+
+    WHILE forward_depth + backward_depth < max_depth AND forward_size > 0 AND backward_size > 0 LOOP
+        IF forward_size <= backward_size THEN
+            INSERT INTO spa_forward
+            SELECT DISTINCT ON (n.person) n.person, f.person, forward_depth + 1
+            FROM spa_forward f
+            JOIN person_adj a ON a.person_id = f.person
+            CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+            WHERE f.depth = forward_depth
+            ON CONFLICT (person) DO NOTHING;
+            GET DIAGNOSTICS forward_size = ROW_COUNT;
+            forward_depth := forward_depth + 1;
+
+            SELECT f.person INTO meeting_person
+            FROM spa_forward f
+            JOIN spa_backward b ON b.person = f.person
+            WHERE f.depth = forward_depth
+            ORDER BY b.depth
+            LIMIT 1;
+        ELSE
+            INSERT INTO spa_backward
+            SELECT DISTINCT ON (n.person) n.person, b.person, backward_depth + 1
+            FROM spa_backward b
+            JOIN person_adj a ON a.person_id = b.person
+            CROSS JOIN LATERAL unnest(a.neighbors) AS n(person)
+            WHERE b.depth = backward_depth
+            ON CONFLICT (person) DO NOTHING;
+            GET DIAGNOSTICS backward_size = ROW_COUNT;
+            backward_depth := backward_depth + 1;
+
+            SELECT b.person INTO meeting_person
+            FROM spa_backward b
+            JOIN spa_forward f ON f.person = b.person
+            WHERE b.depth = backward_depth
+            ORDER BY f.depth
+            LIMIT 1;
+        END IF;
+
+        EXIT WHEN meeting_person IS NOT NULL;
+    END LOOP;
+
+    IF meeting_person IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- start .. meeting_person
+    WITH RECURSIVE walk(person, parent, depth) AS (
+        SELECT person, parent, depth FROM spa_forward WHERE person = meeting_person
+        UNION ALL
+        SELECT f.person, f.parent, f.depth FROM spa_forward f JOIN walk w ON f.person = w.parent
+    )
+    SELECT array_agg(person ORDER BY depth) INTO forward_path FROM walk;
+
+    -- meeting_person (exclusive) .. end
+    WITH RECURSIVE walk(person, parent, depth) AS (
+        SELECT person, parent, depth FROM spa_backward WHERE person = meeting_person
+        UNION ALL
+        SELECT b.person, b.parent, b.depth FROM spa_backward b JOIN walk w ON b.person = w.parent
+    )
+    SELECT array_agg(person ORDER BY depth DESC) INTO backward_path FROM walk WHERE person <> meeting_person;
+
+    RETURN forward_path || backward_path;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,17 @@
+-- Materialized adjacency lists of Person_knows_Person: one row per person with all neighbors in a sorted array, so a
+-- BFS expands a frontier with one primary key lookup and an unnest per person instead of one index entry per edge.
+-- Person_knows_Person holds both directions of every edge, so the lists are the complete undirected neighborhoods.
+-- The intarray extension only supports int4 arrays, which cannot hold the LDBC person ids, hence plain BIGINT[].
+-- Rebuild after every (re)load of Person_knows_Person, e.g. as a post-load script of pg_loader.py.
+DROP TABLE IF EXISTS person_adj;
+CREATE TABLE person_adj (person_id BIGINT NOT NULL, neighbors BIGINT[] NOT NULL);
+-- long lists are moved out of line but not compressed, so reading them needs no decompression
+ALTER TABLE person_adj ALTER COLUMN neighbors SET STORAGE EXTERNAL;
+
+INSERT INTO person_adj
+SELECT person1id, array_agg(person2id ORDER BY person2id)
+FROM Person_knows_Person
+GROUP BY person1id;
+
+ALTER TABLE person_adj ADD PRIMARY KEY (person_id);
+ANALYZE person_adj;